@@ -0,0 +1,212 @@
+# app/async_api.py
+
+"""
+asyncio 接口：在基于 asyncio 的服务中嵌入检测。
+
+    detector = AsyncDetector()
+    await detector.load_model("yolo.pt", "pt")
+    session = detector.session("cam0")
+
+    result = await session.infer(frame)           # 单帧推理
+    async for result in session.stream(source):   # 连续帧流
+        ...
+
+- 模型调用在专用的推理线程池中执行（默认单线程，同一份权重上的调用串行化），
+  不阻塞事件循环
+- 读帧在事件循环的默认线程池中执行，读帧与推理重叠进行
+- 帧源与推理之间是有界 asyncio.Queue：消费方处理不过来时读帧方 await 挂起（背压），
+  摄像头默认丢弃最旧帧以保证实时
+- 多个 session 共用同一个 AsyncDetector，可以并发运行而无需轮询
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+
+from core.detector import Detector
+from core.dto import DetectionResult
+from core.source import FrameSource, SourceType
+from core.thread_budget import pin_current_thread
+from core.tracker import ByteTracker
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDetector:
+    """Detector 的 asyncio 包装，持有推理线程池，可创建多个 AsyncSession。"""
+
+    def __init__(
+        self,
+        detector: Optional[Detector] = None,
+        imgsz: int = 640,
+        infer_workers: int = 1,
+    ):
+        """
+        参数:
+            detector: 共享的 Detector，为空时内部新建（需 await load_model）
+            imgsz: 默认推理尺寸
+            infer_workers: 推理线程数；Ultralytics 的 predictor 不可重入，默认 1
+        """
+        self.detector = detector if detector is not None else Detector()
+        self.imgsz = imgsz
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(int(infer_workers), 1),
+            thread_name_prefix="async-infer",
+            initializer=pin_current_thread,
+            initargs=("infer",),
+        )
+        logger.debug("AsyncDetector 实例化完成")
+
+    async def load_model(self, model_path: str, model_format: str):
+        """在推理线程中加载模型，返回 (success, info_or_error)。"""
+        return await self.run(self.detector.load_model, model_path, model_format)
+
+    async def run(self, fn, *args):
+        """在推理线程池中执行阻塞调用。"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def session(
+        self,
+        name: str = "default",
+        imgsz: Optional[int] = None,
+        tracking: bool = False,
+    ) -> "AsyncSession":
+        """
+        创建一个检测会话。
+
+        参数:
+            name: 会话名（用于日志）
+            imgsz: 推理尺寸，为空时使用 AsyncDetector 的默认值
+            tracking: 是否启用跟踪（每个会话一个独立的内置 ByteTracker）
+        """
+        return AsyncSession(self, name, imgsz or self.imgsz, tracking)
+
+    def close(self):
+        """关闭推理线程池（等待正在执行的推理完成）。"""
+        self._executor.shutdown(wait=True)
+
+
+class AsyncSession:
+    """单个检测会话：单帧推理或连续帧流，可选跟踪状态。"""
+
+    def __init__(self, owner: AsyncDetector, name: str, imgsz: int, tracking: bool):
+        self.owner = owner
+        self.name = name
+        self.imgsz = imgsz
+        self.tracker: Optional[ByteTracker] = ByteTracker() if tracking else None
+        self.frames_inferred = 0
+
+    def reset(self):
+        """重置跟踪状态（切换帧源时调用）。"""
+        if self.tracker is not None:
+            self.tracker.reset()
+
+    def _infer_sync(self, frame, frame_index=None, timestamp=None) -> DetectionResult:
+        result = self.owner.detector.infer(frame, imgsz=self.imgsz)
+        det_result = DetectionResult.from_yolo(result)
+        det_result.frame_index = frame_index
+        det_result.timestamp = timestamp
+        det_result.imgsz = self.imgsz
+        if self.tracker is not None:
+            det_result = self.tracker.update(det_result)
+        return det_result
+
+    async def infer(self, frame, frame_index: Optional[int] = None) -> DetectionResult:
+        """单帧推理（在推理线程中执行），返回 DetectionResult。"""
+        det_result = await self.owner.run(self._infer_sync, frame, frame_index, time.time())
+        self.frames_inferred += 1
+        return det_result
+
+    async def stream(
+        self,
+        source: FrameSource,
+        queue_size: int = 4,
+        drop_oldest: Optional[bool] = None,
+        with_frames: bool = False,
+    ) -> AsyncIterator:
+        """
+        连续读取帧源并逐帧推理。
+
+        参数:
+            source: 帧源（未打开时自动打开，结束或中途退出时自动释放）
+            queue_size: 读帧与推理之间的缓冲帧数
+            drop_oldest: 缓冲满时是否丢弃最旧帧；为空时摄像头丢帧、视频/图片背压
+            with_frames: True 时产出 (frame, DetectionResult)，否则只产出 DetectionResult
+        """
+        if drop_oldest is None:
+            drop_oldest = source.source_type == SourceType.CAMERA
+        if source.source_type != SourceType.IMAGE and not source.is_open:
+            if not source.open():
+                raise RuntimeError(f"帧源打开失败: {source.path_or_id}")
+
+        self.reset()
+        frames: asyncio.Queue = asyncio.Queue(maxsize=max(int(queue_size), 1))
+        reader = asyncio.create_task(self._read_frames(source, frames, drop_oldest))
+        logger.info(
+            "AsyncSession[%s]: 开始流式推理 type=%s, drop_oldest=%s",
+            self.name,
+            source.source_type,
+            drop_oldest,
+        )
+        try:
+            while True:
+                item = await frames.get()
+                if item is None:
+                    break
+                frame_index, timestamp, frame = item
+                det_result = await self.owner.run(
+                    self._infer_sync, frame, frame_index, timestamp
+                )
+                self.frames_inferred += 1
+                yield (frame, det_result) if with_frames else det_result
+        finally:
+            reader.cancel()
+            try:
+                await reader
+            except asyncio.CancelledError:
+                pass
+            source.release()
+            logger.info(
+                "AsyncSession[%s]: 流式推理结束，共推理 %d 帧",
+                self.name,
+                self.frames_inferred,
+            )
+
+    async def _read_frames(self, source: FrameSource, frames: asyncio.Queue, drop_oldest: bool):
+        """读帧任务：在默认线程池中逐帧读取，写入有界队列，结束时写入 None。"""
+        loop = asyncio.get_running_loop()
+        gen = source.frames()
+        frame_index = 0
+        pending = None
+        try:
+            while True:
+                pending = loop.run_in_executor(None, next, gen, None)
+                # shield：本任务被取消时不取消 pending，才能在 finally 中等读帧线程真正返回
+                item = await asyncio.shield(pending)
+                if item is None:
+                    break
+                flag, frame = item
+                if flag == "end" or frame is None:
+                    break
+                entry = (frame_index, time.time(), frame)
+                frame_index += 1
+                if drop_oldest and frames.full():
+                    frames.get_nowait()
+                await frames.put(entry)
+        except asyncio.CancelledError:
+            # 消费方已提前退出，不再写入结束标记
+            raise
+        except Exception:
+            logger.exception("AsyncSession[%s]: 读帧失败", self.name)
+        finally:
+            # 读帧线程可能仍在 cap.read() 中：等它返回后再关闭生成器，
+            # stream() 在本任务结束之后才 release 帧源，避免跨线程释放 VideoCapture
+            if pending is not None and not pending.done():
+                await asyncio.wait([pending])
+                if not pending.cancelled():
+                    pending.exception()
+            gen.close()
+        await frames.put(None)
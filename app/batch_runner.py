@@ -0,0 +1,202 @@
+# app/batch_runner.py
+
+"""
+DirectoryBatchRunner：目录 / glob 图片的批量检测。
+
+- 帧源为 SourceType.DIRECTORY：线程池并行解码、提前解码 prefetch 张，与推理重叠
+- 按 batch 调用 detector.infer_batch，结果（带图片路径）流式写入导出器
+- 帧源设置了 min_decode_size 时大图降采样解码，检测框映射回原图坐标后再导出
+- 全部在后台线程运行，UI 通过 progress() / latest() 轮询进度与预览，不会阻塞
+"""
+
+import threading
+import logging
+import time
+from typing import Optional
+
+from core.detector import Detector
+from core.dto import DetectionResult
+from core.source import FrameSource, SourceType
+from core.thread_budget import pin_current_thread
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryBatchRunner:
+    """
+    目录批量检测。
+
+    用法:
+        runner = DirectoryBatchRunner(detector, batch_size=16)
+        runner.start(FrameSource(SourceType.DIRECTORY, "images/"), exporter=exporter)
+        while runner.running:
+            print(runner.progress())
+            time.sleep(1)
+    """
+
+    def __init__(
+        self,
+        detector: Detector,
+        imgsz: int = 640,
+        batch_size: int = 16,
+        preview: bool = True,
+        ema_alpha: float = 0.2,
+        filters: Optional[dict] = None,
+    ):
+        """
+        参数:
+            detector: 已加载模型的 Detector
+            imgsz: 推理尺寸
+            batch_size: 单次推理的图片数
+            preview: 是否为每个 batch 的最后一张生成标注图，供 UI 预览（标注图为解码分辨率）
+            ema_alpha: 吞吐量（images/sec）的平滑系数
+            filters: 推理过滤参数（conf / iou / classes / class_conf / max_det，见 Detector.infer），
+                     通常取 DetectionController.filter_kwargs()
+        """
+        self.detector = detector
+        self.imgsz = imgsz
+        self.batch_size = max(int(batch_size), 1)
+        self.preview = preview
+        self.ema_alpha = ema_alpha
+        self.filters = dict(filters or {})
+
+        self.source: Optional[FrameSource] = None
+        self.exporter = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_flag = False
+        self._lock = threading.Lock()
+        self._latest = None
+
+        self.total = 0
+        self.done = 0
+        self.errors = 0
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._rate = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, source: FrameSource, exporter=None):
+        """
+        在后台线程中开始批量检测。
+
+        参数:
+            source: SourceType.DIRECTORY 帧源（未打开时自动打开）
+            exporter: 可选的 core.exporter.BufferedSink（调用方负责 close）
+        """
+        if source.source_type != SourceType.DIRECTORY:
+            raise ValueError("DirectoryBatchRunner 只支持 DIRECTORY 帧源")
+        if self.detector.adapter is None:
+            raise RuntimeError("模型未加载")
+        if self.running:
+            logger.debug("批量检测已在运行，忽略重复启动请求")
+            return
+        if not source.is_open and not source.open():
+            raise ValueError(f"目录中没有可检测的图片: {source.path_or_id}")
+
+        self.source = source
+        self.exporter = exporter
+        self.total = len(source.paths)
+        self.done = 0
+        self.errors = 0
+        self._latest = None
+        self._rate = 0.0
+        self._stop_flag = False
+        self._started_at = time.perf_counter()
+        self._finished_at = None
+        self._thread = threading.Thread(target=self._worker, name="batch-runner", daemon=True)
+        self._thread.start()
+        logger.info(
+            "目录批量检测启动: images=%d, batch_size=%d, decode_workers=%d",
+            self.total,
+            self.batch_size,
+            source.decode_workers,
+        )
+
+    def stop(self):
+        """中止批量检测（已写入导出器的结果保留）。"""
+        self._stop_flag = True
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self.source is not None:
+            self.source.release()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        if self._thread:
+            self._thread.join(timeout)
+        return not self.running
+
+    def latest(self):
+        """取走最新的预览结果：(path, annotated, DetectionResult)，没有新结果时返回 None。"""
+        with self._lock:
+            item, self._latest = self._latest, None
+        return item
+
+    def progress(self) -> dict:
+        """进度：已完成 / 总数、失败数、images/sec（平滑值与平均值）、预计剩余时间（秒）。"""
+        if self._started_at is None:
+            elapsed = 0.0
+        else:
+            end = self._finished_at if self._finished_at is not None else time.perf_counter()
+            elapsed = end - self._started_at
+        failed = len(self.source.failed_paths) if self.source is not None else 0
+        processed = self.done + failed
+        remaining = max(self.total - processed, 0)
+        rate = self._rate
+        return {
+            "total": self.total,
+            "done": self.done,
+            "failed": failed,
+            "errors": self.errors,
+            "percent": round(processed * 100.0 / self.total, 1) if self.total else 0.0,
+            "images_per_sec": round(rate, 2),
+            "avg_images_per_sec": round(self.done / elapsed, 2) if elapsed > 0 else 0.0,
+            "elapsed": round(elapsed, 1),
+            "eta": round(remaining / rate, 1) if rate > 0 and self.running else None,
+            "running": self.running,
+        }
+
+    def _worker(self):
+        pin_current_thread("infer")
+        source = self.source
+        last = time.perf_counter()
+        try:
+            for indices, paths, frames in source.batches(self.batch_size):
+                if self._stop_flag:
+                    break
+                try:
+                    results = self.detector.infer_batch(frames, imgsz=self.imgsz, **self.filters)
+                except Exception:
+                    logger.exception("批量推理失败，跳过 %d 张: %s ...", len(paths), paths[0])
+                    self.errors += len(paths)
+                    continue
+
+                for index, path, result in zip(indices, paths, results):
+                    det_result = DetectionResult.from_yolo(result)
+                    det_result.frame_index = index
+                    det_result.imgsz = self.imgsz
+                    det_result.source = path
+                    det_result.scale_boxes(source.decode_scales.get(path, 1.0))
+                    if self.exporter is not None:
+                        self.exporter.write(det_result)
+
+                if self.preview:
+                    annotated = results[-1].plot()
+                    with self._lock:
+                        self._latest = (paths[-1], annotated, det_result)
+
+                self.done += len(paths)
+                now = time.perf_counter()
+                inst = len(paths) / max(now - last, 1e-6)
+                last = now
+                self._rate = inst if self._rate == 0.0 else (
+                    self.ema_alpha * inst + (1.0 - self.ema_alpha) * self._rate
+                )
+        except Exception:
+            logger.exception("目录批量检测线程异常")
+        finally:
+            self._finished_at = time.perf_counter()
+            source.release()
+            logger.info("目录批量检测结束: %s", self.progress())
@@ -6,15 +6,31 @@ DetectionController：负责协调 UI 与核心推理逻辑。
 - 持有 Detector 实例
 - 管理推理线程与输入/输出队列
 - 提供可选的“目标跟踪模式”
+- 提供可选的“跳帧推理模式”（关键帧之间做框传播）
+- 提供可选的“自适应分辨率模式”（按实测延迟调整 imgsz）
+- 提供可选的“运动门控”（画面无变化时复用上一帧结果，跳过推理）
+- 提供可选的“切片推理模式”（高分辨率帧切片批量推理，提升小目标召回）
+- 提供可选的“候选框重过滤”（低阈值推理并保存候选框，置信度 / IoU 调整后无需重新推理）
+- 推理结果发布到 ResultBus，显示 / 录像 / 导出等订阅者各自有独立的有界队列
 """
 
 import threading
 import queue
 import logging
-from typing import Optional
+import itertools
+import time
+from typing import Optional, Sequence
 
+from app.result_bus import ResultBus, Subscription
+from core.adaptive import AdaptiveResolution
 from core.detector import Detector
 from core.dto import DetectionResult
+from core.motion_gate import MotionGate
+from core.propagation import BoxPropagator
+from core.refilter import CandidateStore
+from core.thread_budget import pin_current_thread
+from core.tracker import ByteTracker
+from core.visualizer import Visualizer
 
 
 logger = logging.getLogger(__name__)
@@ -28,10 +44,20 @@ class DetectionController:
     - 提供可选的“目标跟踪模式”
     """
 
-    def __init__(self):
-        self.detector = Detector()
+    _instance_ids = itertools.count()
+
+    def __init__(self, detector: Optional[Detector] = None):
+        """
+        参数:
+            detector: 可传入共享的 Detector，多个控制器共用一份模型权重；
+                      各控制器的跟踪状态按 session 相互隔离
+        """
+        self.detector = detector if detector is not None else Detector()
         self.input_queue = queue.Queue(maxsize=1)
-        self.output_queue = queue.Queue(maxsize=1)
+        # 结果总线：所有订阅者共享同一份 (frame, annotated, DetectionResult)；
+        # get_result() 读取的是 "display" 订阅（只保留最新一帧）
+        self.result_bus = ResultBus()
+        self._display = self.result_bus.subscribe("display", maxsize=1, policy="drop_oldest")
         self.thread = None
         self.stop_flag = False
 
@@ -39,8 +65,48 @@ class DetectionController:
         self.enable_tracking = False
         # 默认使用 ByteTrack 作为跟踪器（ultralytics 自带 tracker 配置）
         self.tracker_cfg = "bytetrack.yaml"
+        # 跟踪后端："ultralytics"（model.track）或 "internal"（core.tracker.ByteTracker，
+        # 与推理解耦，可配合切片 / 批量推理使用）
+        self.tracker_backend = "ultralytics"
+        self.byte_tracker = ByteTracker()
+        # 跟踪会话：跟踪状态按 session 保存在适配器中，切换帧源时自动重置
+        self._session_prefix = f"ctrl{next(self._instance_ids)}"
+        self.source_id: Optional[str] = None
+        self.tracking_session = f"{self._session_prefix}:default"
         self.imgsz = 640  # 统一推理尺寸
 
+        # 帧序号（每次启动推理线程时重置）与结构化导出
+        self.frame_counter = 0
+        self.exporter = None  # core.exporter.BufferedSink，可选
+
+        # 帧缓冲池（core.frame_pool.FramePool，可选）：输入队列与结果总线按引用计数持有帧
+        self.frame_pool = None
+
+        # 跳帧推理：每 stride 帧做一次完整推理，中间帧由 propagator 传播
+        self.stride = 1
+        self.propagator: Optional[BoxPropagator] = None
+        self._last_key_index: Optional[int] = None
+
+        # 自适应分辨率：开启后 imgsz 由 adaptive 决定，self.imgsz 仅作为初始值
+        self.adaptive: Optional[AdaptiveResolution] = None
+
+        # 运动门控：画面无变化时复用 _last_result，不调用模型
+        self.motion_gate: Optional[MotionGate] = None
+        self._last_result: Optional[DetectionResult] = None
+
+        # 切片推理配置，None 表示关闭；开启跟踪时不生效
+        self.tiling: Optional[dict] = None
+
+        # 置信度 / NMS IoU 阈值，None 表示使用 Ultralytics 默认值（0.25 / 0.7）
+        self.conf: Optional[float] = None
+        self.iou: Optional[float] = None
+        # 类别白名单 / 按类别置信度阈值 / 每帧最大检测数，尽量下推到推理阶段执行
+        self.classes: Optional[list] = None
+        self.class_conf: Optional[dict] = None
+        self.max_det: Optional[int] = None
+        # 候选框重过滤：开启后以低阈值推理并按帧保存候选框，阈值变化时直接重过滤
+        self.candidates: Optional[CandidateStore] = None
+
         logger.debug("DetectionController 实例化完成")
 
     # ---------- 公共接口 ----------
@@ -62,30 +128,371 @@ class DetectionController:
             logger.error("模型加载失败: %s", info)
         return success, info
 
-    def set_tracking(self, enabled: bool, tracker_cfg: Optional[str] = None):
+    def set_tracking(
+        self,
+        enabled: bool,
+        tracker_cfg: Optional[str] = None,
+        backend: Optional[str] = None,
+    ):
         """
         设置是否启用跟踪以及使用的 tracker 配置文件。
 
         参数:
-            enabled: True 开启跟踪（会使用 model.track），False 则只做普通检测
+            enabled: True 开启跟踪，False 则只做普通检测
             tracker_cfg: 如 "bytetrack.yaml", "botsort.yaml"，为空则沿用当前配置
+                         （仅 ultralytics 后端使用）
+            backend: "ultralytics"（model.track）或 "internal"（内置向量化 ByteTracker），
+                     为空则沿用当前配置
         """
+        if backend is not None:
+            if backend not in ("ultralytics", "internal"):
+                raise ValueError(f"不支持的跟踪后端: {backend}")
+            self.tracker_backend = backend
         self.enable_tracking = enabled
         if tracker_cfg is not None:
             self.tracker_cfg = tracker_cfg
 
         logger.info(
-            "更新 tracking 配置: enabled=%s, tracker_cfg=%s",
+            "更新 tracking 配置: enabled=%s, tracker_cfg=%s, backend=%s",
             self.enable_tracking,
             self.tracker_cfg,
+            self.tracker_backend,
+        )
+
+    def set_exporter(self, exporter):
+        """
+        设置结构化结果导出器（见 core/exporter.py），传 None 取消导出。
+
+        导出器作为 ResultBus 的 "exporter" 订阅者接收每一帧结果（block 策略，尽量不丢帧）。
+        取消时会先把已排队的结果写完再返回；导出器的生命周期由调用方管理（负责 close）。
+        """
+        self.result_bus.unsubscribe("exporter", wait=True)
+        self.exporter = exporter
+        if exporter is not None:
+            self.result_bus.attach(
+                "exporter",
+                lambda item: exporter.write(item[2]),
+                maxsize=256,
+                policy="block",
+            )
+        logger.info(
+            "更新结果导出器: %s",
+            exporter.__class__.__name__ if exporter is not None else None,
+        )
+
+    def set_frame_pool(self, frame_pool):
+        """
+        设置帧缓冲池（与 FrameSource 使用同一个池）。
+
+        设置后 submit_frame 在入队时 retain 帧，推理与发布完成后 release；
+        get_result() 取出的结果用完后需调用 release_result()。
+        """
+        self.frame_pool = frame_pool
+        self.result_bus.frame_pool = frame_pool
+        logger.info("更新帧缓冲池: %s", frame_pool.stats() if frame_pool is not None else None)
+
+    def release_result(self, result):
+        """归还 get_result() 取出的结果所持有的帧引用（未设置缓冲池时无操作）。"""
+        self._display.release(result)
+
+    def set_source(self, source_id: str):
+        """
+        声明当前帧源（视频路径 / 摄像头 ID 等），在开始新一轮检测前调用。
+
+        每次调用都会为该帧源开启一份全新的跟踪状态，旧帧源的状态被释放，
+        因此切换视频不会带入上一个视频的轨迹 ID 和卡尔曼状态。
+        """
+        old_session = self.tracking_session
+        self.source_id = str(source_id)
+        self.tracking_session = f"{self._session_prefix}:{self.source_id}"
+        if old_session != self.tracking_session:
+            self.detector.reset_tracker(old_session)
+        self.reset_tracking()
+        logger.info("切换帧源: source_id=%s, session=%s", self.source_id, self.tracking_session)
+
+    def reset_tracking(self):
+        """
+        重置当前帧源的跟踪状态（不重新加载模型）。
+
+        同时清空跳帧传播和运动门控复用的上一帧结果，避免旧 ID 延续到新画面。
+        """
+        self.detector.reset_tracker(self.tracking_session)
+        self.byte_tracker.reset()
+        self._last_key_index = None
+        self._last_result = None
+        if self.propagator is not None:
+            self.propagator.reset()
+
+    def set_stride(self, stride: int, propagation: str = "flow"):
+        """
+        设置跳帧推理。
+
+        参数:
+            stride: 每隔多少帧做一次完整推理，<=1 表示逐帧推理（关闭跳帧）
+            propagation: 中间帧的传播方式，"flow"（稀疏光流）或
+                         "velocity"（按 track_id 匀速外推，需开启跟踪）
+        """
+        self.stride = max(int(stride), 1)
+        if self.stride > 1:
+            self.propagator = BoxPropagator(mode=propagation)
+        else:
+            self.propagator = None
+        self._last_key_index = None
+
+        logger.info(
+            "更新跳帧推理配置: stride=%d, propagation=%s",
+            self.stride,
+            propagation if self.propagator is not None else None,
+        )
+
+    def set_adaptive_resolution(
+        self,
+        enabled: bool,
+        target_fps: Optional[float] = None,
+        latency_budget_ms: Optional[float] = None,
+        ladder: Sequence[int] = (320, 480, 640, 960),
+    ):
+        """
+        开启 / 关闭自适应分辨率。
+
+        开启后按实测推理延迟在 ladder 档位间切换 imgsz，以维持目标 FPS 或延迟预算。
+        注意：固定输入尺寸导出的 ONNX 模型无法切换 imgsz，不要开启。
+        """
+        if enabled:
+            self.adaptive = AdaptiveResolution(
+                ladder=ladder,
+                target_fps=target_fps,
+                latency_budget_ms=latency_budget_ms,
+                initial=self.imgsz,
+            )
+        else:
+            self.adaptive = None
+
+        logger.info(
+            "更新自适应分辨率配置: enabled=%s, target_fps=%s, latency_budget_ms=%s, ladder=%s",
+            enabled,
+            target_fps,
+            latency_budget_ms,
+            list(ladder),
+        )
+
+    def set_motion_gate(self, enabled: bool, min_changed_ratio: float = 0.003):
+        """
+        开启 / 关闭推理前的运动门控。
+
+        参数:
+            enabled: 是否开启
+            min_changed_ratio: 变化像素占比阈值，越小越敏感（越少跳过）
+        """
+        if enabled:
+            self.motion_gate = MotionGate(min_changed_ratio=min_changed_ratio)
+        else:
+            self.motion_gate = None
+
+        logger.info(
+            "更新运动门控配置: enabled=%s, min_changed_ratio=%s",
+            enabled,
+            min_changed_ratio,
+        )
+
+    def set_tiling(
+        self,
+        enabled: bool,
+        tile_size: Optional[int] = None,
+        overlap: float = 0.2,
+        global_pass: bool = True,
+    ):
+        """
+        开启 / 关闭切片推理。
+
+        参数:
+            enabled: 是否开启
+            tile_size: 切片边长，默认等于当前推理尺寸
+            overlap: 相邻切片重叠比例
+            global_pass: 是否额外做一次整帧低分辨率推理以补充大目标
+
+        说明：切片结果经过跨切片 NMS 重新组合，不经过 Ultralytics 跟踪器，
+        因此 ultralytics 跟踪后端下该选项不生效；internal 后端可以正常跟踪切片结果。
+        """
+        if enabled:
+            self.tiling = {
+                "tile_size": tile_size,
+                "overlap": overlap,
+                "global_pass": global_pass,
+            }
+        else:
+            self.tiling = None
+
+        logger.info("更新切片推理配置: %s", self.tiling)
+        if enabled and self._uses_ultralytics_tracker():
+            logger.warning("已开启 Ultralytics 跟踪，切片推理在该模式下不生效")
+
+    def set_filter(
+        self,
+        conf: Optional[float] = None,
+        iou: Optional[float] = None,
+        classes: Optional[Sequence[int]] = None,
+        class_conf: Optional[dict] = None,
+        max_det: Optional[int] = None,
+    ):
+        """
+        设置检测过滤条件（None 表示不限制 / 模型默认值），下一帧起生效。
+
+        参数:
+            conf / iou: 置信度与 NMS IoU 阈值
+            classes: 类别白名单（class_id），交给 Ultralytics 在 NMS 之前过滤，
+                     其余类别不会进入 NMS、from_yolo、绘制与文本格式化
+            class_conf: 按类别覆盖置信度阈值 {class_id: conf}，在适配器返回 Results 之前过滤
+            max_det: 每帧最多保留的检测数
+
+        开启了候选框重过滤时，可随后调用 refilter(frame_index) 立即得到已处理帧在新条件下的结果
+        （类别白名单只能在推理时保留下来的类别中进一步收窄）。
+        """
+        self.conf = conf
+        self.iou = iou
+        self.classes = None if classes is None else list(classes)
+        self.class_conf = dict(class_conf) if class_conf else None
+        self.max_det = max_det
+        logger.info(
+            "更新检测过滤条件: conf=%s, iou=%s, classes=%s, class_conf=%s, max_det=%s",
+            conf,
+            iou,
+            self.classes,
+            self.class_conf,
+            max_det,
+        )
+
+    def set_refilter(
+        self,
+        enabled: bool,
+        candidate_conf: float = 0.01,
+        candidate_iou: float = 0.7,
+        max_frames: Optional[int] = 100000,
+    ):
+        """
+        开启 / 关闭候选框重过滤。
+
+        开启后普通推理以 candidate_conf / candidate_iou、不限类别运行，每帧的候选框保存在 self.candidates 中，
+        输出结果按 set_filter 的阈值与类别白名单向量化重过滤得到；Ultralytics 跟踪与切片推理模式下不生效。
+
+        参数:
+            candidate_conf: 推理使用的低置信度阈值（可调整的置信度下限）
+            candidate_iou: 推理使用的 NMS IoU 阈值（可调整的 IoU 上限）
+            max_frames: 最多保存的帧数（一帧约数百字节到数 KB）
+        """
+        if enabled:
+            self.candidates = CandidateStore(candidate_conf, candidate_iou, max_frames=max_frames)
+        else:
+            self.candidates = None
+        logger.info(
+            "更新候选框重过滤配置: enabled=%s, candidate_conf=%s, candidate_iou=%s",
+            enabled,
+            candidate_conf,
+            candidate_iou,
         )
 
+    def filter_kwargs(self) -> dict:
+        """当前过滤条件，可直接作为 Detector.infer / infer_batch 的关键字参数。"""
+        return {
+            "conf": self.conf,
+            "iou": self.iou,
+            "classes": self.classes,
+            "class_conf": self.class_conf,
+            "max_det": self.max_det,
+        }
+
+    def refilter(self, frame_index: int) -> Optional[DetectionResult]:
+        """按当前阈值重过滤已保存的一帧；未开启重过滤或该帧没有候选框时返回 None。"""
+        if self.candidates is None:
+            return None
+        return self.candidates.filter(
+            frame_index, self.conf, self.iou, self.classes, self.max_det, self.class_conf
+        )
+
+    def stats(self) -> dict:
+        """返回当前会话的运行统计（帧数、推理尺寸、门控跳过率等）。"""
+        stats = {
+            "frames_submitted": self.frame_counter,
+            "imgsz": self.current_imgsz,
+        }
+        if self.adaptive is not None:
+            stats["adaptive"] = self.adaptive.stats()
+        if self.motion_gate is not None:
+            stats["motion_gate"] = self.motion_gate.stats()
+        stats["result_bus"] = self.result_bus.stats()
+        if self.frame_pool is not None:
+            stats["frame_pool"] = self.frame_pool.stats()
+        if self.detector.prediction_cache is not None:
+            stats["prediction_cache"] = self.detector.prediction_cache.stats()
+        if self.candidates is not None:
+            stats["candidate_frames"] = len(self.candidates)
+        return stats
+
+    def queue_stats(self) -> dict:
+        """
+        各队列当前积压 {名称: (当前深度, 容量)}，容量 0 表示无界；供 core.memory_monitor.MemoryMonitor 采样。
+
+        包括输入队列、结果总线的各订阅队列（订阅者共享同一份帧）与导出器尚未落盘的结果。
+        """
+        queues = {"input": (self.input_queue.qsize(), self.input_queue.maxsize)}
+        for name, sub in self.result_bus.stats()["subscribers"].items():
+            queues[f"bus:{name}"] = (sub["queue_depth"], sub["queue_size"])
+        if self.exporter is not None:
+            queues["exporter"] = (self.exporter.stats()["pending"], 0)
+        if self.frame_pool is not None:
+            pool = self.frame_pool.stats()
+            queues["frame_pool"] = (pool["in_use"], pool["capacity"])
+        return queues
+
+    def subscribe_results(
+        self,
+        name: str,
+        maxsize: int = 1,
+        policy: str = "drop_oldest",
+        callback=None,
+    ) -> Subscription:
+        """
+        订阅推理结果：每条结果为 (original_frame, annotated_frame, DetectionResult)，
+        图像为只读数组，与其他订阅者共享同一份数据。
+
+        参数:
+            name: 订阅者名称（"display" / "exporter" 为内部保留）
+            maxsize: 订阅队列容量
+            policy: "drop_oldest" / "drop_newest" / "block"，见 app/result_bus.py
+            callback: 为空时返回被动订阅（调用方 get_nowait / drain）；
+                      否则在独立线程中逐条调用 callback(item)
+        """
+        if name in ("display", "exporter"):
+            raise ValueError(f"订阅者名称为内部保留: {name}")
+        if callback is None:
+            return self.result_bus.subscribe(name, maxsize=maxsize, policy=policy)
+        return self.result_bus.attach(name, callback, maxsize=maxsize, policy=policy)
+
+    def unsubscribe_results(self, name: str, wait: bool = True):
+        """取消订阅（wait=True 时先处理完队列中剩余结果）。"""
+        self.result_bus.unsubscribe(name, wait=wait)
+
+    @property
+    def current_imgsz(self) -> int:
+        """当前实际使用的推理尺寸。"""
+        return self.adaptive.imgsz if self.adaptive is not None else self.imgsz
+
     def start_inference_thread(self):
         """启动后台推理线程。"""
         if self.thread and self.thread.is_alive():
             logger.debug("推理线程已在运行，忽略重复启动请求")
             return
         self.stop_flag = False
+        self.frame_counter = 0
+        self._last_key_index = None
+        self._last_result = None
+        if self.propagator is not None:
+            self.propagator.reset()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        if self.candidates is not None:
+            # 帧序号从 0 重新开始，旧会话的候选框不再对应
+            self.candidates.clear()
         self.thread = threading.Thread(target=self._inference_worker, daemon=True)
         self.thread.start()
         logger.info("推理线程启动")
@@ -108,35 +515,55 @@ class DetectionController:
         self.thread.join(timeout=2)
         logger.info("推理线程已结束")
 
-        # 清空队列
-        with self.input_queue.mutex:
-            self.input_queue.queue.clear()
-        with self.output_queue.mutex:
-            self.output_queue.queue.clear()
+        # 清空输入队列与显示队列；其他订阅者（录像 / 导出）保留剩余结果，由各自处理完
+        while True:
+            try:
+                item = self.input_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._release_frame(item[2])
+        self._display.clear()
 
-    def submit_frame(self, frame):
+    def submit_frame(self, frame, timestamp: Optional[float] = None):
         """
         向推理线程提交一帧图像。
 
         为保证实时性，如果队列已满，会丢弃旧帧，只保留最新。
+        被丢弃的帧同样占用帧序号，因此导出结果中的 frame_index 与帧源一致。
+
+        参数:
+            frame: BGR 图像
+            timestamp: 帧时间戳（秒），为空时使用当前系统时间
         """
         if self.detector.adapter is None:
             logger.warning("submit_frame 调用时模型尚未加载，忽略该帧")
             return
 
+        frame_index = self.frame_counter
+        self.frame_counter += 1
+        if timestamp is None:
+            timestamp = time.time()
+
+        # 输入队列持有一次帧引用（调用方可在 submit 之后立即 release 自己的引用）
+        if self.frame_pool is not None:
+            self.frame_pool.retain(frame)
+
         try:
             # 如果已满，尝试丢弃旧数据
             if self.input_queue.full():
                 try:
                     dropped = self.input_queue.get_nowait()
-                    del dropped
+                    if dropped is not None:
+                        self._release_frame(dropped[2])
                     logger.debug("输入队列已满，丢弃一帧旧数据")
                 except queue.Empty:
                     pass
 
-            self.input_queue.put_nowait(frame)
+            self.input_queue.put_nowait((frame_index, timestamp, frame))
         except queue.Full:
             # 极端情况下仍可能满，直接丢弃最新帧
+            self._release_frame(frame)
             logger.debug("输入队列仍然满，丢弃最新帧")
 
     def get_result(self):
@@ -146,64 +573,185 @@ class DetectionController:
         返回:
             (original_frame, annotated_frame, DetectionResult) 或 None
         """
-        try:
-            return self.output_queue.get_nowait()
-        except queue.Empty:
-            return None
+        return self._display.get_nowait()
 
     # ---------- 内部线程函数 ----------
 
     def _inference_worker(self):
         """
         推理线程主体：循环从 input_queue 中取帧，执行检测或跟踪，
-        然后将结果放入 output_queue。
+        然后将结果发布到 result_bus。
         """
+        pin_current_thread("infer")
         logger.info(
-            "推理线程开始运行 (imgsz=%d, tracking=%s, tracker_cfg=%s)",
-            self.imgsz,
+            "推理线程开始运行 (imgsz=%d, adaptive=%s, tracking=%s, tracker_cfg=%s, stride=%d)",
+            self.current_imgsz,
+            self.adaptive is not None,
             self.enable_tracking,
             self.tracker_cfg,
+            self.stride,
         )
 
         while not self.stop_flag:
             try:
-                frame = self.input_queue.get(timeout=1)
+                item = self.input_queue.get(timeout=1)
             except queue.Empty:
                 continue
 
-            if frame is None:
+            if item is None:
                 logger.debug("推理线程收到结束标记 None，准备退出")
                 break
 
+            frame_index, timestamp, frame = item
+
             try:
-                # 根据开关决定是纯检测还是跟踪模式
-                if self.enable_tracking:
-                    result = self.detector.track(
-                        frame,
-                        imgsz=self.imgsz,
-                        tracker_cfg=self.tracker_cfg,
-                        persist=True,
-                    )
-                else:
-                    result = self.detector.infer(frame, imgsz=self.imgsz)
-
-                annotated = result.plot()
-                det_result = DetectionResult.from_yolo(result)
-
-                # 输出队列同样保持最新一帧
-                if self.output_queue.full():
-                    try:
-                        old = self.output_queue.get_nowait()
-                        del old
-                        logger.debug("输出队列已满，丢弃一帧旧结果")
-                    except queue.Empty:
-                        pass
-
-                self.output_queue.put_nowait((frame, annotated, det_result))
+                annotated, det_result = self._process_frame(frame_index, frame)
+                det_result.frame_index = frame_index
+                det_result.timestamp = timestamp
+
+                # 各订阅者按自己的队列策略接收，同一份结果按引用共享
+                self.result_bus.publish((frame, annotated, det_result))
 
             except Exception:
                 logger.exception("推理线程处理帧时发生异常")
             finally:
+                # 各订阅者已各自持有引用，释放输入队列的那一次
+                self._release_frame(frame)
                 self.input_queue.task_done()
 
+        if self.motion_gate is not None:
+            logger.info(
+                "运动门控统计: 总帧数=%d, 跳过=%d, 跳过率=%.1f%%",
+                self.motion_gate.total_frames,
+                self.motion_gate.skipped_frames,
+                self.motion_gate.skip_ratio * 100,
+            )
         logger.info("推理线程正常退出")
+
+    def _release_frame(self, frame):
+        if self.frame_pool is not None:
+            self.frame_pool.release(frame)
+
+    def _uses_ultralytics_tracker(self) -> bool:
+        return self.enable_tracking and self.tracker_backend == "ultralytics"
+
+    def _is_keyframe(self, frame_index: int) -> bool:
+        if self.propagator is None or self.stride <= 1:
+            return True
+        if self._last_key_index is None:
+            return True
+        return frame_index - self._last_key_index >= self.stride
+
+    def _process_frame(self, frame_index: int, frame):
+        """
+        处理单帧，返回 (annotated_frame, DetectionResult)。
+
+        关键帧执行完整推理；跳帧模式下的中间帧只做框传播；
+        运动门控判定画面无变化时直接复用上一帧结果。
+        """
+        if (
+            self.motion_gate is not None
+            and not self.motion_gate.should_infer(frame)
+            and self._last_result is not None
+        ):
+            last = self._last_result
+            det_result = DetectionResult(
+                last.detections, last.names, inferred=False, imgsz=last.imgsz
+            )
+            return Visualizer.draw_detections(frame, det_result), det_result
+
+        annotated, det_result = self._run_frame(frame_index, frame)
+        self._last_result = det_result
+        return annotated, det_result
+
+    def _run_frame(self, frame_index: int, frame):
+        """执行推理或跳帧传播（不含运动门控）。"""
+        if not self._is_keyframe(frame_index):
+            det_result = self.propagator.propagate(frame, frame_index)
+            if det_result is not None:
+                det_result.imgsz = self.current_imgsz
+                return Visualizer.draw_detections(frame, det_result), det_result
+
+        imgsz = self.current_imgsz
+        t0 = time.perf_counter()
+
+        # 根据开关决定是纯检测、切片检测还是 Ultralytics 跟踪模式
+        if self._uses_ultralytics_tracker():
+            result = self.detector.track(
+                frame,
+                imgsz=imgsz,
+                tracker_cfg=self.tracker_cfg,
+                persist=True,
+                conf=self.conf,
+                iou=self.iou,
+                session=self.tracking_session,
+                classes=self.classes,
+                class_conf=self.class_conf,
+                max_det=self.max_det,
+            )
+        elif self.tiling is not None:
+            result = None
+            det_result = self.detector.infer_tiled(
+                frame,
+                imgsz=imgsz,
+                conf=self.conf,
+                iou=self.iou,
+                classes=self.classes,
+                class_conf=self.class_conf,
+                max_det=self.max_det,
+                **self.tiling,
+            )
+        elif self.candidates is not None:
+            # 低阈值、全部类别推理保存候选框，类别白名单与阈值只在重过滤时应用，之后放宽也无需重新推理
+            candidates = self.candidates
+            raw = DetectionResult.from_yolo(
+                self.detector.infer(
+                    frame,
+                    imgsz=imgsz,
+                    conf=candidates.candidate_conf,
+                    iou=candidates.candidate_iou,
+                )
+            )
+            raw.frame_index = frame_index
+            raw.imgsz = imgsz
+            candidates.add(raw)
+            result = None
+            filters = (self.conf, self.iou, self.classes, self.max_det, self.class_conf)
+            # 使用局部的 candidates：界面线程可能在此期间关闭重过滤，该帧也可能已被 max_frames 淘汰
+            det_result = candidates.filter(frame_index, *filters)
+            if det_result is None:
+                det_result = candidates.filter_result(raw, *filters)
+        else:
+            result = self.detector.infer(
+                frame,
+                imgsz=imgsz,
+                conf=self.conf,
+                iou=self.iou,
+                classes=self.classes,
+                class_conf=self.class_conf,
+                max_det=self.max_det,
+            )
+
+        if self.adaptive is not None:
+            self.adaptive.update(time.perf_counter() - t0)
+
+        if result is not None:
+            det_result = DetectionResult.from_yolo(result)
+        det_result.frame_index = frame_index
+        det_result.imgsz = imgsz
+
+        if self.enable_tracking and self.tracker_backend == "internal":
+            # 推理与关联解耦：检测结果交给内置跟踪器写入 track_id
+            det_result = self.byte_tracker.update(det_result)
+            result = None
+
+        if result is not None:
+            annotated = result.plot()
+        else:
+            annotated = Visualizer.draw_detections(frame, det_result)
+
+        if self.propagator is not None:
+            self.propagator.update_keyframe(frame, det_result)
+            self._last_key_index = frame_index
+
+        return annotated, det_result
@@ -0,0 +1,363 @@
+# app/multi_stream.py
+
+"""
+MultiStreamController：单进程内多路帧源共享一个模型，按批推理。
+
+- 每路帧源一个读取线程，只保留最新一帧（旧帧被覆盖时计入丢帧）
+- 一个批推理线程：轮询各路最新帧组成 batch，一次前向推理后把结果分发到各路输出队列
+- 公平性：每个 batch 每路最多取一帧，并且起始路轮转，忙碌的流无法挤占其他流
+- 可选跟踪：每路一个独立的跟踪 session，共用同一份模型权重；
+  internal 后端下仍整批推理，再逐路交给各自的内置 ByteTracker 关联
+"""
+
+import threading
+import queue
+import time
+import logging
+from collections import deque
+from typing import Dict, List, Optional
+
+from core.detector import Detector
+from core.dto import DetectionResult
+from core.source import FrameSource, SourceType
+from core.thread_budget import pin_current_thread
+from core.tracker import ByteTracker
+from core.visualizer import Visualizer
+
+logger = logging.getLogger(__name__)
+
+
+class StreamStats:
+    """单路流的统计信息（读取 / 推理帧率、丢帧数）。"""
+
+    def __init__(self, window: float = 5.0):
+        self.window = window
+        self.frames_read = 0
+        self.frames_inferred = 0
+        self.frames_dropped = 0
+        self._read_times = deque()
+        self._infer_times = deque()
+
+    def on_read(self, now: float):
+        self.frames_read += 1
+        self._push(self._read_times, now)
+
+    def on_inferred(self, now: float):
+        self.frames_inferred += 1
+        self._push(self._infer_times, now)
+
+    def _push(self, times: deque, now: float):
+        times.append(now)
+        while times and now - times[0] > self.window:
+            times.popleft()
+
+    @staticmethod
+    def _rate(times: deque) -> float:
+        if len(times) < 2:
+            return 0.0
+        span = times[-1] - times[0]
+        return (len(times) - 1) / span if span > 0 else 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "frames_read": self.frames_read,
+            "frames_inferred": self.frames_inferred,
+            "frames_dropped": self.frames_dropped,
+            "read_fps": round(self._rate(self._read_times), 2),
+            "infer_fps": round(self._rate(self._infer_times), 2),
+        }
+
+
+class _Stream:
+    """单路流的内部状态。"""
+
+    def __init__(self, name: str, source: FrameSource):
+        self.name = name
+        self.source = source
+        self.latest = None  # (frame_index, timestamp, frame)
+        self.frame_counter = 0
+        self.output_queue = queue.Queue(maxsize=1)
+        self.stats = StreamStats()
+        self.thread: Optional[threading.Thread] = None
+        self.finished = False
+        self.tracker = ByteTracker()
+
+
+class MultiStreamController:
+    """
+    多路流控制器：N 个 FrameSource 共享一个 Detector，批量推理。
+
+    用法:
+        ctrl = MultiStreamController(max_batch=8)
+        ctrl.load_model("yolo.pt", "pt")
+        ctrl.add_source("cam0", FrameSource(SourceType.CAMERA, 0))
+        ctrl.add_source("cam1", FrameSource(SourceType.CAMERA, 1))
+        ctrl.start()
+        ...
+        result = ctrl.get_result("cam0")  # (frame, annotated, DetectionResult) 或 None
+    """
+
+    def __init__(
+        self,
+        detector: Optional[Detector] = None,
+        max_batch: int = 8,
+        imgsz: int = 640,
+        annotate: bool = True,
+        tracking: bool = False,
+        tracker_cfg: str = "bytetrack.yaml",
+        tracker_backend: str = "ultralytics",
+    ):
+        """
+        参数:
+            detector: 共享的 Detector，为空时内部新建（需调用 load_model）
+            max_batch: 单次前向推理的最大帧数
+            imgsz: 推理尺寸
+            annotate: 是否为每帧生成标注图（关闭可节省 CPU）
+            tracking: 是否启用跟踪（Ultralytics 跟踪需逐帧调用，batch 内逐路执行）
+            tracker_cfg: 跟踪器配置文件（仅 ultralytics 后端）
+            tracker_backend: "ultralytics" 或 "internal"（内置 ByteTracker，保持整批推理）
+        """
+        if tracker_backend not in ("ultralytics", "internal"):
+            raise ValueError(f"不支持的跟踪后端: {tracker_backend}")
+        self.detector = detector if detector is not None else Detector()
+        self.max_batch = max(int(max_batch), 1)
+        self.imgsz = imgsz
+        self.annotate = annotate
+        self.tracking = tracking
+        self.tracker_cfg = tracker_cfg
+        self.tracker_backend = tracker_backend
+
+        self.streams: Dict[str, _Stream] = {}
+        self._order: List[str] = []
+        self._rr = 0  # 轮转起点
+        self._cond = threading.Condition()
+        self._stop_flag = False
+        self._worker: Optional[threading.Thread] = None
+
+        self.batch_count = 0
+        self.batch_frames = 0
+
+        logger.debug("MultiStreamController 实例化完成")
+
+    # ---------- 公共接口 ----------
+
+    def load_model(self, model_path: str, model_format: str):
+        logger.info(
+            "MultiStreamController: 请求加载模型 path=%s, format=%s",
+            model_path,
+            model_format,
+        )
+        return self.detector.load_model(model_path, model_format)
+
+    def add_source(self, name: str, source: FrameSource):
+        """添加一路帧源（需在 start 之前调用）。"""
+        if name in self.streams:
+            raise ValueError(f"重复的流名称: {name}")
+        self.streams[name] = _Stream(name, source)
+        self._order.append(name)
+        logger.info("添加帧源: name=%s, type=%s", name, source.source_type)
+
+    def start(self):
+        """打开所有帧源，启动读取线程与批推理线程。"""
+        if self.detector.adapter is None:
+            raise RuntimeError("模型未加载")
+        if self._worker and self._worker.is_alive():
+            logger.debug("多路推理已在运行，忽略重复启动请求")
+            return
+
+        self._stop_flag = False
+        for stream in self.streams.values():
+            if self.tracking:
+                self.detector.reset_tracker(self._session_of(stream))
+                stream.tracker.reset()
+            if not stream.source.is_open and not stream.source.open():
+                logger.error("帧源打开失败，跳过: %s", stream.name)
+                stream.finished = True
+                continue
+            stream.finished = False
+            stream.thread = threading.Thread(
+                target=self._reader_worker, args=(stream,), daemon=True
+            )
+            stream.thread.start()
+
+        self._worker = threading.Thread(target=self._batch_worker, daemon=True)
+        self._worker.start()
+        logger.info(
+            "多路推理启动: streams=%d, max_batch=%d, imgsz=%d",
+            len(self.streams),
+            self.max_batch,
+            self.imgsz,
+        )
+
+    def stop(self):
+        """停止所有线程并释放帧源。"""
+        logger.info("请求停止多路推理")
+        self._stop_flag = True
+        with self._cond:
+            self._cond.notify_all()
+
+        if self._worker:
+            self._worker.join(timeout=2)
+        for stream in self.streams.values():
+            if stream.thread:
+                stream.thread.join(timeout=2)
+            stream.source.release()
+            stream.latest = None
+            with stream.output_queue.mutex:
+                stream.output_queue.queue.clear()
+        logger.info("多路推理已停止")
+
+    def get_result(self, name: str):
+        """
+        非阻塞获取某一路的最新结果。
+
+        返回:
+            (original_frame, annotated_frame, DetectionResult) 或 None
+        """
+        try:
+            return self.streams[name].output_queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def stats(self) -> dict:
+        """各路流的帧率 / 丢帧统计，以及整体的平均 batch 大小。"""
+        per_stream = {name: s.stats.snapshot() for name, s in self.streams.items()}
+        avg_batch = self.batch_frames / self.batch_count if self.batch_count else 0.0
+        return {
+            "streams": per_stream,
+            "batch_count": self.batch_count,
+            "avg_batch_size": round(avg_batch, 2),
+        }
+
+    # ---------- 内部线程函数 ----------
+
+    @staticmethod
+    def _session_of(stream: _Stream) -> str:
+        return f"multi:{stream.name}"
+
+    def _run_batch(self, batch: List[tuple]) -> list:
+        frames = [item[2] for _, item in batch]
+        if not self.tracking or self.tracker_backend == "internal":
+            return self.detector.infer_batch(frames, imgsz=self.imgsz)
+        return [
+            self.detector.track(
+                frame,
+                imgsz=self.imgsz,
+                tracker_cfg=self.tracker_cfg,
+                persist=True,
+                session=self._session_of(stream),
+            )
+            for (stream, _), frame in zip(batch, frames)
+        ]
+
+    def _reader_worker(self, stream: _Stream):
+        """读取线程：持续读帧，只保留最新一帧。"""
+        pin_current_thread("decode")
+        source = stream.source
+        frame_interval = 0.0
+        if source.source_type == SourceType.VIDEO and source.is_open:
+            # 视频文件（包括帧缓存命中、没有打开解码器的情况）按原始帧率读取，否则会被瞬间读完、几乎全部丢弃
+            fps = source.fps
+            frame_interval = 1.0 / fps if fps > 0 else 0.04
+
+        next_time = time.perf_counter()
+        for flag, frame in source.frames():
+            if self._stop_flag:
+                break
+            if flag == "end":
+                break
+
+            now = time.time()
+            with self._cond:
+                if stream.latest is not None:
+                    stream.stats.frames_dropped += 1
+                stream.latest = (stream.frame_counter, now, frame)
+                stream.frame_counter += 1
+                stream.stats.on_read(now)
+                self._cond.notify()
+
+            if frame_interval > 0:
+                next_time += frame_interval
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_time = time.perf_counter()
+
+        stream.finished = True
+        logger.info("帧源读取结束: %s", stream.name)
+
+    def _collect_batch(self) -> List[tuple]:
+        """按轮转顺序从各路取最新帧组成 batch，每路最多一帧。"""
+        batch = []
+        n = len(self._order)
+        for k in range(n):
+            name = self._order[(self._rr + k) % n]
+            stream = self.streams[name]
+            if stream.latest is None:
+                continue
+            batch.append((stream, stream.latest))
+            stream.latest = None
+            if len(batch) >= self.max_batch:
+                break
+        # 下一个 batch 从本次最后一路的下一路开始，保证公平
+        if batch and n:
+            last = self._order.index(batch[-1][0].name)
+            self._rr = (last + 1) % n
+        return batch
+
+    def _batch_worker(self):
+        pin_current_thread("infer")
+        logger.info("批推理线程开始运行")
+        while not self._stop_flag:
+            with self._cond:
+                batch = self._collect_batch()
+                while not batch and not self._stop_flag:
+                    if all(s.finished for s in self.streams.values()):
+                        break
+                    self._cond.wait(timeout=0.5)
+                    batch = self._collect_batch()
+            if not batch:
+                if all(s.finished for s in self.streams.values()):
+                    logger.info("所有帧源均已结束")
+                    break
+                continue
+
+            try:
+                results = self._run_batch(batch)
+            except Exception:
+                logger.exception("批推理失败，丢弃本批 %d 帧", len(batch))
+                continue
+
+            self.batch_count += 1
+            self.batch_frames += len(batch)
+            now = time.time()
+            for (stream, (frame_index, timestamp, frame)), result in zip(batch, results):
+                try:
+                    det_result = DetectionResult.from_yolo(result)
+                    det_result.frame_index = frame_index
+                    det_result.timestamp = timestamp
+                    det_result.imgsz = self.imgsz
+                    if self.tracking and self.tracker_backend == "internal":
+                        det_result = stream.tracker.update(det_result)
+                        annotated = (
+                            Visualizer.draw_detections(frame, det_result)
+                            if self.annotate
+                            else None
+                        )
+                    else:
+                        annotated = result.plot() if self.annotate else None
+                except Exception:
+                    logger.exception("解析结果失败: stream=%s", stream.name)
+                    continue
+
+                stream.stats.on_inferred(now)
+                out = stream.output_queue
+                if out.full():
+                    try:
+                        out.get_nowait()
+                    except queue.Empty:
+                        pass
+                out.put_nowait((frame, annotated, det_result))
+
+        logger.info("批推理线程正常退出")
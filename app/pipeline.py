@@ -0,0 +1,497 @@
+# app/pipeline.py
+
+"""
+Pipeline：分阶段的检测流水线引擎。
+
+    source → preprocess → infer → postprocess → annotate → sinks(display / writer / exporter ...)
+
+- 每个阶段有独立的工作线程（可多个）和有界输入队列
+- 队列满时的策略显式指定："block"（阻塞上游，不丢帧）/ "drop_oldest"（丢弃最旧帧）/
+  "drop_newest"（丢弃当前帧）
+- 各阶段并行运行，整体吞吐由最慢的阶段决定，而不是所有阶段耗时之和
+- 推理阶段共用一个模型：UltralyticsAdapter 在 _track_lock 内串行调用 predictor（predictor 不可重入），
+  多个推理线程不会并行推理，只会争抢这把锁；要提高推理吞吐应增大 batch 或使用多进程 / 多个 Detector
+- 帧源结束时结束标记沿流水线传递，各阶段处理完剩余数据后退出；stop() 可随时中止
+- stats() 提供每个阶段的处理数、丢弃数、队列深度与利用率（忙碌时间 / 运行时间）
+"""
+
+import threading
+import queue
+import logging
+import time
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from core.detector import Detector
+from core.dto import DetectionResult
+from core.source import FrameSource, SourceType
+from core.thread_budget import pin_current_thread
+from core.visualizer import Visualizer
+
+logger = logging.getLogger(__name__)
+
+QUEUE_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+# 帧源结束标记，沿流水线逐级传递
+_END = object()
+
+
+class PipelineItem:
+    """流水线中流转的单帧数据，各阶段按需填充字段。"""
+
+    __slots__ = ("frame_index", "timestamp", "frame", "raw", "det_result", "annotated")
+
+    def __init__(self, frame_index: int, timestamp: float, frame):
+        self.frame_index = frame_index
+        self.timestamp = timestamp
+        self.frame = frame
+        self.raw = None  # Ultralytics Results（postprocess 之后可丢弃）
+        self.det_result: Optional[DetectionResult] = None
+        self.annotated = None
+
+
+class Stage:
+    """
+    流水线中的一个阶段。
+
+    fn(item) 返回处理后的 item（可以是同一个对象）；返回 None 表示丢弃该帧。
+    sink 阶段的 fn 返回值被忽略。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        workers: int = 1,
+        queue_size: int = 4,
+        policy: str = "block",
+        on_close: Optional[Callable] = None,
+    ):
+        """
+        参数:
+            name: 阶段名称（用于日志与统计）
+            fn: 处理函数
+            workers: 工作线程数；多于 1 时本阶段输出顺序不再保证与输入一致
+            queue_size: 输入队列容量
+            policy: 输入队列满时的策略，见 QUEUE_POLICIES
+            on_close: 结束标记到达本阶段后调用（如关闭导出器 / VideoWriter）
+        """
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"不支持的队列策略: {policy}")
+        self.name = name
+        self.fn = fn
+        self.workers = max(int(workers), 1)
+        self.policy = policy
+        self.on_close = on_close
+        self.queue = queue.Queue(maxsize=max(int(queue_size), 1))
+
+        self.downstream: List["Stage"] = []
+        self.threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._alive = 0
+        self._closed = False
+
+        # 统计信息
+        self.processed = 0
+        self.dropped = 0  # 输入队列满被丢弃 + fn 返回 None
+        self.errors = 0
+        self.busy_time = 0.0
+
+    def snapshot(self, elapsed: float) -> dict:
+        capacity = elapsed * self.workers
+        return {
+            "workers": self.workers,
+            "policy": self.policy,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "avg_ms": round(self.busy_time / self.processed * 1000.0, 2) if self.processed else 0.0,
+            "utilization": round(self.busy_time / capacity, 3) if capacity > 0 else 0.0,
+        }
+
+
+class Pipeline:
+    """
+    分阶段流水线。
+
+    用法:
+        pipe = Pipeline(source)
+        pipe.add_stage(Stage("infer", infer_fn))
+        pipe.add_sink(Stage("display", show_fn, queue_size=1, policy="drop_oldest"))
+        pipe.start()
+        pipe.wait()   # 或在任意时刻 pipe.stop()
+        print(pipe.stats())
+    """
+
+    def __init__(
+        self,
+        source: FrameSource,
+        source_queue_policy: Optional[str] = None,
+    ):
+        """
+        参数:
+            source: 帧源
+            source_queue_policy: 帧源写入第一个阶段时的策略；为空时视频/图片用 "block"
+                                 （逐帧处理、不丢帧），摄像头用 "drop_oldest"（保证实时）
+        """
+        if source_queue_policy is None:
+            source_queue_policy = (
+                "drop_oldest" if source.source_type == SourceType.CAMERA else "block"
+            )
+        if source_queue_policy not in QUEUE_POLICIES:
+            raise ValueError(f"不支持的队列策略: {source_queue_policy}")
+
+        self.source = source
+        self.source_queue_policy = source_queue_policy
+        self.stages: List[Stage] = []
+        self.sinks: List[Stage] = []
+
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._source_thread: Optional[threading.Thread] = None
+        self._start_time: Optional[float] = None
+        self._end_time: Optional[float] = None
+        self.frames_read = 0
+        self.source_dropped = 0
+
+    # ---------- 构建 ----------
+
+    def add_stage(self, stage: Stage) -> "Pipeline":
+        """按顺序追加一个处理阶段。"""
+        self.stages.append(stage)
+        return self
+
+    def add_sink(self, stage: Stage) -> "Pipeline":
+        """追加一个输出端；所有 sink 并行接收最后一个阶段的输出（共享同一个 item）。"""
+        self.sinks.append(stage)
+        return self
+
+    # ---------- 生命周期 ----------
+
+    @property
+    def running(self) -> bool:
+        return self._source_thread is not None and not self._done.is_set()
+
+    def start(self):
+        if not self.stages and not self.sinks:
+            raise RuntimeError("流水线没有任何阶段")
+        if self.running:
+            logger.debug("流水线已在运行，忽略重复启动请求")
+            return
+
+        chain = self.stages + [None]
+        for stage, nxt in zip(self.stages, chain[1:]):
+            stage.downstream = [nxt] if nxt is not None else list(self.sinks)
+        for sink in self.sinks:
+            sink.downstream = []
+
+        self._stop.clear()
+        self._done.clear()
+        self._start_time = time.perf_counter()
+        self._end_time = None
+
+        for stage in self.stages + self.sinks:
+            stage._alive = stage.workers
+            stage._closed = False
+            with stage.queue.mutex:
+                stage.queue.queue.clear()
+            stage.threads = [
+                threading.Thread(
+                    target=self._stage_worker,
+                    args=(stage,),
+                    name=f"pipeline-{stage.name}-{i}",
+                    daemon=True,
+                )
+                for i in range(stage.workers)
+            ]
+            for t in stage.threads:
+                t.start()
+
+        self._source_thread = threading.Thread(
+            target=self._source_worker, name="pipeline-source", daemon=True
+        )
+        self._source_thread.start()
+        logger.info(
+            "流水线启动: stages=%s, sinks=%s",
+            [s.name for s in self.stages],
+            [s.name for s in self.sinks],
+        )
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待帧源读完且所有阶段处理完毕，返回是否已结束。"""
+        return self._done.wait(timeout)
+
+    def stop(self, timeout: float = 2.0):
+        """立即中止：丢弃尚未处理的数据，等待所有线程退出并释放帧源。"""
+        logger.info("请求停止流水线")
+        self._stop.set()
+        threads = [self._source_thread] if self._source_thread else []
+        for stage in self.stages + self.sinks:
+            threads.extend(stage.threads)
+        for t in threads:
+            t.join(timeout=timeout)
+        for stage in self.stages + self.sinks:
+            self._close_stage(stage)
+        self.source.release()
+        self._finish()
+        logger.info("流水线已停止")
+
+    def stats(self) -> dict:
+        """每个阶段的处理统计；bottleneck 为利用率最高的阶段。"""
+        end = self._end_time if self._end_time is not None else time.perf_counter()
+        elapsed = end - self._start_time if self._start_time is not None else 0.0
+        stages = {s.name: s.snapshot(elapsed) for s in self.stages + self.sinks}
+        bottleneck = max(stages, key=lambda k: stages[k]["utilization"]) if stages else None
+        last = self.stages[-1] if self.stages else None
+        return {
+            "elapsed": round(elapsed, 3),
+            "frames_read": self.frames_read,
+            "source_dropped": self.source_dropped,
+            "throughput_fps": round(last.processed / elapsed, 2) if last and elapsed > 0 else 0.0,
+            "bottleneck": bottleneck,
+            "stages": stages,
+        }
+
+    # ---------- 内部 ----------
+
+    def _finish(self):
+        if not self._done.is_set():
+            self._end_time = time.perf_counter()
+            self._done.set()
+
+    def _put(self, stage: Stage, item, policy: str) -> bool:
+        """按策略把 item 写入 stage 的输入队列，返回是否写入成功。"""
+        q = stage.queue
+        if item is _END or policy == "block":
+            # 结束标记必须送达，即使下游使用丢帧策略
+            while not self._stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        if policy == "drop_newest":
+            try:
+                q.put_nowait(item)
+                return True
+            except queue.Full:
+                with stage._lock:
+                    stage.dropped += 1
+                return False
+
+        # drop_oldest：结束标记之后不会再有写入，因此这里不会丢掉 _END
+        while True:
+            try:
+                q.put_nowait(item)
+                return True
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    with stage._lock:
+                        stage.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _emit(self, stage: Stage, item):
+        for nxt in stage.downstream:
+            self._put(nxt, item, nxt.policy)
+
+    def _source_worker(self):
+        pin_current_thread("decode")
+        logger.info("流水线帧源线程开始运行")
+        first = self.stages[0] if self.stages else None
+        targets = [first] if first is not None else list(self.sinks)
+        try:
+            if self.source.source_type != SourceType.IMAGE and not self.source.is_open:
+                if not self.source.open():
+                    logger.error("流水线帧源打开失败")
+                    return
+            for flag, frame in self.source.frames():
+                if self._stop.is_set() or flag == "end":
+                    break
+                if frame is None:
+                    logger.error("读取帧失败: %s", self.source.path_or_id)
+                    break
+                item = PipelineItem(self.frames_read, time.time(), frame)
+                self.frames_read += 1
+                for stage in targets:
+                    if not self._put(stage, item, self.source_queue_policy):
+                        self.source_dropped += 1
+        except Exception:
+            logger.exception("流水线帧源线程异常")
+        finally:
+            for stage in targets:
+                self._put(stage, _END, "block")
+            logger.info("流水线帧源线程结束，共读取 %d 帧", self.frames_read)
+
+    def _stage_worker(self, stage: Stage):
+        # "infer" 阶段绑定到推理 CPU 集合，其余阶段留在主线程的集合
+        pin_current_thread(stage.name)
+        is_sink = not stage.downstream and stage in self.sinks
+        while not self._stop.is_set():
+            try:
+                item = stage.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if item is _END:
+                self._on_stage_end(stage)
+                return
+
+            t0 = time.perf_counter()
+            try:
+                out = stage.fn(item)
+            except Exception:
+                logger.exception("流水线阶段 %s 处理第 %d 帧失败", stage.name, item.frame_index)
+                with stage._lock:
+                    stage.errors += 1
+                continue
+            finally:
+                elapsed = time.perf_counter() - t0
+                with stage._lock:
+                    stage.busy_time += elapsed
+
+            with stage._lock:
+                stage.processed += 1
+                if out is None and not is_sink:
+                    stage.dropped += 1
+            if out is not None and not is_sink:
+                self._emit(stage, out)
+
+    def _close_stage(self, stage: Stage):
+        with stage._lock:
+            if stage._closed:
+                return
+            stage._closed = True
+        if stage.on_close is not None:
+            try:
+                stage.on_close()
+            except Exception:
+                logger.exception("流水线阶段 %s 关闭失败", stage.name)
+
+    def _on_stage_end(self, stage: Stage):
+        with stage._lock:
+            stage._alive -= 1
+            last = stage._alive == 0
+        if not last:
+            # 把结束标记留给同阶段的其他工作线程
+            stage.queue.put(_END)
+            return
+
+        self._close_stage(stage)
+        self._emit(stage, _END)
+        logger.debug("流水线阶段结束: %s", stage.name)
+
+        if all(s._alive == 0 for s in self.stages + self.sinks):
+            self.source.release()
+            self._finish()
+            logger.info("流水线处理完毕: %s", self.stats())
+
+
+def build_detection_pipeline(
+    detector: Detector,
+    source: FrameSource,
+    imgsz: int = 640,
+    annotate: bool = True,
+    infer_workers: int = 1,
+    queue_size: int = 4,
+    sinks: Optional[List[Stage]] = None,
+    source_queue_policy: Optional[str] = None,
+) -> Pipeline:
+    """
+    构建标准检测流水线：preprocess → infer → postprocess → annotate → sinks。
+
+    参数:
+        detector: 已加载模型的 Detector
+        source: 帧源
+        imgsz: 推理尺寸
+        annotate: 是否生成标注图（关闭时跳过 annotate 阶段）
+        infer_workers: 推理阶段线程数。同一个 Detector 的推理在锁内串行执行，
+                       多于 1 个线程不会提高吞吐、只增加锁竞争，通常保持默认值 1
+        queue_size: 各阶段默认输入队列容量
+        sinks: 输出端，可用 display_sink / writer_sink / exporter_sink 构建
+    """
+
+    def preprocess(item: PipelineItem):
+        # 保证内存连续，下游各阶段与 sink 共享同一帧，禁止原地修改
+        frame = np.ascontiguousarray(item.frame)
+        frame.setflags(write=False)
+        item.frame = frame
+        return item
+
+    def infer(item: PipelineItem):
+        item.raw = detector.infer(item.frame, imgsz=imgsz)
+        return item
+
+    def postprocess(item: PipelineItem):
+        det_result = DetectionResult.from_yolo(item.raw)
+        det_result.frame_index = item.frame_index
+        det_result.timestamp = item.timestamp
+        det_result.imgsz = imgsz
+        item.det_result = det_result
+        if not annotate:
+            item.raw = None
+        return item
+
+    def do_annotate(item: PipelineItem):
+        if item.raw is not None:
+            item.annotated = item.raw.plot()
+        else:
+            item.annotated = Visualizer.draw_detections(item.frame, item.det_result)
+        item.raw = None
+        return item
+
+    pipe = Pipeline(source, source_queue_policy=source_queue_policy)
+    pipe.add_stage(Stage("preprocess", preprocess, queue_size=queue_size))
+    pipe.add_stage(Stage("infer", infer, workers=infer_workers, queue_size=queue_size))
+    pipe.add_stage(Stage("postprocess", postprocess, queue_size=queue_size))
+    if annotate:
+        pipe.add_stage(Stage("annotate", do_annotate, queue_size=queue_size))
+    for sink in sinks or []:
+        pipe.add_sink(sink)
+    return pipe
+
+
+# ---------- 常用 sink ----------
+
+
+class DisplaySink(Stage):
+    """显示端：只保留最新结果，供 UI 轮询（不阻塞流水线）。"""
+
+    def __init__(self, name: str = "display"):
+        super().__init__(name, self._store, queue_size=1, policy="drop_oldest")
+        self._latest = None
+        self._latest_lock = threading.Lock()
+
+    def _store(self, item: PipelineItem):
+        with self._latest_lock:
+            self._latest = item
+
+    def get_latest(self) -> Optional[PipelineItem]:
+        """取走最新结果，没有新结果时返回 None。"""
+        with self._latest_lock:
+            item, self._latest = self._latest, None
+        return item
+
+
+def writer_sink(writer, name: str = "writer", queue_size: int = 16) -> Stage:
+    """把标注帧（没有标注时为原始帧）写入 cv2.VideoWriter，结束时释放。"""
+
+    def write(item: PipelineItem):
+        writer.write(item.annotated if item.annotated is not None else item.frame)
+
+    return Stage(name, write, queue_size=queue_size, policy="block", on_close=writer.release)
+
+
+def exporter_sink(exporter, name: str = "exporter", queue_size: int = 64) -> Stage:
+    """把 DetectionResult 写入结构化导出器（core.exporter），结束时关闭。"""
+
+    def write(item: PipelineItem):
+        exporter.write(item.det_result)
+
+    return Stage(name, write, queue_size=queue_size, policy="block", on_close=exporter.close)
@@ -0,0 +1,280 @@
+# app/result_bus.py
+
+"""
+ResultBus：推理结果的发布 / 订阅总线。
+
+- 每个订阅者（显示、录像、导出、分析……）有自己的有界队列和满队列策略，
+  慢的订阅者只会在自己的队列里丢帧 / 等待，不影响其他订阅者
+- 所有订阅者拿到的是同一个结果对象的引用：(frame, annotated, DetectionResult)，
+  发布时把帧设为只读，避免某个订阅者原地修改影响其他订阅者，也无需为每个订阅者复制
+- 订阅方式：
+    - subscribe()：被动订阅，调用方自行 get_nowait() / drain()（例如 UI 线程轮询）
+    - attach()：附带一个转发线程，逐条调用回调（例如导出器）
+- 设置 frame_pool 后，每个订阅者队列中的结果各持有原始帧的一次引用：
+  被丢弃或转发回调结束时自动 release，被动订阅者取出结果后需调用 release(item)
+"""
+
+import threading
+import queue
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BUS_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+
+class Subscription:
+    """单个订阅者的队列与统计。"""
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 1,
+        policy: str = "drop_oldest",
+        block_timeout: float = 0.5,
+    ):
+        """
+        参数:
+            name: 订阅者名称
+            maxsize: 队列容量
+            policy: 队列满时的策略：
+                - "drop_oldest"：丢弃最旧结果（显示类订阅者，只关心最新帧）
+                - "drop_newest"：丢弃新结果
+                - "block"：发布方最多等待 block_timeout 秒，仍然满则丢弃新结果
+                  （录像 / 导出类订阅者，尽量不丢帧，同时不会无限拖慢推理线程）
+            block_timeout: block 策略下的最长等待时间
+        """
+        if policy not in BUS_POLICIES:
+            raise ValueError(f"不支持的订阅策略: {policy}")
+        self.name = name
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(maxsize=max(int(maxsize), 1))
+
+        self.delivered = 0
+        self.dropped = 0
+
+        # 所属总线（用于帧缓冲池的引用计数），由 ResultBus.subscribe 设置
+        self._bus: Optional["ResultBus"] = None
+
+        # attach() 使用的转发线程
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+
+    def _offer(self, item):
+        # 先占用一次帧引用，未能入队时再释放
+        self.retain(item)
+        q = self.queue
+        if self.policy == "block":
+            try:
+                q.put(item, timeout=self.block_timeout)
+                self.delivered += 1
+            except queue.Full:
+                self._drop(item)
+            return
+
+        try:
+            q.put_nowait(item)
+            self.delivered += 1
+            return
+        except queue.Full:
+            pass
+
+        if self.policy == "drop_newest":
+            self._drop(item)
+            return
+
+        try:
+            self._drop(q.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(item)
+            self.delivered += 1
+        except queue.Full:
+            self._drop(item)
+
+    def _drop(self, item):
+        self.dropped += 1
+        self.release(item)
+
+    def retain(self, item):
+        pool = self._bus.frame_pool if self._bus is not None else None
+        if pool is not None:
+            pool.retain(item[0])
+
+    def release(self, item):
+        """归还取出的结果所持有的帧引用（未设置 frame_pool 时无操作）。"""
+        pool = self._bus.frame_pool if self._bus is not None else None
+        if pool is not None and item is not None:
+            pool.release(item[0])
+
+    def get(self, timeout: Optional[float] = None):
+        """阻塞获取一条结果，超时返回 None。"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_nowait(self):
+        """非阻塞获取一条结果，没有则返回 None。"""
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def drain(self, max_items: Optional[int] = None) -> List:
+        """非阻塞取出当前排队的全部（或至多 max_items 条）结果，按发布顺序。"""
+        items = []
+        while max_items is None or len(items) < max_items:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def clear(self):
+        for item in self.drain():
+            self.release(item)
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+class ResultBus:
+    """
+    发布 / 订阅总线。
+
+    用法:
+        bus = ResultBus()
+        display = bus.subscribe("display")                         # UI 轮询
+        bus.attach("exporter", lambda item: exporter.write(item[2]),
+                   maxsize=256, policy="block")                    # 后台转发
+        bus.publish((frame, annotated, det_result))
+    """
+
+    def __init__(self, frame_pool=None):
+        """
+        参数:
+            frame_pool: 可选的 core.frame_pool.FramePool，用于池内帧的引用计数
+        """
+        self._subs: Dict[str, Subscription] = {}
+        self._lock = threading.Lock()
+        self.frame_pool = frame_pool
+        self.published = 0
+
+    def subscribe(
+        self,
+        name: str,
+        maxsize: int = 1,
+        policy: str = "drop_oldest",
+        block_timeout: float = 0.5,
+    ) -> Subscription:
+        """新增被动订阅者（同名订阅者会被替换）。"""
+        sub = Subscription(name, maxsize, policy, block_timeout)
+        sub._bus = self
+        with self._lock:
+            old = self._subs.get(name)
+            self._subs[name] = sub
+        if old is not None:
+            self._stop_pump(old, wait=True)
+            old.clear()
+        logger.info("ResultBus: 新增订阅者 %s (maxsize=%d, policy=%s)", name, sub.queue.maxsize, policy)
+        return sub
+
+    def attach(
+        self,
+        name: str,
+        callback: Callable,
+        maxsize: int = 64,
+        policy: str = "block",
+        block_timeout: float = 0.5,
+    ) -> Subscription:
+        """新增带转发线程的订阅者：每条结果在独立线程中调用 callback(item)。"""
+        sub = self.subscribe(name, maxsize, policy, block_timeout)
+        sub._thread = threading.Thread(
+            target=self._pump, args=(sub, callback), name=f"bus-{name}", daemon=True
+        )
+        sub._thread.start()
+        return sub
+
+    def unsubscribe(self, name: str, wait: bool = True):
+        """
+        移除订阅者。
+
+        wait=True 时，attach 的订阅者会先把队列中剩余结果交给回调再返回
+        （例如关闭导出器之前调用，保证不丢结果）。
+        """
+        with self._lock:
+            sub = self._subs.pop(name, None)
+        if sub is None:
+            return
+        self._stop_pump(sub, wait)
+        sub.clear()
+        logger.info("ResultBus: 移除订阅者 %s (%s)", name, sub.stats())
+
+    def publish(self, item):
+        """
+        发布一条结果：(frame, annotated, DetectionResult)。
+
+        图像数组会被设为只读，所有订阅者共享同一份数据。
+        """
+        for arr in item[:2]:
+            if arr is not None and hasattr(arr, "setflags"):
+                arr.setflags(write=False)
+        with self._lock:
+            subs = list(self._subs.values())
+        for sub in subs:
+            sub._offer(item)
+        self.published += 1
+
+    def clear(self):
+        """清空所有订阅者的队列（停止推理时调用）。"""
+        with self._lock:
+            subs = list(self._subs.values())
+        for sub in subs:
+            sub.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            subs = dict(self._subs)
+        return {
+            "published": self.published,
+            "subscribers": {name: sub.stats() for name, sub in subs.items()},
+        }
+
+    # ---------- 内部 ----------
+
+    @staticmethod
+    def _stop_pump(sub: Subscription, wait: bool):
+        if sub._thread is None:
+            return
+        sub._closing = True
+        if not wait:
+            sub.clear()
+        sub._thread.join(timeout=5)
+
+    @staticmethod
+    def _pump(sub: Subscription, callback: Callable):
+        logger.debug("ResultBus: 转发线程启动 %s", sub.name)
+        while True:
+            try:
+                item = sub.queue.get(timeout=0.1)
+            except queue.Empty:
+                if sub._closing:
+                    break
+                continue
+            try:
+                callback(item)
+            except Exception:
+                logger.exception("ResultBus: 订阅者 %s 处理结果失败", sub.name)
+            finally:
+                sub.release(item)
+        logger.debug("ResultBus: 转发线程退出 %s", sub.name)
@@ -0,0 +1,385 @@
+# app/segmented.py
+
+"""
+SegmentedVideoProcessor：把单个长视频按关键帧切成 N 段，多进程并行处理。
+
+- 父进程先建立视频帧索引（core.video_index，已缓存时直接读取），按关键帧切段；
+  需要 PyAV：只解复用建立索引，速度很快（OpenCV 退化路径要在父进程顺序解码整个视频，抵消并行的收益）
+- 每段在独立的工作进程中处理：各自加载 Detector、各自解码（FrameSource.frames(start, end)），
+  可选内置 ByteTracker 跟踪与标注视频输出（每段写一个临时分片）
+- 父进程按段的顺序合并结果：先完成的段会等待前面的段，保证导出顺序与帧序一致；
+  段边界处按 IoU 把后一段的轨迹接到前一段的轨迹上，得到全局连续的 track_id
+- 标注视频分片在全部完成后按顺序拼接为一个文件
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from core.box_ops import iou_matrix
+from core.dto import DetectionResult
+from core.tracker import linear_assignment
+from core.video_index import VideoIndex, pyav_available
+
+logger = logging.getLogger(__name__)
+
+
+def _fourcc_for(path: str):
+    ext = os.path.splitext(path)[1].lower()
+    return cv2.VideoWriter_fourcc(*("MJPG" if ext == ".avi" else "mp4v"))
+
+
+def _process_segment(task: dict) -> dict:
+    """
+    工作进程入口：处理 [start, end) 区间内的帧。
+
+    返回:
+        {"segment", "start", "end", "names",
+         "frames": [(boxes, scores, class_ids, track_ids, mask_areas), ...],
+         "part_path", "elapsed"}
+    """
+    # 延迟导入：只在工作进程中加载模型相关模块
+    from core.detector import Detector
+    from core.source import FrameSource, SourceType
+    from core.tracker import ByteTracker
+
+    threads = task.get("threads")
+    if threads:
+        cv2.setNumThreads(1)
+        try:
+            import torch
+
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+
+    started = time.perf_counter()
+    detector = Detector()
+    success, info = detector.load_model(task["model_path"], task["model_format"])
+    if not success:
+        raise RuntimeError(f"工作进程加载模型失败: {info}")
+
+    source = FrameSource(
+        SourceType.VIDEO,
+        task["video_path"],
+        use_index=True,
+        index_cache_dir=task.get("index_cache_dir"),
+    )
+    if not source.open():
+        raise IOError(f"工作进程无法打开视频: {task['video_path']}")
+
+    tracker = ByteTracker(frame_rate=int(round(task.get("fps") or 30))) if task["tracking"] else None
+    part_path = task.get("part_path")
+    if part_path:
+        # core.visualizer 在模块级导入 PySide6，只输出标注视频时才需要，无界面环境下不导入
+        from core.visualizer import Visualizer
+    writer = None
+    batch_size = max(int(task.get("batch_size", 1)), 1)
+    imgsz = task["imgsz"]
+    frames_out = []
+    names = detector.names if isinstance(detector.names, dict) else {}
+
+    def flush(batch):
+        nonlocal writer
+        results = detector.infer_batch(batch, imgsz=imgsz)
+        for frame, result in zip(batch, results):
+            det_result = DetectionResult.from_yolo(result)
+            if tracker is not None:
+                det_result = tracker.update(det_result)
+            arrays = det_result.to_arrays()
+            frames_out.append(
+                (
+                    arrays["boxes"],
+                    arrays["scores"],
+                    arrays["class_ids"],
+                    arrays["track_ids"],
+                    arrays["mask_areas"],
+                )
+            )
+            if part_path:
+                annotated = Visualizer.draw_detections(frame, det_result)
+                if writer is None:
+                    h, w = annotated.shape[:2]
+                    writer = cv2.VideoWriter(part_path, _fourcc_for(part_path), task["fps"] or 25.0, (w, h))
+                writer.write(annotated)
+
+    try:
+        batch = []
+        for flag, frame in source.frames(task["start"], task["end"]):
+            if flag == "end":
+                break
+            batch.append(frame)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        source.release()
+        if writer is not None:
+            writer.release()
+
+    return {
+        "segment": task["segment"],
+        "start": task["start"],
+        "end": task["end"],
+        "names": names,
+        "frames": frames_out,
+        "part_path": part_path if writer is not None else None,
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+class _TrackStitcher:
+    """在段边界把后一段的局部 track_id 映射到全局 track_id。"""
+
+    def __init__(self, window: int = 5, min_iou: float = 0.3):
+        self.window = window
+        self.min_iou = min_iou
+        self._next_id = 1
+        # 上一段末尾 window 帧内出现过的轨迹：global_id -> (box, class_id)
+        self._tail: Dict[int, tuple] = {}
+
+    def stitch(self, frames: List[tuple]) -> List[tuple]:
+        """返回 track_ids 已替换为全局 ID 的帧列表。"""
+        head = {}
+        for boxes, _, class_ids, track_ids, _ in frames[: self.window]:
+            for box, cls_id, tid in zip(boxes, class_ids, track_ids):
+                if tid >= 0 and tid not in head:
+                    head[int(tid)] = (box, int(cls_id))
+
+        mapping = self._match(head)
+        out = []
+        tail = {}
+        tail_start = max(len(frames) - self.window, 0)
+        for i, (boxes, scores, class_ids, track_ids, mask_areas) in enumerate(frames):
+            global_ids = np.full_like(track_ids, -1)
+            for j, tid in enumerate(track_ids):
+                if tid < 0:
+                    continue
+                gid = mapping.get(int(tid))
+                if gid is None:
+                    gid = self._next_id
+                    self._next_id += 1
+                    mapping[int(tid)] = gid
+                global_ids[j] = gid
+                if i >= tail_start:
+                    tail[gid] = (boxes[j], int(class_ids[j]))
+            out.append((boxes, scores, class_ids, global_ids, mask_areas))
+        self._tail = tail
+        return out
+
+    def _match(self, head: Dict[int, tuple]) -> Dict[int, int]:
+        if not head or not self._tail:
+            return {}
+        prev_ids = list(self._tail)
+        next_ids = list(head)
+        prev_boxes = np.stack([self._tail[g][0] for g in prev_ids])
+        next_boxes = np.stack([head[t][0] for t in next_ids])
+        cost = 1.0 - iou_matrix(prev_boxes, next_boxes)
+        prev_cls = np.array([self._tail[g][1] for g in prev_ids])
+        next_cls = np.array([head[t][1] for t in next_ids])
+        cost[prev_cls[:, None] != next_cls[None, :]] = 1.0
+        matches, _, _ = linear_assignment(cost, 1.0 - self.min_iou)
+        return {next_ids[c]: prev_ids[r] for r, c in matches}
+
+
+class SegmentedVideoProcessor:
+    """
+    长视频分段并行处理。
+
+    用法:
+        proc = SegmentedVideoProcessor("yolo.pt", workers=8, tracking=True)
+        summary = proc.run("long.mp4", exporter=create_exporter("long.parquet"),
+                           annotated_path="long_annotated.mp4")
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        model_format: str = "pt",
+        workers: Optional[int] = None,
+        imgsz: int = 640,
+        tracking: bool = False,
+        batch_size: int = 4,
+        threads_per_worker: Optional[int] = None,
+        index_cache_dir: Optional[str] = None,
+        start_method: str = "spawn",
+    ):
+        """
+        参数:
+            model_path / model_format: 各工作进程加载的模型
+            workers: 进程数（也是分段数），默认 CPU 核数
+            imgsz: 推理尺寸
+            tracking: 是否跟踪（各段内置 ByteTracker，段边界按 IoU 拼接 ID）
+            batch_size: 每个进程内的推理 batch 大小
+            threads_per_worker: 每个进程的 torch 线程数，默认 CPU 核数 / workers，避免进程间线程争用
+            index_cache_dir: 视频索引缓存目录
+            start_method: 多进程启动方式（默认 spawn，避免 fork 已初始化的 torch / CUDA 状态）
+        """
+        cpu = os.cpu_count() or 1
+        self.model_path = model_path
+        self.model_format = model_format
+        self.workers = max(int(workers or cpu), 1)
+        self.imgsz = imgsz
+        self.tracking = tracking
+        self.batch_size = batch_size
+        self.threads_per_worker = threads_per_worker or max(cpu // self.workers, 1)
+        self.index_cache_dir = index_cache_dir
+        self.start_method = start_method
+
+    def run(
+        self,
+        video_path: str,
+        exporter=None,
+        annotated_path: Optional[str] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> dict:
+        """
+        处理整个视频。
+
+        参数:
+            video_path: 视频路径
+            exporter: 可选的 core.exporter.BufferedSink，按帧序写入 DetectionResult（调用方负责 close）
+            annotated_path: 可选的标注视频输出路径
+            progress: 进度回调 progress(已完成段数, 总段数)
+
+        返回:
+            统计信息（段数、帧数、耗时、各段耗时）
+        """
+        if not pyav_available():
+            raise ImportError("分段并行处理需要 PyAV 建立关键帧索引，请先安装: pip install av")
+        started = time.perf_counter()
+        index = VideoIndex.load_or_build(video_path, self.index_cache_dir)
+        segments = index.segments(self.workers)
+        if not segments:
+            raise ValueError(f"视频没有可处理的帧: {video_path}")
+        logger.info(
+            "分段并行处理: %s, frames=%d, segments=%d, keyframes=%d, threads/worker=%d",
+            video_path,
+            index.frame_count,
+            len(segments),
+            len(index.keyframes),
+            self.threads_per_worker,
+        )
+
+        tasks = []
+        for k, (start, end) in enumerate(segments):
+            part = f"{annotated_path}.part{k}{os.path.splitext(annotated_path)[1]}" if annotated_path else None
+            tasks.append(
+                {
+                    "segment": k,
+                    "start": start,
+                    "end": end,
+                    "video_path": video_path,
+                    "model_path": self.model_path,
+                    "model_format": self.model_format,
+                    "imgsz": self.imgsz,
+                    "tracking": self.tracking,
+                    "batch_size": self.batch_size,
+                    "threads": self.threads_per_worker,
+                    "fps": index.fps,
+                    "index_cache_dir": self.index_cache_dir,
+                    "part_path": part,
+                }
+            )
+
+        stitcher = _TrackStitcher() if self.tracking else None
+        pending: Dict[int, dict] = {}
+        next_segment = 0
+        frames_done = 0
+        part_paths = []
+        seg_times = {}
+
+        ctx = multiprocessing.get_context(self.start_method)
+        with ProcessPoolExecutor(max_workers=len(tasks), mp_context=ctx) as pool:
+            futures = [pool.submit(_process_segment, t) for t in tasks]
+            for done, fut in enumerate(as_completed(futures), start=1):
+                result = fut.result()
+                seg_times[result["segment"]] = round(result["elapsed"], 2)
+                pending[result["segment"]] = result
+                logger.info(
+                    "段 %d 完成: frames=[%d, %d), %.1fs",
+                    result["segment"],
+                    result["start"],
+                    result["end"],
+                    result["elapsed"],
+                )
+                if progress is not None:
+                    progress(done, len(tasks))
+
+                # 按段顺序合并：前面的段都完成后才输出
+                while next_segment in pending:
+                    seg = pending.pop(next_segment)
+                    frames_done += self._merge_segment(seg, index, stitcher, exporter)
+                    if seg["part_path"]:
+                        part_paths.append(seg["part_path"])
+                    next_segment += 1
+
+        if annotated_path and part_paths:
+            self._concat_parts(part_paths, annotated_path, index.fps)
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            "frames": frames_done,
+            "segments": len(segments),
+            "elapsed": round(elapsed, 2),
+            "fps": round(frames_done / elapsed, 2) if elapsed > 0 else 0.0,
+            "segment_elapsed": [seg_times[k] for k in sorted(seg_times)],
+        }
+        logger.info("分段并行处理完成: %s", summary)
+        return summary
+
+    @staticmethod
+    def _merge_segment(seg: dict, index: VideoIndex, stitcher, exporter) -> int:
+        frames = seg["frames"]
+        if stitcher is not None:
+            frames = stitcher.stitch(frames)
+        if exporter is not None:
+            for offset, (boxes, scores, class_ids, track_ids, mask_areas) in enumerate(frames):
+                frame_index = seg["start"] + offset
+                exporter.write(
+                    DetectionResult.from_arrays(
+                        boxes,
+                        scores,
+                        class_ids,
+                        seg["names"],
+                        track_ids=track_ids,
+                        mask_areas=mask_areas,
+                        frame_index=frame_index,
+                        timestamp=index.timestamp_of(frame_index) if frame_index < index.frame_count else None,
+                    )
+                )
+        return len(frames)
+
+    @staticmethod
+    def _concat_parts(part_paths: List[str], output_path: str, fps: float):
+        """按顺序拼接标注视频分片（重新编码），完成后删除分片。"""
+        writer = None
+        try:
+            for part in part_paths:
+                cap = cv2.VideoCapture(part)
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    if writer is None:
+                        h, w = frame.shape[:2]
+                        writer = cv2.VideoWriter(output_path, _fourcc_for(output_path), fps or 25.0, (w, h))
+                    writer.write(frame)
+                cap.release()
+        finally:
+            if writer is not None:
+                writer.release()
+        for part in part_paths:
+            try:
+                os.remove(part)
+            except OSError:
+                logger.warning("删除分片失败: %s", part)
+        logger.info("标注视频已合并: %s (%d 个分片)", output_path, len(part_paths))
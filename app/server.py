@@ -0,0 +1,497 @@
+# app/server.py
+
+"""
+本机 HTTP 推理服务：同一主机上的其他进程共用一份已加载的模型。
+
+- 默认只监听 127.0.0.1
+- POST /infer：请求体为 JPEG / PNG（Content-Type: image/jpeg、image/png），
+  或原始 BGR uint8 像素（Content-Type: application/octet-stream，
+  需带 X-Width / X-Height 头，可选 X-Channels，默认 3）；返回 DetectionResult 的 JSON
+- GET /metrics：队列深度、批大小、排队 / 总延迟分位数等指标，以及内存监控（RSS / 队列积压）的最近一次采样
+- GET /health：存活检查
+- 并发请求由 DynamicBatcher 合并成动态 batch：凑满 max_batch 或等待超过 max_wait_ms 即推理
+
+命令行:
+    python -m app.server --model yolo.pt --port 8765
+"""
+
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from core.detector import Detector
+from core.dto import DetectionResult
+from core.memory_monitor import MemoryMonitor
+from core.thread_budget import ThreadBudget, pin_current_thread
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    __slots__ = ("frame", "future", "enqueued_at")
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class DynamicBatcher:
+    """
+    把并发提交的单帧请求合并为 batch 推理。
+
+    第一帧到达后最多再等待 max_wait_ms，期间到达的请求（不超过 max_batch）一起推理。
+    """
+
+    def __init__(
+        self,
+        detector: Detector,
+        imgsz: int = 640,
+        max_batch: int = 8,
+        max_wait_ms: float = 5.0,
+        max_queue: int = 64,
+        latency_window: int = 1000,
+    ):
+        """
+        参数:
+            detector: 已加载模型的 Detector
+            imgsz: 推理尺寸
+            max_batch: 单次推理的最大帧数
+            max_wait_ms: 凑 batch 的最长等待时间（从 batch 中第一帧到达算起）
+            max_queue: 等待队列容量，满时 submit 抛出 queue.Full（服务返回 503）
+            latency_window: 延迟分位数统计使用的最近请求数
+        """
+        self.detector = detector
+        self.imgsz = imgsz
+        self.max_batch = max(int(max_batch), 1)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+        self.queue: "queue.Queue[_Request]" = queue.Queue(maxsize=max(int(max_queue), 1))
+
+        self._stop_flag = False
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.batch_count = 0
+        self.batch_frames = 0
+        self._queue_wait = deque(maxlen=latency_window)
+        self._total_latency = deque(maxlen=latency_window)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_flag = False
+        self._thread = threading.Thread(target=self._worker, name="batcher", daemon=True)
+        self._thread.start()
+        logger.info(
+            "DynamicBatcher 启动: max_batch=%d, max_wait_ms=%.1f, imgsz=%d",
+            self.max_batch,
+            self.max_wait * 1000.0,
+            self.imgsz,
+        )
+
+    def stop(self):
+        self._stop_flag = True
+        if self._thread:
+            self._thread.join(timeout=2)
+        # 未处理的请求直接返回错误，避免调用方永久等待
+        while True:
+            try:
+                req = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            req.future.set_exception(RuntimeError("推理服务已停止"))
+        logger.info("DynamicBatcher 已停止")
+
+    def submit(self, frame) -> Future:
+        """提交一帧，返回 Future（结果为 DetectionResult）。队列已满时抛出 queue.Full。"""
+        req = _Request(frame)
+        try:
+            self.queue.put_nowait(req)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise
+        with self._lock:
+            self.requests += 1
+        return req.future
+
+    def infer(self, frame, timeout: Optional[float] = None) -> DetectionResult:
+        """同步接口：提交并等待结果。"""
+        return self.submit(frame).result(timeout=timeout)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            queue_wait = list(self._queue_wait)
+            total = list(self._total_latency)
+            avg_batch = self.batch_frames / self.batch_count if self.batch_count else 0.0
+            return {
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "requests": self.requests,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "batch_count": self.batch_count,
+                "avg_batch_size": round(avg_batch, 2),
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_wait_ms": self._percentiles(queue_wait),
+                "latency_ms": self._percentiles(total),
+            }
+
+    @staticmethod
+    def _percentiles(values: List[float]) -> dict:
+        if not values:
+            return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        arr = np.asarray(values) * 1000.0
+        return {
+            "p50": round(float(np.percentile(arr, 50)), 2),
+            "p95": round(float(np.percentile(arr, 95)), 2),
+            "max": round(float(arr.max()), 2),
+        }
+
+    def _collect(self) -> List[_Request]:
+        try:
+            first = self.queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    # 已到截止时间：只取已经在排队的请求
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        pin_current_thread("infer")
+        while not self._stop_flag:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                outcomes = self._infer([r.frame for r in batch])
+            except Exception:
+                # 整批失败时逐帧重试，只有出错的请求返回错误，同批的其他请求不受影响
+                logger.exception("批推理失败，逐帧重试: batch=%d", len(batch))
+                outcomes = []
+                for req in batch:
+                    try:
+                        outcomes.append(self._infer([req.frame])[0])
+                    except Exception as e:
+                        logger.error("单帧推理失败: %s", e)
+                        outcomes.append(e)
+
+            done = time.perf_counter()
+            failed = sum(isinstance(o, Exception) for o in outcomes)
+            with self._lock:
+                self.batch_count += 1
+                self.batch_frames += len(batch)
+                self.errors += failed
+                for req in batch:
+                    self._queue_wait.append(started - req.enqueued_at)
+                    self._total_latency.append(done - req.enqueued_at)
+            for req, outcome in zip(batch, outcomes):
+                if isinstance(outcome, Exception):
+                    req.future.set_exception(outcome)
+                else:
+                    req.future.set_result(outcome)
+
+    def _infer(self, frames) -> List[DetectionResult]:
+        det_results = []
+        for r in self.detector.infer_batch(frames, imgsz=self.imgsz):
+            det_result = DetectionResult.from_yolo(r)
+            det_result.imgsz = self.imgsz
+            det_results.append(det_result)
+        return det_results
+
+
+def decode_frame(body: bytes, content_type: str, headers) -> np.ndarray:
+    """按 Content-Type 把请求体解码为 BGR 图像，格式错误时抛出 ValueError。"""
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("image/jpeg", "image/jpg", "image/png"):
+        frame = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("图像解码失败")
+        return frame
+
+    if content_type == "application/octet-stream":
+        try:
+            w = int(headers.get("X-Width"))
+            h = int(headers.get("X-Height"))
+            c = int(headers.get("X-Channels", 3))
+        except (TypeError, ValueError):
+            raise ValueError("原始像素需要 X-Width / X-Height 头")
+        if w <= 0 or h <= 0:
+            raise ValueError(f"图像尺寸无效: {w}x{h}")
+        if len(body) != w * h * c:
+            raise ValueError(f"原始像素长度不匹配: {len(body)} != {w}x{h}x{c}")
+        frame = np.frombuffer(body, dtype=np.uint8).reshape(h, w, c)
+        if c == 1:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        elif c == 4:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+        elif c != 3:
+            raise ValueError(f"不支持的通道数: {c}")
+        return frame
+
+    raise ValueError(f"不支持的 Content-Type: {content_type}")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "YOLOInferenceServer/1.0"
+
+    def log_message(self, fmt, *args):
+        logger.debug("%s - %s", self.address_string(), fmt % args)
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            metrics = self.server.batcher.metrics()
+            metrics["memory"] = self.server.memory_monitor.stats()
+            self._send_json(200, metrics)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/infer":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        started = time.perf_counter()
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json(400, {"error": "Content-Length 无效"})
+            return
+        if length > self.server.max_body_bytes:
+            self._send_json(413, {"error": f"请求体过大: {length} > {self.server.max_body_bytes} 字节"})
+            return
+        body = self.rfile.read(length)
+        try:
+            frame = decode_frame(body, self.headers.get("Content-Type"), self.headers)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            future = self.server.batcher.submit(frame)
+        except queue.Full:
+            self._send_json(503, {"error": "推理队列已满"})
+            return
+
+        try:
+            det_result = future.result(timeout=self.server.request_timeout)
+        except Exception as e:
+            logger.error("推理请求失败: %s", e)
+            self._send_json(500, {"error": str(e)})
+            return
+
+        payload = det_result.to_dict()
+        payload["latency_ms"] = round((time.perf_counter() - started) * 1000.0, 2)
+        self._send_json(200, payload)
+
+
+class InferenceServer:
+    """
+    HTTP 推理服务。
+
+    用法:
+        server = InferenceServer(detector, port=0)   # port=0 由系统分配
+        server.start()
+        print(server.url)
+        ...
+        server.stop()
+
+    Content-Length 无效时返回 400，请求体超过 max_body_bytes（默认 64 MB）时返回 413。
+    """
+
+    def __init__(
+        self,
+        detector: Detector,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        imgsz: int = 640,
+        max_batch: int = 8,
+        max_wait_ms: float = 5.0,
+        max_queue: int = 64,
+        request_timeout: float = 30.0,
+        max_body_bytes: int = 64 * 1024 ** 2,
+    ):
+        self.batcher = DynamicBatcher(
+            detector,
+            imgsz=imgsz,
+            max_batch=max_batch,
+            max_wait_ms=max_wait_ms,
+            max_queue=max_queue,
+        )
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.batcher = self.batcher
+        self.httpd.request_timeout = request_timeout
+        self.httpd.max_body_bytes = int(max_body_bytes)
+        self._thread: Optional[threading.Thread] = None
+        # 内存监控：采样 RSS 与批处理队列积压，/metrics 中返回最近一次采样
+        self.memory_monitor = MemoryMonitor(
+            queue_stats=lambda: {"batcher": (self.batcher.queue.qsize(), self.batcher.queue.maxsize)}
+        )
+        self.httpd.memory_monitor = self.memory_monitor
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.batcher.start()
+        self.memory_monitor.start()
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, name="http-server", daemon=True
+        )
+        self._thread.start()
+        logger.info("推理服务已启动: %s", self.url)
+
+    def serve_forever(self):
+        """前台运行（命令行模式），Ctrl+C 退出。"""
+        self.batcher.start()
+        self.memory_monitor.start()
+        logger.info("推理服务已启动: %s", self.url)
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.memory_monitor.stop()
+        self.batcher.stop()
+        logger.info("推理服务已停止")
+
+
+class InferenceClient:
+    """推理服务的简单客户端（标准库实现），返回 DetectionResult 的字典形式。"""
+
+    def __init__(self, url: str = "http://127.0.0.1:8765", timeout: float = 30.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def infer(self, frame: np.ndarray, fmt: str = "jpg") -> dict:
+        """
+        参数:
+            frame: BGR 图像
+            fmt: "jpg" / "png"（压缩传输）或 "raw"（原始像素，本机传输最快）
+        """
+        headers = {}
+        if fmt == "raw":
+            frame = np.ascontiguousarray(frame, dtype=np.uint8)
+            h, w = frame.shape[:2]
+            c = 1 if frame.ndim == 2 else frame.shape[2]
+            body = frame.tobytes()
+            headers.update(
+                {
+                    "Content-Type": "application/octet-stream",
+                    "X-Width": str(w),
+                    "X-Height": str(h),
+                    "X-Channels": str(c),
+                }
+            )
+        else:
+            ok, buf = cv2.imencode("." + fmt, frame)
+            if not ok:
+                raise ValueError(f"图像编码失败: {fmt}")
+            body = buf.tobytes()
+            headers["Content-Type"] = "image/png" if fmt == "png" else "image/jpeg"
+
+        req = urllib.request.Request(self.url + "/infer", data=body, headers=headers, method="POST")
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+    def metrics(self) -> dict:
+        with urllib.request.urlopen(self.url + "/metrics", timeout=self.timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本机 YOLO 推理服务")
+    parser.add_argument("--model", required=True, help="模型路径（.pt / .onnx）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--cpus", type=int, default=None, help="线程预算参与分配的核数，默认全部可用核")
+    parser.add_argument("--pin-cpus", action="store_true", help="按阶段把线程绑定到互不重叠的 CPU 集合（Linux）")
+    parser.add_argument("--cpu-profile", action="store_true", help="启用 CPU 推理调优（见 infra/cpu_profile.py）")
+    parser.add_argument("--threads", type=int, default=None, help="Torch 算子内线程数")
+    parser.add_argument("--compile", action="store_true", help="CPU 调优时尝试 torch.compile")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] [%(name)s] %(message)s",
+    )
+
+    ThreadBudget(total=args.cpus, pin=args.pin_cpus).apply()
+
+    detector = Detector()
+    model_format = "onnx" if args.model.lower().endswith(".onnx") else "pt"
+    success, info = detector.load_model(args.model, model_format)
+    if not success:
+        raise SystemExit(f"模型加载失败: {info}")
+    if args.cpu_profile:
+        from infra.cpu_profile import CpuProfile
+
+        detector.apply_cpu_profile(
+            CpuProfile(threads=args.threads, compile_model=args.compile), imgsz=args.imgsz
+        )
+
+    InferenceServer(
+        detector,
+        host=args.host,
+        port=args.port,
+        imgsz=args.imgsz,
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms,
+        max_queue=args.max_queue,
+    ).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# core/adaptive.py
+
+"""
+AdaptiveResolution：根据实测推理延迟在预设的 imgsz 档位之间切换，
+以维持目标 FPS / 延迟预算。
+
+- 延迟用指数滑动平均（EMA）平滑
+- 降档：EMA 连续 patience 帧超出预算
+- 升档：按面积比例（imgsz^2）预估高一档的延迟，连续多帧都有足够余量才升
+- 每次切换后有冷却期，并重置 EMA，避免在两档之间来回抖动
+"""
+
+import logging
+from typing import Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveResolution:
+    """推理分辨率自适应控制器（纯逻辑，不依赖模型）。"""
+
+    def __init__(
+        self,
+        ladder: Sequence[int] = (320, 480, 640, 960),
+        target_fps: Optional[float] = None,
+        latency_budget_ms: Optional[float] = None,
+        initial: int = 640,
+        ema_alpha: float = 0.2,
+        up_margin: float = 0.8,
+        patience: int = 10,
+        cooldown: int = 30,
+    ):
+        """
+        参数:
+            ladder: 可选的 imgsz 档位（会自动排序去重，建议为 32 的倍数）
+            target_fps: 目标帧率；与 latency_budget_ms 二选一
+            latency_budget_ms: 单帧推理延迟预算（毫秒），优先于 target_fps
+            initial: 初始 imgsz，取 ladder 中最接近的一档
+            ema_alpha: 延迟 EMA 平滑系数
+            up_margin: 预估的高一档延迟低于 预算*up_margin 才升档
+            patience: 降档需要连续超预算的帧数（升档需要 3 倍）
+            cooldown: 切换档位后忽略的帧数
+        """
+        self.ladder = sorted(set(int(s) for s in ladder))
+        if not self.ladder:
+            raise ValueError("imgsz 档位不能为空")
+
+        if latency_budget_ms is not None:
+            self.budget = latency_budget_ms / 1000.0
+        elif target_fps is not None and target_fps > 0:
+            self.budget = 1.0 / target_fps
+        else:
+            raise ValueError("需要指定 target_fps 或 latency_budget_ms")
+
+        self.ema_alpha = ema_alpha
+        self.up_margin = up_margin
+        self.patience = patience
+        self.cooldown = cooldown
+
+        self._level = min(
+            range(len(self.ladder)), key=lambda i: abs(self.ladder[i] - initial)
+        )
+        self._ema: Optional[float] = None
+        self._over = 0
+        self._under = 0
+        self._cooldown_left = 0
+        self.switch_count = 0
+
+    @property
+    def imgsz(self) -> int:
+        return self.ladder[self._level]
+
+    @property
+    def latency_ema_ms(self) -> Optional[float]:
+        return None if self._ema is None else self._ema * 1000.0
+
+    def update(self, latency: float) -> int:
+        """
+        输入一次推理的耗时（秒），返回下一帧应使用的 imgsz。
+        """
+        if self._cooldown_left > 0:
+            self._cooldown_left -= 1
+            return self.imgsz
+
+        if self._ema is None:
+            self._ema = latency
+        else:
+            self._ema += self.ema_alpha * (latency - self._ema)
+
+        if self._ema > self.budget:
+            self._over += 1
+            self._under = 0
+        else:
+            self._over = 0
+            if self._level + 1 < len(self.ladder):
+                ratio = self.ladder[self._level + 1] / float(self.imgsz)
+                predicted = self._ema * ratio * ratio
+                if predicted < self.budget * self.up_margin:
+                    self._under += 1
+                else:
+                    self._under = 0
+
+        if self._over >= self.patience and self._level > 0:
+            self._switch(self._level - 1)
+        elif self._under >= self.patience * 3 and self._level + 1 < len(self.ladder):
+            self._switch(self._level + 1)
+
+        return self.imgsz
+
+    def stats(self) -> dict:
+        return {
+            "imgsz": self.imgsz,
+            "latency_ema_ms": self.latency_ema_ms,
+            "budget_ms": self.budget * 1000.0,
+            "switch_count": self.switch_count,
+        }
+
+    def _switch(self, level: int):
+        old = self.imgsz
+        self._level = level
+        self._ema = None
+        self._over = 0
+        self._under = 0
+        self._cooldown_left = self.cooldown
+        self.switch_count += 1
+        logger.info(
+            "自适应分辨率切换: imgsz %d -> %d (预算 %.1f ms)",
+            old,
+            self.imgsz,
+            self.budget * 1000.0,
+        )
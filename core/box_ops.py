@@ -0,0 +1,93 @@
+# core/box_ops.py
+
+"""
+检测框相关的 NumPy 向量化工具函数（xyxy 格式）。
+
+- iou_matrix：批量 IoU 矩阵
+- nms：按类别的非极大值抑制
+"""
+
+from typing import Optional
+
+import numpy as np
+
+# nms 按行分块计算 IoU，限制单次分配的矩阵大小
+_NMS_BLOCK_ROWS = 256
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    计算两组框的 IoU 矩阵。
+
+    参数:
+        a: (N, 4) xyxy
+        b: (M, 4) xyxy
+
+    返回:
+        (N, M) float32
+    """
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+
+    area_a = (a[:, 2] - a[:, 0]).clip(0) * (a[:, 3] - a[:, 1]).clip(0)
+    area_b = (b[:, 2] - b[:, 0]).clip(0) * (b[:, 3] - b[:, 1]).clip(0)
+
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    wh = (rb - lt).clip(0)
+    inter = wh[..., 0] * wh[..., 1]
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    iou_threshold: float = 0.5,
+    class_ids: Optional[np.ndarray] = None,
+    max_det: Optional[int] = None,
+) -> np.ndarray:
+    """
+    非极大值抑制。
+
+    传入 class_ids 时按类别分别抑制（每个类别单独计算，IoU 矩阵更小）。
+
+    返回:
+        保留下来的索引（按分数降序）
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    if len(boxes) == 0:
+        return np.zeros((0,), dtype=np.int64)
+
+    if class_ids is not None:
+        class_ids = np.asarray(class_ids).reshape(-1)
+        keep = []
+        for c in np.unique(class_ids):
+            idx = np.nonzero(class_ids == c)[0]
+            keep.append(idx[nms(boxes[idx], scores[idx], iou_threshold)])
+        keep = np.concatenate(keep)
+        keep = keep[np.argsort(-scores[keep], kind="stable")]
+        return keep[:max_det] if max_det is not None else keep
+
+    order = np.argsort(-scores, kind="stable")
+    boxes = boxes[order]
+    n = len(boxes)
+
+    # 按分数降序分块处理：每块只与其后的框计算 IoU（上三角），
+    # 只有确实与后续框冲突的行才需要逐行确认，其余框直接保留
+    suppressed = np.zeros(n, dtype=bool)
+    for start in range(0, n, _NMS_BLOCK_ROWS):
+        end = min(start + _NMS_BLOCK_ROWS, n)
+        conflict = np.triu(iou_matrix(boxes[start:end], boxes[start:]) > iou_threshold, k=1)
+        for r in np.nonzero(conflict.any(axis=1))[0]:
+            if suppressed[start + r]:
+                continue
+            suppressed[start + np.nonzero(conflict[r])[0]] = True
+
+    keep = np.nonzero(~suppressed)[0]
+    if max_det is not None:
+        keep = keep[:max_det]
+    return order[keep]
@@ -5,9 +5,12 @@ Detector：对上层提供统一的模型加载 / 推理 / 跟踪接口，
 内部通过 UltralyticsAdapter 与 Ultralytics YOLO 交互。
 """
 
-from typing import Optional
+from typing import Dict, Optional, Sequence
 import logging
 
+from core.dto import DetectionResult
+from core.prediction_cache import file_hash, frame_key
+from core.tiling import make_tiles, merge_tile_results
 from infra.ultralytics_adapter import UltralyticsAdapter
 
 logger = logging.getLogger(__name__)
@@ -25,6 +28,10 @@ class Detector:
         self.adapter: Optional[UltralyticsAdapter] = None
         self.task: Optional[str] = None  # 模型任务类型，例如 'detect', 'segment', 'pose', 'obb'
         self.names = None  # 类别名称字典
+        self.model_path: Optional[str] = None
+        # 预测缓存（core.prediction_cache.PredictionCache），为 None 时不缓存
+        self.prediction_cache = None
+        self._model_hash: Optional[str] = None
         logger.debug("Detector 初始化完成")
 
     def load_model(self, model_path: str, model_format: str):
@@ -48,6 +55,8 @@ class Detector:
             success, info_or_error = adapter.load_model(model_path)
             if success:
                 self.adapter = adapter
+                self.model_path = model_path
+                self._model_hash = None
                 self.task = info_or_error.get("task")
                 self.names = info_or_error.get("names")
                 logger.info(
@@ -63,10 +72,48 @@ class Detector:
             logger.exception("Detector.load_model 过程中发生异常")
             return False, "加载模型时发生异常，请查看日志"
 
-    def infer(self, image, imgsz: int = 640):
+    def set_prediction_cache(self, cache):
+        """
+        挂载 / 卸载预测缓存（传 None 卸载）。
+
+        只对纯检测任务生效：分割 / 姿态 / 旋转框模型的结果含掩码等信息，不做缓存。
+        """
+        self.prediction_cache = cache
+        if cache is not None and self.task not in (None, "detect"):
+            logger.warning("预测缓存只支持 detect 任务，当前模型 task=%s，不会命中", self.task)
+
+    def apply_cpu_profile(self, profile=None, imgsz: int = 640, sample=None) -> dict:
+        """
+        应用 CPU 推理调优配置（infra.cpu_profile.CpuProfile），返回调优报告，
+        详见 UltralyticsAdapter.apply_cpu_profile。应在开始推理前调用。
+        """
+        if self.adapter is None:
+            logger.error("apply_cpu_profile 在模型未加载时被调用")
+            raise RuntimeError("模型未加载")
+        return self.adapter.apply_cpu_profile(profile, imgsz=imgsz, sample=sample)
+
+    def infer(
+        self,
+        image,
+        imgsz: int = 640,
+        conf: Optional[float] = None,
+        iou: Optional[float] = None,
+        classes: Optional[Sequence[int]] = None,
+        class_conf: Optional[Dict[int, float]] = None,
+        max_det: Optional[int] = None,
+        cache_key: Optional[str] = None,
+    ):
         """
         执行单帧普通推理（无跟踪）。
 
+        参数:
+            conf / iou: 置信度与 NMS IoU 阈值，为 None 时使用 Ultralytics 默认值
+            classes: 类别白名单（class_id 列表），在 NMS 之前过滤，None 表示全部类别
+            class_conf: 按类别覆盖置信度阈值 {class_id: conf}
+            max_det: 每帧最多保留的检测数
+            cache_key: 预测缓存的帧键（如 PredictionCache.source_key(path, index)），
+                       为 None 时使用帧内容哈希；未挂载预测缓存时忽略
+
         返回:
             Ultralytics Results 对象
         """
@@ -74,8 +121,161 @@ class Detector:
             logger.error("infer 在模型未加载时被调用")
             raise RuntimeError("模型未加载")
 
-        logger.debug("执行普通推理 imgsz=%d", imgsz)
-        return self.adapter.infer(image, imgsz=imgsz)
+        filters = _filters(conf, iou, classes, class_conf, max_det)
+        if self._cache_enabled():
+            return self.infer_batch([image], imgsz=imgsz, cache_keys=[cache_key], **filters)[0]
+
+        logger.debug("执行普通推理 imgsz=%d, filters=%s", imgsz, filters)
+        return self.adapter.infer(image, imgsz=imgsz, **filters)
+
+    def infer_batch(
+        self,
+        images,
+        imgsz: int = 640,
+        conf: Optional[float] = None,
+        iou: Optional[float] = None,
+        classes: Optional[Sequence[int]] = None,
+        class_conf: Optional[Dict[int, float]] = None,
+        max_det: Optional[int] = None,
+        cache_keys=None,
+    ):
+        """
+        对多帧图像执行一次批量推理（无跟踪），过滤参数含义同 infer。
+
+        挂载了预测缓存时，命中的帧直接由缓存数组重建结果，只有未命中的帧送入模型。
+
+        返回:
+            Ultralytics Results 对象列表，与 images 一一对应
+        """
+        if self.adapter is None:
+            logger.error("infer_batch 在模型未加载时被调用")
+            raise RuntimeError("模型未加载")
+
+        filters = _filters(conf, iou, classes, class_conf, max_det)
+        if not self._cache_enabled() or len(images) == 0:
+            logger.debug("执行批量推理 batch=%d, imgsz=%d", len(images), imgsz)
+            return self.adapter.infer_batch(images, imgsz=imgsz, **filters)
+
+        cache = self.prediction_cache
+        # 缓存键取实际送入模型的参数（None 已替换为默认值），与调用方是否显式传入默认值无关
+        effective = self.adapter.effective_params(imgsz, **filters)
+        params = "|".join(f"{k}={v}" for k, v in effective.items())
+        keys = [
+            self._prediction_key(img, params, None if cache_keys is None else cache_keys[i])
+            for i, img in enumerate(images)
+        ]
+        results = [None] * len(images)
+        todo = []
+        for i, key in enumerate(keys):
+            hit = cache.get(key)
+            if hit is not None:
+                results[i] = self.adapter.result_from_array(images[i], hit[0])
+            else:
+                todo.append(i)
+
+        logger.debug(
+            "执行批量推理 batch=%d, imgsz=%d, 缓存命中=%d",
+            len(images),
+            imgsz,
+            len(images) - len(todo),
+        )
+        if todo:
+            fresh = self.adapter.infer_batch([images[i] for i in todo], imgsz=imgsz, **filters)
+            for i, result in zip(todo, fresh):
+                results[i] = result
+                data = self.adapter.result_to_array(result)
+                if data is not None:
+                    cache.put(keys[i], data, images[i].shape[:2])
+        return results
+
+    def _cache_enabled(self) -> bool:
+        return self.prediction_cache is not None and self.task in (None, "detect")
+
+    def _prediction_key(self, image, params: str, cache_key: Optional[str]) -> str:
+        if self._model_hash is None:
+            self._model_hash = file_hash(self.model_path)
+        return self.prediction_cache.make_key(
+            self._model_hash,
+            self.adapter.backend or "",
+            params,
+            cache_key if cache_key is not None else frame_key(image),
+        )
+
+    def infer_tiled(
+        self,
+        image,
+        imgsz: int = 640,
+        tile_size: Optional[int] = None,
+        overlap: float = 0.2,
+        global_pass: bool = True,
+        iou: Optional[float] = None,
+        conf: Optional[float] = None,
+        classes: Optional[Sequence[int]] = None,
+        class_conf: Optional[Dict[int, float]] = None,
+        max_det: Optional[int] = None,
+    ) -> DetectionResult:
+        """
+        切片推理：把高分辨率帧切成带重叠的切片，作为一个 batch 推理，
+        再映射回原图坐标并做跨切片 NMS。
+
+        参数:
+            image: BGR 图像
+            imgsz: 模型推理尺寸
+            tile_size: 切片边长，默认等于 imgsz（每个切片不再缩放）
+            overlap: 相邻切片重叠比例
+            global_pass: 是否额外做一次整帧低分辨率推理，用于补充跨切片的大目标
+            iou: NMS 的 IoU 阈值，同时用于每个切片的推理和跨切片合并；
+                 为 None 时切片推理用 Ultralytics 默认值，跨切片合并用 0.5
+            conf / classes / class_conf: 每个切片推理时的过滤参数（同 infer）
+            max_det: 合并后最多保留的检测数
+
+        返回:
+            DetectionResult（原图坐标；切片模式不输出掩码和跟踪 ID）
+        """
+        if self.adapter is None:
+            logger.error("infer_tiled 在模型未加载时被调用")
+            raise RuntimeError("模型未加载")
+
+        tile_size = tile_size or imgsz
+        h, w = image.shape[:2]
+        tiles = make_tiles(h, w, tile_size, overlap)
+        crops = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+        if global_pass and len(tiles) > 1:
+            crops.append(image)
+
+        logger.debug(
+            "执行切片推理 frame=%dx%d, tiles=%d, tile_size=%d, global_pass=%s",
+            w,
+            h,
+            len(tiles),
+            tile_size,
+            global_pass,
+        )
+        results = self.adapter.infer_batch(
+            crops, imgsz=imgsz, **_filters(conf, iou, classes, class_conf, None)
+        )
+        det_results = [DetectionResult.from_yolo(r) for r in results]
+
+        global_result = None
+        if len(det_results) > len(tiles):
+            global_result = det_results.pop()
+            # 整帧结果只补充大目标：小目标交给切片结果，避免低分辨率的误检
+            min_global_area = 0.25 * tile_size * tile_size
+        else:
+            min_global_area = 0.0
+
+        names = self.names if isinstance(self.names, dict) else {}
+        merged = merge_tile_results(
+            det_results,
+            tiles,
+            names,
+            global_result=global_result,
+            iou_threshold=iou if iou is not None else 0.5,
+            min_global_area=min_global_area,
+        )
+        if max_det is not None and len(merged.detections) > max_det:
+            merged.detections = sorted(merged.detections, key=lambda d: -d.confidence)[:max_det]
+        return merged
 
     def track(
         self,
@@ -85,12 +285,18 @@ class Detector:
         persist: bool = True,
         conf: Optional[float] = None,
         iou: Optional[float] = None,
+        session: str = "default",
+        classes: Optional[Sequence[int]] = None,
+        class_conf: Optional[Dict[int, float]] = None,
+        max_det: Optional[int] = None,
     ):
         """
         执行单帧多目标跟踪推理。
 
         通常在摄像头 / 视频流中连续多次调用，并设置 persist=True，
         以便 Ultralytics 在内部对轨迹进行持续维护。
+        不同 session 的轨迹状态相互隔离，可共用同一份模型权重。
+        classes / class_conf / max_det 含义同 infer。
 
         返回:
             Ultralytics Results 对象（包含 boxes.id 等跟踪信息）
@@ -100,12 +306,13 @@ class Detector:
             raise RuntimeError("模型未加载")
 
         logger.debug(
-            "执行跟踪推理 imgsz=%d, tracker_cfg=%s, persist=%s, conf=%s, iou=%s",
+            "执行跟踪推理 imgsz=%d, tracker_cfg=%s, persist=%s, conf=%s, iou=%s, session=%s",
             imgsz,
             tracker_cfg,
             persist,
             conf,
             iou,
+            session,
         )
         return self.adapter.track(
             image,
@@ -114,4 +321,25 @@ class Detector:
             persist=persist,
             conf=conf,
             iou=iou,
+            session=session,
+            classes=classes,
+            class_conf=class_conf,
+            max_det=max_det,
         )
+
+    def reset_tracker(self, session: Optional[str] = None):
+        """重置指定 session（为 None 时为全部 session）的跟踪状态，无需重新加载模型。"""
+        if self.adapter is None:
+            return
+        self.adapter.reset_tracker(session)
+
+
+def _filters(conf, iou, classes, class_conf, max_det) -> dict:
+    """整理推理过滤参数（类别列表排序去重，使预测缓存键稳定）。"""
+    return {
+        "conf": conf,
+        "iou": iou,
+        "classes": None if classes is None else sorted({int(c) for c in classes}),
+        "class_conf": None if not class_conf else {int(k): float(v) for k, v in sorted(class_conf.items())},
+        "max_det": max_det,
+    }
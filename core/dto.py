@@ -2,9 +2,15 @@
 
 from typing import List, Tuple, Optional
 import logging
+import math
+import threading
 
 logger = logging.getLogger(__name__)
 
+# DetectionResult 存活实例计数（core.memory_monitor 用于发现结果对象堆积）；
+# 可重入锁：__del__ 可能在持锁期间由垃圾回收在同一线程触发
+_live_lock = threading.RLock()
+
 
 class Detection:
     """
@@ -38,13 +44,60 @@ class Detection:
         # 跟踪相关（仅在启用 tracking 时会被赋值）
         self.track_id = track_id
 
+    def to_dict(self) -> dict:
+        """转换为可 JSON 序列化的字典（用于导出 / 持久化）。"""
+        x1, y1, x2, y2 = self.bbox
+        return {
+            "class_id": self.class_id,
+            "class_name": self.class_name,
+            "confidence": round(float(self.confidence), 4),
+            "bbox": [int(x1), int(y1), int(x2), int(y2)],
+            "track_id": self.track_id,
+            "mask_area": self.mask_area,
+        }
+
 
 class DetectionResult:
-    """封装检测结果（多个 Detection + names 映射）的类。"""
+    """
+    封装检测结果（多个 Detection + names 映射）的类。
+
+    frame_index / timestamp 由控制器在推理线程中填写，
+    单张图片检测时保持为 None。
+    inferred 为 False 表示该帧未经过模型推理，框由上一关键帧传播而来。
+    imgsz 记录该帧推理时使用的输入尺寸（自适应分辨率下会变化）。
+    source 为结果对应的图片路径（目录批量检测时填写，视频 / 摄像头为 None）。
+    """
 
-    def __init__(self, detections: List[Detection], names: dict = None):
+    def __init__(
+        self,
+        detections: List[Detection],
+        names: dict = None,
+        frame_index: Optional[int] = None,
+        timestamp: Optional[float] = None,
+        inferred: bool = True,
+        imgsz: Optional[int] = None,
+        source: Optional[str] = None,
+    ):
+        with _live_lock:
+            DetectionResult._live += 1
         self.detections = detections
         self.names = names if names is not None else {}
+        self.frame_index = frame_index
+        self.timestamp = timestamp
+        self.inferred = inferred
+        self.imgsz = imgsz
+        self.source = source
+
+    _live = 0
+
+    def __del__(self):
+        with _live_lock:
+            DetectionResult._live -= 1
+
+    @staticmethod
+    def live_count() -> int:
+        """当前存活的 DetectionResult 实例数。"""
+        return DetectionResult._live
 
     def is_empty(self) -> bool:
         return len(self.detections) == 0
@@ -56,6 +109,112 @@ class DetectionResult:
             counts[name] = counts.get(name, 0) + 1
         return counts
 
+    def to_dict(self) -> dict:
+        """转换为可 JSON 序列化的字典：一帧一条记录。"""
+        record = {
+            "frame_index": self.frame_index,
+            "timestamp": self.timestamp,
+            "inferred": self.inferred,
+            "imgsz": self.imgsz,
+        }
+        if self.source is not None:
+            record["source"] = self.source
+        record["detections"] = [det.to_dict() for det in self.detections]
+        return record
+
+    def scale_boxes(self, scale: float) -> "DetectionResult":
+        """
+        把检测框从降采样解码的图像坐标映射回原图坐标（就地修改，返回自身）。
+
+        参数:
+            scale: 原图与推理图像的边长之比（FrameSource.decode_scale）
+        """
+        if scale == 1.0:
+            return self
+        for det in self.detections:
+            det.bbox = tuple(int(round(v * scale)) for v in det.bbox)
+            if det.mask_area is not None:
+                det.mask_area = det.mask_area * scale * scale
+        return self
+
+    def to_arrays(self) -> dict:
+        """
+        转换为 NumPy 数组形式，便于向量化处理（NMS / 跟踪 / 坐标变换）。
+
+        返回:
+            {'boxes': (N,4) float32, 'scores': (N,) float32,
+             'class_ids': (N,) int64, 'track_ids': (N,) int64（无 ID 时为 -1）,
+             'mask_areas': (N,) float32（无掩码时为 NaN）}
+        """
+        import numpy as np
+
+        n = len(self.detections)
+        if n == 0:
+            return {
+                "boxes": np.zeros((0, 4), dtype=np.float32),
+                "scores": np.zeros((0,), dtype=np.float32),
+                "class_ids": np.zeros((0,), dtype=np.int64),
+                "track_ids": np.zeros((0,), dtype=np.int64),
+                "mask_areas": np.zeros((0,), dtype=np.float32),
+            }
+        return {
+            "boxes": np.array([d.bbox for d in self.detections], dtype=np.float32),
+            "scores": np.array([d.confidence for d in self.detections], dtype=np.float32),
+            "class_ids": np.array([d.class_id for d in self.detections], dtype=np.int64),
+            "track_ids": np.array(
+                [-1 if d.track_id is None else d.track_id for d in self.detections],
+                dtype=np.int64,
+            ),
+            "mask_areas": np.array(
+                [
+                    d.mask_area if d.has_mask and d.mask_area is not None else np.nan
+                    for d in self.detections
+                ],
+                dtype=np.float32,
+            ),
+        }
+
+    @classmethod
+    def from_arrays(
+        cls,
+        boxes,
+        scores,
+        class_ids,
+        names: dict = None,
+        track_ids=None,
+        mask_areas=None,
+        **kwargs,
+    ) -> "DetectionResult":
+        """
+        从 NumPy 数组构建 DetectionResult（to_arrays 的逆操作）。
+
+        track_ids 中的 -1 表示无跟踪 ID；mask_areas 中的 NaN 表示无掩码（为 None 时全部无掩码）；
+        其余关键字参数透传给构造函数。
+        """
+        names_map = names if names is not None else {}
+        detections: List[Detection] = []
+        for i in range(len(boxes)):
+            x1, y1, x2, y2 = (int(round(float(v))) for v in boxes[i])
+            cls_id = int(class_ids[i])
+            tid = None
+            if track_ids is not None and int(track_ids[i]) >= 0:
+                tid = int(track_ids[i])
+            mask_area = None
+            if mask_areas is not None and not math.isnan(float(mask_areas[i])):
+                mask_area = float(mask_areas[i])
+            detections.append(
+                Detection(
+                    class_id=cls_id,
+                    class_name=names_map.get(cls_id, str(cls_id)),
+                    confidence=float(scores[i]),
+                    bbox=(x1, y1, x2, y2),
+                    has_mask=mask_area is not None,
+                    mask_area=mask_area,
+                    track_id=tid,
+                )
+            )
+        return cls(detections, names_map, **kwargs)
+
     @classmethod
     def from_yolo(cls, result) -> "DetectionResult":
         """
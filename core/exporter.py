@@ -0,0 +1,274 @@
+# core/exporter.py
+
+"""
+结果导出：将每帧的 DetectionResult 以结构化格式写入磁盘。
+
+- BufferedSink：通用的“缓冲 + 后台线程批量落盘”基类
+- JsonlExporter：每帧一行 JSON（.jsonl）
+- ArrowExporter：按检测目标展开为列式表，写入 Parquet / Arrow IPC
+  （需要可选依赖 pyarrow，未列入 requirements.txt：pip install pyarrow）
+
+推理线程只负责把 DetectionResult 引用追加到内存缓冲区，
+序列化与磁盘 IO 全部在后台线程中完成，不拖慢推理循环；
+磁盘跟不上、缓冲区积压到 max_pending 帧时改为在写入线程同步落盘，内存占用有上限。
+"""
+
+import os
+import json
+import threading
+import logging
+from typing import List
+
+from core.dto import DetectionResult
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedSink:
+    """
+    缓冲写入基类。
+
+    子类只需实现 _write_batch(batch) 和 _close_backend()，
+    batch 为按到达顺序排列的 DetectionResult 列表。
+    """
+
+    def __init__(self, flush_interval: float = 1.0, flush_size: int = 256, max_pending: int = 8192):
+        """
+        参数:
+            flush_interval: 后台线程最长多少秒落盘一次
+            flush_size: 缓冲帧数达到该值时立即唤醒后台线程
+            max_pending: 缓冲帧数上限，达到后 write() 同步落盘（对调用方形成背压）
+        """
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_pending = max(int(max_pending), flush_size)
+
+        self._buffer: List[DetectionResult] = []
+        self._lock = threading.Lock()
+        # 落盘锁：后台线程与同步落盘不会并发调用 _write_batch，批次顺序与到达顺序一致
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        # 统计信息
+        self.frames_written = 0
+        self.flush_count = 0
+        self.sync_flushes = 0
+
+        self._thread = threading.Thread(target=self._flush_worker, daemon=True)
+        self._thread.start()
+
+    # ---------- 公共接口 ----------
+
+    def write(self, det_result: DetectionResult):
+        """追加一帧结果（非阻塞，仅持有引用）。"""
+        if self._closed:
+            logger.warning("%s 已关闭，忽略写入", self.__class__.__name__)
+            return
+        with self._lock:
+            self._buffer.append(det_result)
+            pending = len(self._buffer)
+        if pending >= self.max_pending:
+            # 后台落盘跟不上：在调用线程同步落盘，缓冲区不再无限增长
+            if self.sync_flushes == 0:
+                logger.warning(
+                    "%s 缓冲积压 %d 帧，改为同步落盘（磁盘写入慢于结果产生）",
+                    self.__class__.__name__,
+                    pending,
+                )
+            self.sync_flushes += 1
+            self._flush_pending()
+        elif pending >= self.flush_size:
+            self._wakeup.set()
+
+    def close(self):
+        """停止后台线程，落盘剩余数据并关闭底层文件。"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        self._flush_pending()
+        try:
+            self._close_backend()
+        except Exception:
+            logger.exception("%s 关闭底层存储时发生异常", self.__class__.__name__)
+        logger.info(
+            "%s 已关闭: frames=%d, flushes=%d",
+            self.__class__.__name__,
+            self.frames_written,
+            self.flush_count,
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._buffer)
+        return {
+            "frames_written": self.frames_written,
+            "flush_count": self.flush_count,
+            "sync_flushes": self.sync_flushes,
+            "pending": pending,
+        }
+
+    # ---------- 内部实现 ----------
+
+    def _flush_worker(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._flush_pending()
+
+    def _flush_pending(self):
+        with self._write_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return
+            try:
+                self._write_batch(batch)
+                self.frames_written += len(batch)
+                self.flush_count += 1
+            except Exception:
+                logger.exception(
+                    "%s 批量写入失败，丢弃 %d 帧", self.__class__.__name__, len(batch)
+                )
+
+    def _write_batch(self, batch: List[DetectionResult]):
+        raise NotImplementedError
+
+    def _close_backend(self):
+        pass
+
+
+class JsonlExporter(BufferedSink):
+    """每帧一行 JSON 记录，适合流式追加与 grep / jq 分析。"""
+
+    def __init__(self, path: str, append: bool = False, **kwargs):
+        """
+        参数:
+            append: True 时追加到已有文件末尾；默认覆盖，避免与上一次运行的结果混在一起
+        """
+        self.path = path
+        self._fp = open(path, "a" if append else "w", encoding="utf-8")
+        super().__init__(**kwargs)
+        logger.info("JsonlExporter 打开输出文件: %s (append=%s)", path, append)
+
+    def _write_batch(self, batch: List[DetectionResult]):
+        lines = [
+            json.dumps(r.to_dict(), ensure_ascii=False, separators=(",", ":"))
+            for r in batch
+        ]
+        self._fp.write("\n".join(lines) + "\n")
+        self._fp.flush()
+
+    def _close_backend(self):
+        self._fp.close()
+
+
+class ArrowExporter(BufferedSink):
+    """
+    列式导出（Parquet 或 Arrow IPC），每次批量落盘写成一个 row group。
+
+    每个检测目标一行；没有任何目标的帧写入一行 class_id 为空的记录，
+    以便保留帧的时间信息。
+    """
+
+    def __init__(self, path: str, fmt: str = "parquet", **kwargs):
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ImportError("导出 Parquet / Arrow 需要安装 pyarrow") from e
+
+        self.path = path
+        self.fmt = fmt
+        self._pa = pa
+        self._schema = pa.schema(
+            [
+                ("frame_index", pa.int64()),
+                ("timestamp", pa.float64()),
+                ("inferred", pa.bool_()),
+                ("imgsz", pa.int32()),
+                ("class_id", pa.int32()),
+                ("class_name", pa.string()),
+                ("confidence", pa.float32()),
+                ("x1", pa.int32()),
+                ("y1", pa.int32()),
+                ("x2", pa.int32()),
+                ("y2", pa.int32()),
+                ("track_id", pa.int64()),
+                ("mask_area", pa.float64()),
+                ("source", pa.string()),
+            ]
+        )
+
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+        elif fmt == "arrow":
+            self._writer = pa.ipc.new_file(path, self._schema)
+        else:
+            raise ValueError(f"不支持的列式导出格式: {fmt}")
+
+        super().__init__(**kwargs)
+        logger.info("ArrowExporter 打开输出文件: %s (format=%s)", path, fmt)
+
+    def _write_batch(self, batch: List[DetectionResult]):
+        columns = {name: [] for name in self._schema.names}
+
+        def add_row(r, det):
+            columns["frame_index"].append(r.frame_index)
+            columns["timestamp"].append(r.timestamp)
+            columns["inferred"].append(r.inferred)
+            columns["imgsz"].append(r.imgsz)
+            columns["source"].append(r.source)
+            if det is None:
+                for key in ("class_id", "class_name", "confidence", "x1", "y1",
+                            "x2", "y2", "track_id", "mask_area"):
+                    columns[key].append(None)
+                return
+            x1, y1, x2, y2 = det.bbox
+            columns["class_id"].append(det.class_id)
+            columns["class_name"].append(det.class_name)
+            columns["confidence"].append(det.confidence)
+            columns["x1"].append(x1)
+            columns["y1"].append(y1)
+            columns["x2"].append(x2)
+            columns["y2"].append(y2)
+            columns["track_id"].append(det.track_id)
+            columns["mask_area"].append(det.mask_area)
+
+        for r in batch:
+            if not r.detections:
+                add_row(r, None)
+            for det in r.detections:
+                add_row(r, det)
+
+        table = self._pa.table(columns, schema=self._schema)
+        self._writer.write_table(table)
+
+    def _close_backend(self):
+        self._writer.close()
+
+
+def create_exporter(path: str, **kwargs) -> BufferedSink:
+    """
+    根据文件扩展名创建导出器：
+    - .jsonl / .json  -> JsonlExporter
+    - .parquet        -> ArrowExporter(fmt="parquet")
+    - .arrow / .feather -> ArrowExporter(fmt="arrow")
+    - .db / .sqlite   -> ResultStore（可查询的 SQLite 结果库）
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".json"):
+        return JsonlExporter(path, **kwargs)
+    if ext == ".parquet":
+        return ArrowExporter(path, fmt="parquet", **kwargs)
+    if ext in (".arrow", ".feather"):
+        return ArrowExporter(path, fmt="arrow", **kwargs)
+    if ext in (".db", ".sqlite"):
+        # 延迟导入，避免与 core.result_store 循环引用
+        from core.result_store import ResultStore
+
+        return ResultStore(path, **kwargs)
+    raise ValueError(f"无法根据扩展名识别导出格式: {path}")
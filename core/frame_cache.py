@@ -0,0 +1,250 @@
+# core/frame_cache.py
+
+"""
+FrameCache：已解码视频帧的内存映射缓存，用于在同一段视频上反复运行（对比模型 / 阈值）。
+
+- 第一次读取视频时，FrameSource 把解码（可选缩放）后的帧顺序写入 <key>.frames（原始 uint8 数组），
+  读到结尾后写入 <key>.json 元数据，缓存才算完成；中途 seek / 停止则丢弃
+- 之后再打开同一视频（路径、大小、修改时间、缩放比例均一致）直接 np.memmap 映射，
+  每帧读取只是数组切片，不再解码
+- 缓存总大小超过 max_bytes 时按最近访问时间淘汰（LRU，命中时刷新元数据文件的修改时间）
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_CACHE_VERSION = 1
+_DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yolo_detect", "frame_cache")
+
+
+class FrameCacheWriter:
+    """顺序写入一个视频的解码帧；commit() 后缓存生效，abort() 丢弃已写内容。"""
+
+    def __init__(self, cache: "FrameCache", key: str, meta: dict):
+        self.cache = cache
+        self.key = key
+        self.meta = meta
+        self.count = 0
+        self.shape = None
+        self._tmp_path = cache._frames_path(key) + ".tmp"
+        self._file = open(self._tmp_path, "wb")
+
+    @property
+    def closed(self) -> bool:
+        return self._file is None
+
+    def append(self, frame: np.ndarray) -> bool:
+        """追加一帧；帧尺寸变化或超过大小上限时放弃本次缓存并返回 False。"""
+        if self._file is None:
+            return False
+        if self.shape is None:
+            self.shape = frame.shape
+        elif frame.shape != self.shape:
+            logger.info("帧尺寸变化，放弃帧缓存: %s", self.meta["path"])
+            self.abort()
+            return False
+        if (self.count + 1) * frame.nbytes > self.cache.max_bytes:
+            logger.info("视频超过帧缓存大小上限，放弃缓存: %s", self.meta["path"])
+            self.abort()
+            return False
+        self._file.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        self.count += 1
+        return True
+
+    def commit(self):
+        """写入完成：重命名数据文件并写入元数据，随后按大小上限淘汰旧缓存。"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if self.count == 0:
+            self._remove_tmp()
+            return
+        meta = dict(self.meta, shape=list(self.shape), count=self.count)
+        try:
+            os.replace(self._tmp_path, self.cache._frames_path(self.key))
+        except OSError:
+            # 同一缓存仍被映射（Windows 下无法覆盖）等情况
+            logger.warning("无法写入帧缓存: %s", meta["path"])
+            self._remove_tmp()
+            return
+        with open(self.cache._meta_path(self.key), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        logger.info(
+            "帧缓存已写入: %s (frames=%d, shape=%s, %.1f MB)",
+            meta["path"],
+            self.count,
+            tuple(self.shape),
+            self.count * int(np.prod(self.shape)) / 1e6,
+        )
+        self.cache.evict()
+
+    def abort(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        self._remove_tmp()
+
+    def _remove_tmp(self):
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+
+class FrameCache:
+    """按 (视频路径, 大小, 修改时间, 缩放比例) 索引的解码帧缓存。"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 8 * 1024 ** 3):
+        """
+        参数:
+            cache_dir: 缓存目录，默认 ~/.cache/yolo_detect/frame_cache
+            max_bytes: 缓存总大小上限（字节），超过时按最近访问时间淘汰
+        """
+        self.cache_dir = cache_dir or _DEFAULT_CACHE_DIR
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- 读取 ----------
+
+    def lookup(self, path: str, scale: float = 1.0):
+        """
+        查找缓存。
+
+        返回:
+            命中时为 (frames, meta)：frames 为 (N, H, W, C) 的内存映射（copy-on-write，写入不会落盘），
+            meta 为写入时记录的元数据（含 fps）；未命中时返回 None
+        """
+        key = self._key(path, scale)
+        if key is None:
+            return None
+        meta_path = self._meta_path(key)
+        frames_path = self._frames_path(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            shape = (meta["count"],) + tuple(meta["shape"])
+            if os.path.getsize(frames_path) != int(np.prod(shape)):
+                raise ValueError("数据文件大小与元数据不一致")
+            frames = np.memmap(frames_path, dtype=np.uint8, mode="c", shape=shape)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            logger.exception("读取帧缓存失败，删除该缓存: %s", path)
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        # 刷新访问时间，供 LRU 淘汰使用
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+        self.hits += 1
+        logger.info("帧缓存命中: %s (frames=%d, shape=%s)", path, shape[0], shape[1:])
+        return frames, meta
+
+    # ---------- 写入 ----------
+
+    def writer(self, path: str, scale: float = 1.0, fps: float = 0.0) -> Optional[FrameCacheWriter]:
+        """为一次完整的顺序读取创建写入器；视频文件不存在时返回 None。"""
+        key = self._key(path, scale)
+        if key is None:
+            return None
+        st = os.stat(path)
+        meta = {
+            "version": _CACHE_VERSION,
+            "path": os.path.abspath(path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "scale": scale,
+            "fps": fps,
+        }
+        try:
+            return FrameCacheWriter(self, key, meta)
+        except OSError:
+            logger.warning("无法创建帧缓存文件: %s", self.cache_dir)
+            return None
+
+    # ---------- 淘汰 / 统计 ----------
+
+    def entries(self) -> list:
+        """[(最近访问时间, 字节数, key), ...]，按访问时间升序。"""
+        items = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[: -len(".json")]
+            try:
+                atime = os.path.getmtime(self._meta_path(key))
+                nbytes = os.path.getsize(self._frames_path(key))
+            except OSError:
+                continue
+            items.append((atime, nbytes, key))
+        items.sort()
+        return items
+
+    def evict(self):
+        """缓存总大小超过 max_bytes 时，删除最久未访问的缓存直到满足上限。"""
+        with self._lock:
+            items = self.entries()
+            total = sum(nbytes for _, nbytes, _ in items)
+            for _, nbytes, key in items:
+                if total <= self.max_bytes:
+                    break
+                logger.info("帧缓存超过上限，淘汰: %s (%.1f MB)", key, nbytes / 1e6)
+                self._remove(key)
+                total -= nbytes
+
+    def clear(self):
+        for _, _, key in self.entries():
+            self._remove(key)
+
+    def stats(self) -> dict:
+        items = self.entries()
+        return {
+            "entries": len(items),
+            "mbytes": round(sum(nbytes for _, nbytes, _ in items) / 1e6, 1),
+            "max_mbytes": round(self.max_bytes / 1e6, 1),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    # ---------- 内部 ----------
+
+    def _key(self, path: str, scale: float) -> Optional[str]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        raw = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{float(scale):.6g}|{_CACHE_VERSION}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _frames_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".frames")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def _remove(self, key: str):
+        # 先删元数据，使缓存立即失效
+        for p in (self._meta_path(key), self._frames_path(key)):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
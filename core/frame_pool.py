@@ -0,0 +1,132 @@
+# core/frame_pool.py
+
+"""
+FramePool：可复用的帧缓冲池，减少高分辨率视频逐帧分配内存带来的开销。
+
+- acquire(shape) 取出一块空闲缓冲（引用计数为 1），FrameSource 用 cap.read(image=buf) 直接解码进去
+- 每个持有者（输入队列、结果总线的订阅者……）retain() 一次，用完 release() 一次，
+  计数归零时缓冲回到空闲列表，可被下一帧复用
+- 缓冲全部被占用时返回 None，调用方退化为普通分配（计入 misses），不会阻塞读帧
+- 非池内数组调用 retain / release 直接忽略，因此上层无需区分帧是否来自缓冲池
+"""
+
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FramePool:
+    """引用计数的帧缓冲池。"""
+
+    def __init__(self, max_buffers: int = 8):
+        """
+        参数:
+            max_buffers: 缓冲总数上限（应不小于同时在途的帧数：读帧 + 输入队列 + 推理 + 各订阅者队列）
+        """
+        self.max_buffers = max(int(max_buffers), 1)
+        self._lock = threading.Lock()
+        # id(buffer) -> buffer；池持有强引用，保证 id 在池的生命周期内不被复用
+        self._buffers: Dict[int, np.ndarray] = {}
+        self._refcount: Dict[int, int] = {}
+        self._free: List[int] = []
+        # 当前缓冲的 (shape, dtype)
+        self._key: Optional[Tuple[Tuple[int, ...], np.dtype]] = None
+
+        # 统计信息
+        self.hits = 0      # 复用空闲缓冲
+        self.allocs = 0    # 池内新分配
+        self.misses = 0    # 缓冲耗尽，调用方自行分配
+        self.peak_in_use = 0
+
+    def acquire(self, shape, dtype=np.uint8) -> Optional[np.ndarray]:
+        """
+        取出一块指定形状的缓冲，引用计数为 1。
+
+        分辨率变化时丢弃所有空闲的旧尺寸缓冲；缓冲耗尽时返回 None。
+        """
+        key = (tuple(shape), np.dtype(dtype))
+        with self._lock:
+            if key != self._key:
+                self._reshape(key)
+
+            if self._free:
+                bid = self._free.pop()
+                self.hits += 1
+            elif len(self._buffers) < self.max_buffers:
+                buf = np.empty(key[0], dtype=key[1])
+                bid = id(buf)
+                self._buffers[bid] = buf
+                self.allocs += 1
+            else:
+                self.misses += 1
+                return None
+
+            self._refcount[bid] = 1
+            self.peak_in_use = max(self.peak_in_use, len(self._refcount))
+            return self._buffers[bid]
+
+    def retain(self, arr):
+        """增加一次引用（非池内数组忽略）。"""
+        if arr is None:
+            return
+        with self._lock:
+            bid = id(arr)
+            if bid in self._refcount:
+                self._refcount[bid] += 1
+
+    def release(self, arr):
+        """释放一次引用，计数归零时缓冲回到空闲列表（非池内数组忽略）。"""
+        if arr is None:
+            return
+        with self._lock:
+            bid = id(arr)
+            count = self._refcount.get(bid)
+            if count is None:
+                return
+            if count > 1:
+                self._refcount[bid] = count - 1
+                return
+            del self._refcount[bid]
+            buf = self._buffers.get(bid)
+            if buf is None:
+                # 分辨率已变化，旧尺寸缓冲不再回收
+                return
+            # 发布到结果总线时帧会被设为只读，回收前恢复可写以便 cap.read 写入
+            buf.setflags(write=True)
+            self._free.append(bid)
+
+    def owns(self, arr) -> bool:
+        return arr is not None and id(arr) in self._buffers
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_use = len(self._refcount)
+            nbytes = sum(b.nbytes for b in self._buffers.values())
+            return {
+                "capacity": self.max_buffers,
+                "allocated": len(self._buffers),
+                "in_use": in_use,
+                "free": len(self._free),
+                "occupancy": round(in_use / float(self.max_buffers), 3),
+                "peak_in_use": self.peak_in_use,
+                "hits": self.hits,
+                "allocs": self.allocs,
+                "misses": self.misses,
+                "mbytes": round(nbytes / 1e6, 1),
+            }
+
+    def _reshape(self, key):
+        """
+        切换缓冲尺寸（调用方需持有锁）：丢弃所有旧尺寸缓冲。
+
+        仍在使用的旧缓冲只保留引用计数，由持有者保持存活，释放后不再回收。
+        """
+        if self._key is not None:
+            logger.info("FramePool: 帧尺寸变化 %s -> %s，重建缓冲", self._key[0], key[0])
+        self._buffers.clear()
+        self._free.clear()
+        self._key = key
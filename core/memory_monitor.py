@@ -0,0 +1,318 @@
+# core/memory_monitor.py
+
+"""
+MemoryMonitor：长时间运行（摄像头连续数天）的内存监控与泄漏排查。
+
+- 后台线程每 interval 秒采样一次：进程 RSS、存活的 DetectionResult 数、各队列积压（可选 CUDA 显存）
+  采样本身只读 /proc/self/statm 和几个计数器，开销在微秒级
+- 看门狗：预热期后的 RSS 作为基线，增长超过 rss_growth_mb、存活结果数超过 max_live_results、
+  有界队列连续 full_samples 次采样都处于满载、无界队列深度超过 max_queue_depth 时记录警告并调用 on_alert；
+  同一类告警在 cooldown 秒内只报一次
+- snapshot()：按需做 tracemalloc 差异快照（第一次调用开始跟踪，之后返回与上次相比增长最多的分配位置），
+  只统计 Python / NumPy 的分配，Torch 张量不在其中；跟踪期间内存分配变慢，排查完调用 stop_tracemalloc()
+
+用法:
+    monitor = MemoryMonitor(queue_stats=controller.queue_stats, interval=60, rss_growth_mb=512)
+    monitor.start()
+    ...
+    monitor.latest()      # 最近一次采样
+    monitor.snapshot()    # 怀疑泄漏时调用，两次之间的增长最多的分配位置
+    monitor.stop()
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.dto import DetectionResult
+
+logger = logging.getLogger(__name__)
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+_psutil_warned = False
+
+
+def current_rss() -> Optional[int]:
+    """当前进程常驻内存（字节）：Linux 读 /proc/self/statm，其他平台用 psutil（可选依赖），都不可用时返回 None。"""
+    global _psutil_warned
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        if not _psutil_warned:
+            logger.warning("无法读取 RSS：非 Linux 平台需要安装 psutil (pip install psutil)")
+            _psutil_warned = True
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class MemoryMonitor:
+    """周期采样 RSS / 存活对象 / 队列积压，并在增长超过阈值时告警。"""
+
+    def __init__(
+        self,
+        interval: float = 60.0,
+        queue_stats: Optional[Callable[[], Dict[str, Tuple[int, int]]]] = None,
+        rss_growth_mb: float = 512.0,
+        max_live_results: int = 5000,
+        max_queue_depth: int = 10000,
+        full_samples: int = 3,
+        warmup: float = 120.0,
+        cooldown: float = 600.0,
+        history: int = 1440,
+        on_alert: Optional[Callable[[str, str, dict], None]] = None,
+    ):
+        """
+        参数:
+            interval: 采样间隔（秒）
+            queue_stats: 返回 {队列名: (当前深度, 容量)} 的回调，容量 0 表示无界，
+                         如 DetectionController.queue_stats
+            rss_growth_mb: RSS 相对基线的增长告警阈值（MB），None 表示不检查
+            max_live_results: 存活 DetectionResult 数的告警阈值，None 表示不检查
+            max_queue_depth: 无界队列深度的告警阈值
+            full_samples: 有界队列（容量 > 1）连续多少次采样满载时告警
+            warmup: 预热时长（秒），模型加载、缓冲池分配等在此期间完成，之后的第一次采样作为 RSS 基线
+            cooldown: 同一类告警的最短间隔（秒）
+            history: 保留的采样条数（用于计算增长斜率）
+            on_alert: 告警回调 on_alert(kind, message, sample)，kind 为 "rss" / "results" / "queue:<名称>"
+        """
+        self.interval = max(float(interval), 0.1)
+        self.queue_stats = queue_stats
+        self.rss_growth_mb = rss_growth_mb
+        self.max_live_results = max_live_results
+        self.max_queue_depth = max_queue_depth
+        self.full_samples = max(int(full_samples), 1)
+        self.warmup = float(warmup)
+        self.cooldown = float(cooldown)
+        self.on_alert = on_alert
+
+        self.samples = deque(maxlen=max(int(history), 2))
+        self.baseline_rss: Optional[int] = None
+        self.peak_rss = 0
+        self.alerts = 0
+        self._full_counts: Dict[str, int] = {}
+        self._last_alert: Dict[str, float] = {}
+        self._started = time.monotonic()
+        self._snapshot = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._worker, name="memory-monitor", daemon=True)
+        self._thread.start()
+        logger.info(
+            "内存监控启动: interval=%.0fs, rss_growth_mb=%s, max_live_results=%s",
+            self.interval,
+            self.rss_growth_mb,
+            self.max_live_results,
+        )
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.stop_tracemalloc()
+        latest = self.latest()
+        if latest is not None:
+            logger.info(
+                "内存监控停止: rss=%.1f MB, 基线=%s MB, 峰值=%.1f MB, 增长斜率=%s MB/h, 告警 %d 次",
+                latest["rss_mb"] or 0.0,
+                None if self.baseline_rss is None else round(self.baseline_rss / 1e6, 1),
+                self.peak_rss / 1e6,
+                latest["rss_slope_mb_per_h"],
+                self.alerts,
+            )
+
+    # ---------- 采样 ----------
+
+    def sample(self) -> dict:
+        """立即采样一次（后台线程按 interval 调用），返回采样结果并执行看门狗检查。"""
+        now = time.monotonic()
+        rss = current_rss()
+        sample = {
+            "time": time.time(),
+            "uptime_s": round(now - self._started, 1),
+            "rss_mb": None if rss is None else round(rss / 1e6, 1),
+            "rss_growth_mb": None,
+            "rss_slope_mb_per_h": None,
+            "live_results": DetectionResult.live_count(),
+            "queues": {},
+        }
+        if self.queue_stats is not None:
+            try:
+                sample["queues"] = {
+                    name: (int(depth), int(capacity))
+                    for name, (depth, capacity) in self.queue_stats().items()
+                }
+            except Exception:
+                logger.exception("读取队列积压失败")
+        cuda_mb = _cuda_allocated_mb()
+        if cuda_mb is not None:
+            sample["cuda_mb"] = cuda_mb
+
+        with self._lock:
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss, rss)
+                if self.baseline_rss is None and now - self._started >= self.warmup:
+                    self.baseline_rss = rss
+                    logger.info("内存监控基线: rss=%.1f MB", rss / 1e6)
+                if self.baseline_rss is not None:
+                    sample["rss_growth_mb"] = round((rss - self.baseline_rss) / 1e6, 1)
+            self.samples.append(sample)
+            sample["rss_slope_mb_per_h"] = self._slope()
+
+        logger.debug("内存采样: %s", sample)
+        self._check(sample)
+        return sample
+
+    def latest(self) -> Optional[dict]:
+        with self._lock:
+            return self.samples[-1] if self.samples else None
+
+    def stats(self) -> dict:
+        latest = self.latest()
+        return {
+            "latest": latest,
+            "baseline_mb": None if self.baseline_rss is None else round(self.baseline_rss / 1e6, 1),
+            "peak_mb": round(self.peak_rss / 1e6, 1),
+            "alerts": self.alerts,
+            "tracemalloc": tracemalloc.is_tracing(),
+        }
+
+    # ---------- tracemalloc 差异快照 ----------
+
+    def snapshot(self, limit: int = 20, frames: int = 1) -> List[str]:
+        """
+        tracemalloc 差异快照：第一次调用开始跟踪并记录基准，返回空列表；
+        之后每次调用返回与上一次快照相比增长最多的 limit 个分配位置（按源码行汇总），
+        同时写入日志，并以本次快照作为新的基准。
+
+        参数:
+            frames: 开始跟踪时每个分配记录的调用栈深度（越深越慢）
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(int(frames), 1))
+            self._snapshot = None
+        current = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        previous, self._snapshot = self._snapshot, current
+        if previous is None:
+            logger.info("tracemalloc 已开始跟踪，下次调用 snapshot() 输出增长差异")
+            return []
+
+        stats = current.compare_to(previous, "lineno")
+        lines = [str(stat) for stat in stats[: max(int(limit), 1)] if stat.size_diff > 0]
+        logger.info("tracemalloc 增长最多的分配位置:\n%s", "\n".join(lines) or "（无增长）")
+        return lines
+
+    def stop_tracemalloc(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc 已停止跟踪")
+        self._snapshot = None
+
+    # ---------- 内部 ----------
+
+    def _worker(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("内存采样失败")
+
+    def _slope(self) -> Optional[float]:
+        """基线之后各采样 RSS 的线性增长斜率（MB/小时），采样不足时为 None（调用方需持有 _lock）。"""
+        points = [
+            (s["uptime_s"], s["rss_mb"])
+            for s in self.samples
+            if s["rss_mb"] is not None and s["uptime_s"] >= self.warmup
+        ]
+        if len(points) < 3:
+            return None
+        t, rss = np.array(points, dtype=np.float64).T
+        if t[-1] - t[0] <= 0:
+            return None
+        return round(float(np.polyfit(t, rss, 1)[0]) * 3600.0, 2)
+
+    def _check(self, sample: dict):
+        growth = sample["rss_growth_mb"]
+        if self.rss_growth_mb is not None and growth is not None and growth > self.rss_growth_mb:
+            self._alert(
+                "rss",
+                f"RSS 比基线增长 {growth:.1f} MB（阈值 {self.rss_growth_mb} MB），"
+                f"当前 {sample['rss_mb']} MB，增长斜率 {sample['rss_slope_mb_per_h']} MB/h",
+                sample,
+            )
+
+        live = sample["live_results"]
+        if self.max_live_results is not None and live > self.max_live_results:
+            self._alert("results", f"存活 DetectionResult {live} 个（阈值 {self.max_live_results}）", sample)
+
+        for name, (depth, capacity) in sample["queues"].items():
+            if capacity > 1:
+                full = self._full_counts.get(name, 0) + 1 if depth >= capacity else 0
+                self._full_counts[name] = full
+                if full >= self.full_samples:
+                    self._alert(
+                        f"queue:{name}",
+                        f"队列 {name} 连续 {full} 次采样满载（{depth}/{capacity}），下游处理跟不上",
+                        sample,
+                    )
+            elif capacity == 0 and self.max_queue_depth is not None and depth > self.max_queue_depth:
+                self._alert(
+                    f"queue:{name}",
+                    f"队列 {name} 积压 {depth} 条（阈值 {self.max_queue_depth}）",
+                    sample,
+                )
+
+    def _alert(self, kind: str, message: str, sample: dict):
+        now = time.monotonic()
+        last = self._last_alert.get(kind)
+        if last is not None and now - last < self.cooldown:
+            return
+        self._last_alert[kind] = now
+        self.alerts += 1
+        logger.warning("内存监控告警 [%s]: %s", kind, message)
+        if self.on_alert is not None:
+            try:
+                self.on_alert(kind, message, sample)
+            except Exception:
+                logger.exception("内存监控告警回调异常")
+
+
+def _cuda_allocated_mb() -> Optional[float]:
+    """已加载 torch 且有 CUDA 时返回当前显存占用（MB），不主动导入 torch。"""
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return None
+    try:
+        if not torch.cuda.is_available():
+            return None
+        return round(torch.cuda.memory_allocated() / 1e6, 1)
+    except Exception:
+        return None
@@ -0,0 +1,112 @@
+# core/motion_gate.py
+
+"""
+MotionGate：推理前的低成本运动检测门控，用于静态摄像头。
+
+在缩小后的灰度图上与滑动平均背景做差分，变化像素占比低于阈值时
+认为画面无变化，控制器可直接复用上一帧的检测结果而跳过模型推理。
+"""
+
+import logging
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MotionGate:
+    """基于背景差分的推理门控。"""
+
+    def __init__(
+        self,
+        min_changed_ratio: float = 0.003,
+        pixel_threshold: int = 25,
+        work_width: int = 160,
+        bg_alpha: float = 0.05,
+        max_skip: int = 150,
+    ):
+        """
+        参数:
+            min_changed_ratio: 变化像素占比超过该值才认为有运动（越小越敏感）
+            pixel_threshold: 单个像素灰度差超过该值才算“变化”
+            work_width: 差分计算时缩放到的宽度
+            bg_alpha: 背景模型的更新速率（适应缓慢的光照变化）
+            max_skip: 连续跳过多少帧后强制推理一次，避免长期不刷新
+        """
+        self.min_changed_ratio = min_changed_ratio
+        self.pixel_threshold = pixel_threshold
+        self.work_width = work_width
+        self.bg_alpha = bg_alpha
+        self.max_skip = max_skip
+
+        self._background = None  # float32 灰度背景
+        self._consecutive_skips = 0
+
+        # 统计信息
+        self.total_frames = 0
+        self.skipped_frames = 0
+        self.last_changed_ratio = 0.0
+
+    def reset(self):
+        self._background = None
+        self._consecutive_skips = 0
+        self.total_frames = 0
+        self.skipped_frames = 0
+        self.last_changed_ratio = 0.0
+
+    def should_infer(self, frame) -> bool:
+        """
+        判断当前帧是否需要执行模型推理。
+
+        返回:
+            True 表示画面有变化（或需要强制刷新），False 表示可以复用上一帧结果
+        """
+        self.total_frames += 1
+        gray = self._prepare(frame)
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype(np.float32)
+            self._consecutive_skips = 0
+            return True
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        changed = np.count_nonzero(diff > self.pixel_threshold)
+        self.last_changed_ratio = float(changed) / diff.size
+        cv2.accumulateWeighted(gray, self._background, self.bg_alpha)
+
+        if (
+            self.last_changed_ratio < self.min_changed_ratio
+            and self._consecutive_skips < self.max_skip
+        ):
+            self._consecutive_skips += 1
+            self.skipped_frames += 1
+            return False
+
+        self._consecutive_skips = 0
+        return True
+
+    @property
+    def skip_ratio(self) -> float:
+        if self.total_frames == 0:
+            return 0.0
+        return self.skipped_frames / float(self.total_frames)
+
+    def stats(self) -> dict:
+        return {
+            "total_frames": self.total_frames,
+            "skipped_frames": self.skipped_frames,
+            "skip_ratio": self.skip_ratio,
+            "last_changed_ratio": self.last_changed_ratio,
+        }
+
+    def _prepare(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.work_width / float(w)
+        small = cv2.resize(
+            frame,
+            (self.work_width, max(int(h * scale), 1)),
+            interpolation=cv2.INTER_AREA,
+        )
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
@@ -0,0 +1,206 @@
+# core/prediction_cache.py
+
+"""
+PredictionCache：持久化的推理结果缓存（SQLite），同一模型在同一帧上重复推理时直接返回缓存的检测数组。
+
+- 键：模型文件哈希 + 推理后端 + imgsz（及其他推理参数）+ 帧键
+  帧键默认是帧内容的哈希，也可以由调用方给出（如 source_key(视频路径, 帧号)，含文件大小和修改时间）
+- 值：Ultralytics boxes.data 形式的 (N, 6) float32 数组 [x1, y1, x2, y2, conf, cls] 与原图尺寸，
+  按字节紧凑存储；只缓存纯检测任务（掩码 / 关键点不缓存）
+- 写入按批提交事务；总大小超过 max_bytes 时按最近访问时间淘汰到上限的 90%
+- 通过 Detector.set_prediction_cache 挂到 Detector 上，infer / infer_batch 透明命中
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "yolo_detect", "predictions.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    key      TEXT PRIMARY KEY,
+    data     BLOB NOT NULL,
+    height   INTEGER NOT NULL,
+    width    INTEGER NOT NULL,
+    nbytes   INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pred_accessed ON predictions (accessed);
+"""
+
+
+def frame_key(image: np.ndarray) -> str:
+    """帧内容的哈希（含尺寸与 dtype），作为默认帧键。SHA-256 在支持 SHA 指令的 CPU 上最快（1080p 约 5 ms）。"""
+    h = hashlib.sha256()
+    h.update(f"{image.shape}|{image.dtype}".encode("ascii"))
+    h.update(np.ascontiguousarray(image).data)
+    return h.hexdigest()[:32]
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """文件内容的 SHA-1（模型文件哈希）。"""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class PredictionCache:
+    """SQLite 推理结果缓存，可在多个推理线程间共享。"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_bytes: int = 512 * 1024 ** 2,
+        commit_every: int = 64,
+    ):
+        """
+        参数:
+            db_path: SQLite 文件路径，默认 ~/.cache/yolo_detect/predictions.sqlite
+            max_bytes: 检测数组的总大小上限（字节），超过时按最近访问时间淘汰
+            commit_every: 每累计多少次写入提交一次事务
+        """
+        self.db_path = db_path or _DEFAULT_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self.commit_every = max(int(commit_every), 1)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(nbytes), 0) FROM predictions"
+        ).fetchone()[0]
+        self._pending = 0
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+
+        logger.info(
+            "PredictionCache 打开缓存库: %s (%.1f MB / %.1f MB)",
+            self.db_path,
+            self._total_bytes / 1e6,
+            self.max_bytes / 1e6,
+        )
+
+    @staticmethod
+    def make_key(model_hash: str, backend: str, params: str, frame: str) -> str:
+        return f"{model_hash}|{backend}|{params}|{frame}"
+
+    @staticmethod
+    def source_key(path: str, index: int) -> str:
+        """以 (视频路径, 帧号) 作为帧键，免去逐帧计算内容哈希；文件变化后键随之失效。"""
+        st = os.stat(path)
+        return f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}#{int(index)}"
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+        """命中时返回 ((N, 6) float32 检测数组, (height, width))，否则返回 None。"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, height, width FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE predictions SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            self._bump()
+        data = np.frombuffer(row[0], dtype=np.float32).reshape(-1, 6)
+        return data, (row[1], row[2])
+
+    def put(self, key: str, data: np.ndarray, shape: Tuple[int, int]):
+        """写入一帧的检测数组；shape 为原图 (height, width)。"""
+        blob = np.ascontiguousarray(data, dtype=np.float32).reshape(-1, 6).tobytes()
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT nbytes FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predictions (key, data, height, width, nbytes, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, blob, int(shape[0]), int(shape[1]), len(blob), time.time()),
+            )
+            self._total_bytes += len(blob) - (old[0] if old else 0)
+            self.writes += 1
+            self._bump()
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        self.flush()
+        stats = self.stats()
+        with self._lock:
+            self._conn.close()
+        logger.info("PredictionCache 已关闭: %s", stats)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM predictions")
+            self._conn.commit()
+            self._pending = 0
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "mbytes": round(self._total_bytes / 1e6, 2),
+                "max_mbytes": round(self.max_bytes / 1e6, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "writes": self.writes,
+                "evicted": self.evicted,
+            }
+
+    # ---------- 内部（调用方需持有 _lock） ----------
+
+    def _bump(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self._commit()
+
+    def _commit(self):
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+        self._conn.commit()
+        self._pending = 0
+
+    def _evict(self):
+        """按最近访问时间删除最旧的条目，直到总大小降到上限的 90%。"""
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        rows = self._conn.execute(
+            "SELECT key, nbytes FROM predictions ORDER BY accessed ASC"
+        )
+        keys = []
+        for key, nbytes in rows:
+            if self._total_bytes <= target:
+                break
+            keys.append((key,))
+            self._total_bytes -= nbytes
+            removed += 1
+        self._conn.executemany("DELETE FROM predictions WHERE key = ?", keys)
+        self.evicted += removed
+        logger.info("PredictionCache 超过大小上限，淘汰 %d 条", removed)
@@ -0,0 +1,223 @@
+# core/propagation.py
+
+"""
+BoxPropagator：在两次完整推理（关键帧）之间低成本地传播检测框。
+
+支持两种传播方式：
+- "flow"：在上一帧的框内取角点，用金字塔 LK 稀疏光流估计每个框的平移
+- "velocity"：按 track_id 用最近两次关键帧的位移做匀速外推（需开启跟踪）
+"""
+
+import logging
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from core.dto import Detection, DetectionResult
+
+logger = logging.getLogger(__name__)
+
+
+class BoxPropagator:
+    """在关键帧之间传播上一帧的 DetectionResult。"""
+
+    MODES = ("flow", "velocity")
+
+    def __init__(
+        self,
+        mode: str = "flow",
+        flow_max_side: int = 480,
+        min_points: int = 3,
+    ):
+        """
+        参数:
+            mode: "flow" 或 "velocity"
+            flow_max_side: 光流计算时将灰度图缩放到的最长边（越小越快）
+            min_points: 一个框内至少跟踪成功多少个点才更新该框，否则保持原位
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"不支持的传播方式: {mode}")
+        self.mode = mode
+        self.flow_max_side = flow_max_side
+        self.min_points = min_points
+
+        self._last_result: Optional[DetectionResult] = None
+        self._boxes: Optional[np.ndarray] = None  # (N, 4) float，原图坐标
+        self._prev_gray = None
+        self._scale = 1.0
+        # velocity 模式：track_id -> (dx1, dy1, dx2, dy2) / 帧
+        self._velocity: Dict[int, np.ndarray] = {}
+        self._key_boxes: Optional[np.ndarray] = None
+        self._last_key_boxes: Dict[int, np.ndarray] = {}
+        self._last_key_index: Optional[int] = None
+
+    def reset(self):
+        self._last_result = None
+        self._boxes = None
+        self._prev_gray = None
+        self._velocity.clear()
+        self._key_boxes = None
+        self._last_key_boxes.clear()
+        self._last_key_index = None
+
+    # ---------- 关键帧 ----------
+
+    def update_keyframe(self, frame, det_result: DetectionResult):
+        """用一次完整推理的结果刷新传播状态。"""
+        self._last_result = det_result
+        self._boxes = self._boxes_of(det_result)
+
+        if self.mode == "flow":
+            self._prev_gray = self._to_gray(frame)
+        else:
+            self._update_velocity(det_result)
+
+    # ---------- 非关键帧 ----------
+
+    def propagate(self, frame, frame_index: Optional[int] = None) -> Optional[DetectionResult]:
+        """
+        将上一帧的检测框传播到当前帧（结果的 frame_index / timestamp 由调用方填写）。
+
+        参数:
+            frame: 当前帧 BGR 图像
+            frame_index: 当前帧序号；velocity 模式据此计算与关键帧的间隔，
+                         这样中间被丢弃的帧也不会导致外推不足
+
+        返回:
+            inferred=False 的 DetectionResult；尚无关键帧时返回 None
+        """
+        if self._last_result is None:
+            return None
+
+        if len(self._boxes) > 0:
+            if self.mode == "flow":
+                self._boxes = self._propagate_flow(frame)
+            else:
+                self._boxes = self._propagate_velocity(frame_index)
+
+        h, w = frame.shape[:2]
+        boxes = self._boxes.copy()
+        if len(boxes) > 0:
+            boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w - 1)
+            boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h - 1)
+
+        detections = []
+        for det, box in zip(self._last_result.detections, boxes.round().astype(int)):
+            detections.append(
+                Detection(
+                    class_id=det.class_id,
+                    class_name=det.class_name,
+                    confidence=det.confidence,
+                    bbox=tuple(box.tolist()),
+                    track_id=det.track_id,
+                )
+            )
+        return DetectionResult(detections, self._last_result.names, inferred=False)
+
+    # ---------- 内部实现 ----------
+
+    @staticmethod
+    def _boxes_of(det_result: DetectionResult) -> np.ndarray:
+        if not det_result.detections:
+            return np.zeros((0, 4), dtype=np.float32)
+        return np.array([d.bbox for d in det_result.detections], dtype=np.float32)
+
+    def _to_gray(self, frame):
+        h, w = frame.shape[:2]
+        self._scale = min(1.0, self.flow_max_side / float(max(h, w)))
+        if self._scale < 1.0:
+            frame = cv2.resize(
+                frame,
+                (max(int(w * self._scale), 1), max(int(h * self._scale), 1)),
+                interpolation=cv2.INTER_AREA,
+            )
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def _propagate_flow(self, frame) -> np.ndarray:
+        gray = self._to_gray(frame)
+        prev_gray = self._prev_gray
+        self._prev_gray = gray
+        boxes = self._boxes
+        if prev_gray is None or prev_gray.shape != gray.shape:
+            return boxes
+
+        # 只在框内找角点：一次 goodFeaturesToTrack + 一次 LK 光流覆盖所有框
+        small = boxes * self._scale
+        mask = np.zeros_like(prev_gray)
+        for x1, y1, x2, y2 in small.astype(int):
+            mask[max(y1, 0):y2 + 1, max(x1, 0):x2 + 1] = 255
+        pts = cv2.goodFeaturesToTrack(
+            prev_gray,
+            maxCorners=40 * len(boxes),
+            qualityLevel=0.01,
+            minDistance=3,
+            mask=mask,
+        )
+        if pts is None:
+            return boxes
+
+        nxt, status, _ = cv2.calcOpticalFlowPyrLK(
+            prev_gray, gray, pts, None, winSize=(15, 15), maxLevel=2
+        )
+        ok = status.reshape(-1) == 1
+        p0 = pts.reshape(-1, 2)[ok]
+        p1 = nxt.reshape(-1, 2)[ok]
+        if len(p0) == 0:
+            return boxes
+        disp = (p1 - p0) / self._scale
+
+        # (N_boxes, N_points) 归属矩阵，向量化判断点是否落在框内
+        inside = (
+            (p0[None, :, 0] >= small[:, None, 0])
+            & (p0[None, :, 0] <= small[:, None, 2])
+            & (p0[None, :, 1] >= small[:, None, 1])
+            & (p0[None, :, 1] <= small[:, None, 3])
+        )
+
+        new_boxes = boxes.copy()
+        for i in range(len(boxes)):
+            sel = inside[i]
+            if sel.sum() < self.min_points:
+                continue
+            dx, dy = np.median(disp[sel], axis=0)
+            new_boxes[i] += (dx, dy, dx, dy)
+        return new_boxes
+
+    def _update_velocity(self, det_result: DetectionResult):
+        frame_index = det_result.frame_index
+        current = {}
+        for det, box in zip(det_result.detections, self._boxes):
+            if det.track_id is not None:
+                current[det.track_id] = box
+
+        if self._last_key_index is not None and frame_index is not None:
+            gap = max(frame_index - self._last_key_index, 1)
+            velocity = {}
+            for tid, box in current.items():
+                prev = self._last_key_boxes.get(tid)
+                if prev is not None:
+                    velocity[tid] = (box - prev) / gap
+            self._velocity = velocity
+        else:
+            self._velocity = {}
+
+        self._key_boxes = self._boxes.copy()
+        self._last_key_boxes = current
+        self._last_key_index = frame_index
+
+    def _propagate_velocity(self, frame_index: Optional[int]) -> np.ndarray:
+        if frame_index is not None and self._last_key_index is not None:
+            # 从关键帧位置按帧间隔一次性外推
+            base = self._key_boxes
+            steps = max(frame_index - self._last_key_index, 0)
+        else:
+            base = self._boxes
+            steps = 1
+
+        new_boxes = base.copy()
+        for i, det in enumerate(self._last_result.detections):
+            v = self._velocity.get(det.track_id)
+            if v is not None:
+                new_boxes[i] += v * steps
+        return new_boxes
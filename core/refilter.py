@@ -0,0 +1,220 @@
+# core/refilter.py
+
+"""
+低阈值候选框的保存与重过滤：调整置信度 / IoU / 类别阈值时不必重新推理。
+
+- 推理时使用很低的置信度阈值（candidate_conf）与较宽松的 IoU 阈值（candidate_iou），
+  每帧的候选框以数组形式保存在 CandidateStore 中
+- 重过滤 = 置信度 / 类别掩码 + 按类别的向量化 NMS（core.box_ops.nms），300 个候选框约 2~3 ms
+- 候选框已经过 candidate_iou 的 NMS，因此重过滤的 IoU 阈值只能更严格（更小）；
+  置信度阈值只能不低于 candidate_conf
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Generator, Iterable, Optional
+
+import numpy as np
+
+from core.box_ops import nms
+from core.dto import DetectionResult
+
+logger = logging.getLogger(__name__)
+
+# 阈值为 None 时采用的值，与 Ultralytics predict 的默认值一致
+DEFAULT_CONF = 0.25
+DEFAULT_IOU = 0.7
+
+
+def refilter_indices(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    class_ids: np.ndarray,
+    conf: float,
+    iou: Optional[float] = None,
+    classes: Optional[Iterable[int]] = None,
+    max_det: Optional[int] = None,
+    class_conf: Optional[Dict[int, float]] = None,
+) -> np.ndarray:
+    """
+    对一帧候选框重新过滤，返回保留的索引（按分数降序）。
+
+    参数:
+        boxes / scores / class_ids: 候选框数组（xyxy）
+        conf: 置信度阈值
+        iou: NMS 的 IoU 阈值；为 None 时不再做 NMS
+        classes: 类别白名单；为 None 时保留全部类别
+        max_det: 最多保留的框数
+        class_conf: 按类别覆盖置信度阈值 {class_id: conf}
+    """
+    if class_conf:
+        thresholds = np.full(len(scores), conf, dtype=np.float32)
+        for cls_id, cls_conf in class_conf.items():
+            thresholds[class_ids == cls_id] = cls_conf
+        mask = scores >= thresholds
+    else:
+        mask = scores >= conf
+    if classes is not None:
+        mask &= np.isin(class_ids, np.fromiter(classes, dtype=np.int64))
+    idx = np.nonzero(mask)[0]
+    if len(idx) == 0:
+        return idx
+    if iou is None:
+        order = idx[np.argsort(-scores[idx], kind="stable")]
+        return order[:max_det] if max_det is not None else order
+
+    # 按类别分别抑制：每个类别的 IoU 矩阵更小，比类别偏移后整体做一次 NMS 更快
+    keep = nms(boxes[idx], scores[idx], iou_threshold=iou, class_ids=class_ids[idx], max_det=max_det)
+    return idx[keep]
+
+
+class CandidateStore:
+    """
+    按帧号保存低阈值候选框，并按新的阈值重建 DetectionResult。
+
+    用法:
+        store = CandidateStore(candidate_conf=0.01, candidate_iou=0.7)
+        store.add(det_result)                       # det_result 来自 conf=0.01, iou=0.7 的推理
+        r = store.filter(det_result.frame_index, conf=0.4, iou=0.5, classes={0, 2})
+    """
+
+    def __init__(
+        self,
+        candidate_conf: float = 0.01,
+        candidate_iou: float = 0.7,
+        max_frames: Optional[int] = None,
+    ):
+        """
+        参数:
+            candidate_conf: 推理时使用的置信度阈值（候选框下限）
+            candidate_iou: 推理时使用的 NMS IoU 阈值（重过滤 IoU 的上限）
+            max_frames: 最多保存的帧数，超过时丢弃最早加入的帧；None 表示不限
+        """
+        self.candidate_conf = float(candidate_conf)
+        self.candidate_iou = float(candidate_iou)
+        self.max_frames = max_frames
+        self._frames: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.names: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def frame_indices(self) -> list:
+        with self._lock:
+            return list(self._frames.keys())
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+
+    def add(self, det_result: DetectionResult):
+        """保存一帧的候选框（det_result.frame_index 不能为空）。"""
+        entry = self._entry(det_result)
+        with self._lock:
+            if det_result.names:
+                self.names = det_result.names
+            self._frames[det_result.frame_index] = entry
+            self._frames.move_to_end(det_result.frame_index)
+            if self.max_frames is not None:
+                while len(self._frames) > self.max_frames:
+                    self._frames.popitem(last=False)
+
+    def filter(
+        self,
+        frame_index: int,
+        conf: Optional[float] = None,
+        iou: Optional[float] = None,
+        classes: Optional[Iterable[int]] = None,
+        max_det: Optional[int] = None,
+        class_conf: Optional[Dict[int, float]] = None,
+    ) -> Optional[DetectionResult]:
+        """
+        按新阈值重建一帧的 DetectionResult；该帧没有候选框时返回 None。
+
+        conf / iou 为 None 时取 Ultralytics 默认值（0.25 / 0.7）；
+        conf 低于 candidate_conf、iou 高于 candidate_iou 时无法还原，分别按候选阈值处理。
+        """
+        with self._lock:
+            entry = self._frames.get(frame_index)
+            names = self.names
+        if entry is None:
+            return None
+        return self._build(frame_index, entry, names, conf, iou, classes, max_det, class_conf)
+
+    def filter_result(
+        self,
+        det_result: DetectionResult,
+        conf: Optional[float] = None,
+        iou: Optional[float] = None,
+        classes: Optional[Iterable[int]] = None,
+        max_det: Optional[int] = None,
+        class_conf: Optional[Dict[int, float]] = None,
+    ) -> DetectionResult:
+        """直接按新阈值过滤一帧候选框结果（不读写已保存的帧），阈值处理同 filter。"""
+        return self._build(
+            det_result.frame_index,
+            self._entry(det_result),
+            det_result.names,
+            conf,
+            iou,
+            classes,
+            max_det,
+            class_conf,
+        )
+
+    def _build(self, frame_index, entry, names, conf, iou, classes, max_det, class_conf) -> DetectionResult:
+        boxes, scores, class_ids, mask_areas, extra = entry
+        conf, iou = self._clamp(conf, iou)
+        keep = refilter_indices(boxes, scores, class_ids, conf, iou, classes, max_det, class_conf)
+        return DetectionResult.from_arrays(
+            boxes[keep],
+            scores[keep],
+            class_ids[keep],
+            names,
+            mask_areas=mask_areas[keep],
+            frame_index=frame_index,
+            **extra,
+        )
+
+    def filter_all(
+        self,
+        conf: Optional[float] = None,
+        iou: Optional[float] = None,
+        classes: Optional[Iterable[int]] = None,
+        max_det: Optional[int] = None,
+        class_conf: Optional[Dict[int, float]] = None,
+    ) -> Generator[DetectionResult, None, None]:
+        """按帧号顺序重过滤全部已保存的帧（用于以新阈值重新导出）。"""
+        classes = None if classes is None else list(classes)
+        for frame_index in sorted(self.frame_indices()):
+            result = self.filter(frame_index, conf, iou, classes, max_det, class_conf)
+            if result is not None:
+                yield result
+
+    @staticmethod
+    def _entry(det_result: DetectionResult) -> tuple:
+        arrays = det_result.to_arrays()
+        extra = {
+            "timestamp": det_result.timestamp,
+            "imgsz": det_result.imgsz,
+            "source": det_result.source,
+        }
+        return (
+            arrays["boxes"],
+            arrays["scores"],
+            arrays["class_ids"],
+            arrays["mask_areas"],
+            extra,
+        )
+
+    def _clamp(self, conf, iou):
+        conf = DEFAULT_CONF if conf is None else conf
+        iou = DEFAULT_IOU if iou is None else iou
+        if conf < self.candidate_conf:
+            conf = self.candidate_conf
+        if iou >= self.candidate_iou:
+            # 候选框已按 candidate_iou 抑制过，更宽松的阈值没有额外效果
+            iou = None
+        return conf, iou
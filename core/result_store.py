@@ -0,0 +1,333 @@
+# core/result_store.py
+
+"""
+ResultStore：基于 SQLite 的检测结果库，用于长时间摄像头 / 视频会话的事后查询。
+
+- 复用 BufferedSink 的“缓冲 + 后台线程批量落盘”机制，每批结果一个事务
+- WAL 模式：查询与写入互不阻塞
+- 索引：帧序号 / 时间、class_id / class_name + 置信度、track_id
+- 每次打开库会新建一条 run 记录，查询默认只看当前 run
+- 同一帧重复写入（如重过滤后重新导出）时覆盖该帧之前的检测记录
+- 库文件带 PRAGMA user_version，打开旧版本的库时自动补齐新增的列 / 表 / 索引
+"""
+
+import sqlite3
+import threading
+import time
+import logging
+from typing import List, Optional, Tuple
+
+from core.dto import DetectionResult
+from core.exporter import BufferedSink
+
+logger = logging.getLogger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    source     TEXT
+);
+CREATE TABLE IF NOT EXISTS frames (
+    run_id         INTEGER NOT NULL,
+    frame_index    INTEGER NOT NULL,
+    timestamp      REAL,
+    num_detections INTEGER NOT NULL,
+    inferred       INTEGER NOT NULL DEFAULT 1,
+    imgsz          INTEGER,
+    PRIMARY KEY (run_id, frame_index)
+);
+CREATE TABLE IF NOT EXISTS detections (
+    run_id      INTEGER NOT NULL,
+    frame_index INTEGER NOT NULL,
+    timestamp   REAL,
+    class_id    INTEGER NOT NULL,
+    class_name  TEXT,
+    confidence  REAL NOT NULL,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER,
+    track_id    INTEGER,
+    mask_area   REAL
+);
+CREATE TABLE IF NOT EXISTS frame_sources (
+    run_id      INTEGER NOT NULL,
+    frame_index INTEGER NOT NULL,
+    path        TEXT NOT NULL,
+    PRIMARY KEY (run_id, frame_index)
+);
+CREATE INDEX IF NOT EXISTS idx_det_frame ON detections (run_id, frame_index);
+CREATE INDEX IF NOT EXISTS idx_det_time ON detections (run_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_det_class ON detections (run_id, class_id, confidence);
+CREATE INDEX IF NOT EXISTS idx_det_class_name ON detections (run_id, class_name, confidence);
+CREATE INDEX IF NOT EXISTS idx_det_track ON detections (run_id, track_id, frame_index)
+    WHERE track_id IS NOT NULL;
+"""
+
+# 库结构版本（PRAGMA user_version）；0 为引入版本号之前的库
+_SCHEMA_VERSION = 1
+
+# 版本号引入之前陆续新增的列：(表, 列, 定义)，旧库缺少时用 ALTER TABLE 补齐
+_ADDED_COLUMNS = (
+    ("frames", "inferred", "INTEGER NOT NULL DEFAULT 1"),
+    ("frames", "imgsz", "INTEGER"),
+)
+
+_FRAME_COLUMNS = "run_id, frame_index, timestamp, num_detections, inferred, imgsz"
+
+_DET_COLUMNS = (
+    "frame_index, timestamp, class_id, class_name, confidence, "
+    "x1, y1, x2, y2, track_id, mask_area"
+)
+
+
+class ResultStore(BufferedSink):
+    """
+    SQLite 结果库。既可以作为导出器挂到 DetectionController 上实时写入，
+    也可以单独打开已有库做查询。
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        source: Optional[str] = None,
+        new_run: bool = True,
+        **kwargs,
+    ):
+        """
+        参数:
+            db_path: SQLite 文件路径
+            source: 本次 run 的来源描述（视频路径 / 摄像头 ID 等），仅用于记录
+            new_run: True 新建一条 run 记录；False 则沿用库中最近的 run（仅查询时使用）
+            kwargs: 透传给 BufferedSink（flush_interval / flush_size / max_pending）
+        """
+        self.db_path = db_path
+
+        # 写连接：仅在后台落盘线程和 close() 中使用
+        self._write_conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._write_conn.execute("PRAGMA journal_mode=WAL")
+        self._write_conn.execute("PRAGMA synchronous=NORMAL")
+        _migrate(self._write_conn, db_path)
+        last_run = self._write_conn.execute("SELECT MAX(run_id) FROM runs").fetchone()[0]
+        if new_run or last_run is None:
+            cur = self._write_conn.execute(
+                "INSERT INTO runs (started_at, source) VALUES (?, ?)",
+                (time.time(), source),
+            )
+            self._write_conn.commit()
+            self.run_id = cur.lastrowid
+        else:
+            self.run_id = last_run
+
+        # 读连接：查询接口使用，WAL 下不会被写事务阻塞
+        self._read_conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._read_lock = threading.Lock()
+
+        super().__init__(**kwargs)
+        logger.info("ResultStore 打开结果库: %s (run_id=%d)", db_path, self.run_id)
+
+    # ---------- 写入 ----------
+
+    def _write_batch(self, batch: List[DetectionResult]):
+        # 同一批内同一帧出现多次时只保留最后一次
+        batch = list({r.frame_index: r for r in batch}.values())
+        frame_rows = []
+        det_rows = []
+        source_rows = []
+        for r in batch:
+            if r.source is not None:
+                source_rows.append((self.run_id, r.frame_index, r.source))
+            frame_rows.append(
+                (
+                    self.run_id,
+                    r.frame_index,
+                    r.timestamp,
+                    len(r.detections),
+                    int(r.inferred),
+                    r.imgsz,
+                )
+            )
+            for det in r.detections:
+                x1, y1, x2, y2 = det.bbox
+                det_rows.append(
+                    (
+                        self.run_id,
+                        r.frame_index,
+                        r.timestamp,
+                        det.class_id,
+                        det.class_name,
+                        det.confidence,
+                        x1,
+                        y1,
+                        x2,
+                        y2,
+                        det.track_id,
+                        det.mask_area,
+                    )
+                )
+
+        # 一批结果一个事务
+        with self._write_conn:
+            # 同一帧再次写入时先删掉旧的检测记录，frames / frame_sources 由 INSERT OR REPLACE 覆盖
+            self._write_conn.executemany(
+                "DELETE FROM detections WHERE run_id = ? AND frame_index = ?",
+                [(row[0], row[1]) for row in frame_rows],
+            )
+            self._write_conn.executemany(
+                f"INSERT OR REPLACE INTO frames ({_FRAME_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)", frame_rows
+            )
+            if source_rows:
+                self._write_conn.executemany(
+                    "INSERT OR REPLACE INTO frame_sources VALUES (?, ?, ?)", source_rows
+                )
+            if det_rows:
+                self._write_conn.executemany(
+                    f"INSERT INTO detections (run_id, {_DET_COLUMNS}) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    det_rows,
+                )
+
+    def _close_backend(self):
+        self._write_conn.close()
+        with self._read_lock:
+            self._read_conn.close()
+
+    # ---------- 查询 ----------
+
+    def _query(self, sql: str, params: tuple) -> list:
+        with self._read_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    def _build_where(
+        self,
+        run_id: Optional[int],
+        class_id: Optional[int] = None,
+        class_name: Optional[str] = None,
+        min_conf: Optional[float] = None,
+        track_id: Optional[int] = None,
+        frame_range: Optional[Tuple[int, int]] = None,
+        time_range: Optional[Tuple[float, float]] = None,
+    ) -> Tuple[str, list]:
+        clauses = ["run_id = ?"]
+        params = [self.run_id if run_id is None else run_id]
+        if class_id is not None:
+            clauses.append("class_id = ?")
+            params.append(class_id)
+        if class_name is not None:
+            clauses.append("class_name = ?")
+            params.append(class_name)
+        if min_conf is not None:
+            clauses.append("confidence >= ?")
+            params.append(min_conf)
+        if track_id is not None:
+            clauses.append("track_id = ?")
+            params.append(track_id)
+        if frame_range is not None:
+            clauses.append("frame_index BETWEEN ? AND ?")
+            params.extend(frame_range)
+        if time_range is not None:
+            clauses.append("timestamp BETWEEN ? AND ?")
+            params.extend(time_range)
+        return " AND ".join(clauses), params
+
+    def query_detections(
+        self,
+        limit: Optional[int] = None,
+        run_id: Optional[int] = None,
+        **filters,
+    ) -> List[dict]:
+        """
+        按条件查询检测记录。
+
+        可用过滤条件: class_id, class_name, min_conf, track_id,
+        frame_range=(start, end), time_range=(t0, t1)
+
+        返回:
+            dict 列表，按 frame_index 升序
+        """
+        where, params = self._build_where(run_id, **filters)
+        sql = f"SELECT {_DET_COLUMNS} FROM detections WHERE {where} ORDER BY frame_index"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        keys = [c.strip() for c in _DET_COLUMNS.split(",")]
+        return [dict(zip(keys, row)) for row in self._query(sql, tuple(params))]
+
+    def frames_with(self, run_id: Optional[int] = None, **filters) -> List[int]:
+        """返回包含满足条件目标的帧序号列表，例如 frames_with(class_name="person", min_conf=0.8)。"""
+        where, params = self._build_where(run_id, **filters)
+        rows = self._query(
+            f"SELECT DISTINCT frame_index FROM detections WHERE {where} ORDER BY frame_index",
+            tuple(params),
+        )
+        return [row[0] for row in rows]
+
+    def track_span(self, track_id: int, run_id: Optional[int] = None) -> Optional[dict]:
+        """
+        查询某个 track 的出现区间。
+
+        返回:
+            {'first_frame', 'last_frame', 'first_time', 'last_time', 'count'}，不存在时返回 None
+        """
+        where, params = self._build_where(run_id, track_id=track_id)
+        rows = self._query(
+            "SELECT MIN(frame_index), MAX(frame_index), MIN(timestamp), MAX(timestamp), COUNT(*) "
+            f"FROM detections WHERE {where}",
+            tuple(params),
+        )
+        first_frame, last_frame, first_time, last_time, count = rows[0]
+        if count == 0:
+            return None
+        return {
+            "first_frame": first_frame,
+            "last_frame": last_frame,
+            "first_time": first_time,
+            "last_time": last_time,
+            "count": count,
+        }
+
+    def frame_sources(self, frame_indices, run_id: Optional[int] = None) -> dict:
+        """查询帧对应的图片路径（目录批量检测），返回 {frame_index: path}。"""
+        frame_indices = [int(i) for i in frame_indices]
+        if not frame_indices:
+            return {}
+        placeholders = ", ".join("?" * len(frame_indices))
+        rows = self._query(
+            "SELECT frame_index, path FROM frame_sources "
+            f"WHERE run_id = ? AND frame_index IN ({placeholders})",
+            (self.run_id if run_id is None else run_id, *frame_indices),
+        )
+        return {idx: path for idx, path in rows}
+
+    def class_counts(self, run_id: Optional[int] = None, **filters) -> dict:
+        """按类别统计检测数量。"""
+        where, params = self._build_where(run_id, **filters)
+        rows = self._query(
+            f"SELECT class_name, COUNT(*) FROM detections WHERE {where} GROUP BY class_name",
+            tuple(params),
+        )
+        return {name: count for name, count in rows}
+
+    def runs(self) -> List[dict]:
+        """列出库中所有 run。"""
+        rows = self._query("SELECT run_id, started_at, source FROM runs ORDER BY run_id", ())
+        return [{"run_id": r[0], "started_at": r[1], "source": r[2]} for r in rows]
+
+
+def _migrate(conn: sqlite3.Connection, db_path: str):
+    """建表并把旧版本的库升级到 _SCHEMA_VERSION；库版本比程序新时拒绝打开。"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > _SCHEMA_VERSION:
+        raise RuntimeError(
+            f"结果库版本 {version} 高于当前程序支持的版本 {_SCHEMA_VERSION}，请升级程序后再打开: {db_path}"
+        )
+    with conn:
+        # 新表与索引由 IF NOT EXISTS 补齐；已有的表不会被修改，缺少的列单独 ALTER TABLE
+        conn.executescript(_SCHEMA)
+        if version < 1:
+            for table, column, definition in _ADDED_COLUMNS:
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                    logger.info("结果库升级: %s 表新增列 %s (%s)", table, column, db_path)
+        if version != _SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
@@ -1,31 +1,177 @@
 # core/source.py
 
 import cv2
+import glob
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import Generator, Optional, Tuple
+from typing import Generator, List, Optional, Tuple
 import logging
 
+from core.thread_budget import pin_current_thread, stage_threads
+
 logger = logging.getLogger(__name__)
 
+# DIRECTORY 类型识别的图片扩展名
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+# 降采样解码的缩小倍数 -> imread 标志（JPEG 在 DCT 阶段直接缩小，解码耗时与内存随倍数下降）
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def _open_video(path) -> cv2.VideoCapture:
+    """打开视频文件；有生效的线程预算时按预算限制 FFmpeg 解码线程数（默认按全部核数开线程）。"""
+    threads = stage_threads("decode")
+    if threads is not None and hasattr(cv2, "CAP_PROP_N_THREADS"):
+        cap = cv2.VideoCapture(path, cv2.CAP_ANY, [cv2.CAP_PROP_N_THREADS, threads])
+        if cap.isOpened():
+            return cap
+        cap.release()
+    return cv2.VideoCapture(path)
+
+
+def _jpeg_size(f) -> Optional[Tuple[int, int]]:
+    """扫描 JPEG 标记段直到 SOFn，返回 (width, height)；不是 JPEG 或格式异常时返回 None。"""
+    if f.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            # 填充字节
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if 0xD0 <= code <= 0xD9 or code == 0x01:
+            # 无长度字段的标记
+            continue
+        length = int.from_bytes(f.read(2), "big")
+        if code in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            return int.from_bytes(data[3:5], "big"), int.from_bytes(data[1:3], "big")
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _image_size(path: str) -> Optional[Tuple[int, int]]:
+    """只读取文件头得到图片的 (width, height)：JPEG 直接解析，其余格式用 Pillow；失败时返回 None。"""
+    try:
+        with open(path, "rb") as f:
+            size = _jpeg_size(f)
+        if size is not None:
+            return size
+        from PIL import Image
+
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def read_image(path: str, min_size: Optional[int] = None):
+    """
+    读取图片，在不影响推理 / 显示的前提下按 1/2、1/4、1/8 降采样解码。
+
+    参数:
+        path: 图片路径
+        min_size: 解码结果长边的下限（通常取推理尺寸与显示尺寸中的较大者）；None 表示原图分辨率
+
+    返回:
+        (frame, scale)：frame 读取失败时为 None；scale 为原图与解码结果的边长之比，
+        检测框乘以 scale 即回到原图坐标（见 DetectionResult.scale_boxes）
+    """
+    if min_size:
+        size = _image_size(path)
+        if size is not None:
+            long_side = max(size)
+            for factor, flag in _REDUCED_FLAGS:
+                if long_side // factor >= min_size:
+                    frame = cv2.imread(path, flag)
+                    if frame is None:
+                        break
+                    scale = long_side / float(max(frame.shape[:2]))
+                    logger.debug(
+                        "降采样解码: %s %dx%d -> %dx%d (1/%d)",
+                        path, size[0], size[1], frame.shape[1], frame.shape[0], factor,
+                    )
+                    return frame, scale
+    return cv2.imread(path), 1.0
+
 
 class SourceType(Enum):
     IMAGE = "image"
     VIDEO = "video"
     CAMERA = "camera"
+    DIRECTORY = "directory"
 
 
 class FrameSource:
     """抽象帧源，根据源类型（图片、视频文件、摄像头）提供帧数据。"""
 
-    def __init__(self, source_type: SourceType, path_or_id=None):
+    def __init__(
+        self,
+        source_type: SourceType,
+        path_or_id=None,
+        frame_pool=None,
+        use_index: bool = False,
+        index_cache_dir: Optional[str] = None,
+        decode_workers: Optional[int] = None,
+        prefetch: int = 32,
+        min_decode_size: Optional[int] = None,
+        frame_cache=None,
+        cache_scale: float = 1.0,
+    ):
         """
         初始化 FrameSource。
         参数:
             source_type: SourceType，数据源类型 (IMAGE, VIDEO, CAMERA)
             path_or_id: 当类型为 VIDEO 时为视频文件路径，为 CAMERA 时可为摄像头设备ID（默认0），IMAGE时为图像路径。
+                        DIRECTORY 时为文件夹、glob 模式（如 "data/**/*.jpg"）或它们组成的列表。
+            frame_pool: 可选的 core.frame_pool.FramePool。设置后 VIDEO/CAMERA 帧解码到池内缓冲，
+                        产出的帧引用计数为 1，由调用方在用完（或交给下游 retain 之后）release。
+            use_index: VIDEO 类型打开时读取 / 建立帧索引（core.video_index），用于 seek 与区间读取；
+                       为 False 时在第一次 seek 时再建立
+            index_cache_dir: 索引缓存目录，为空时缓存在视频文件旁边
+            decode_workers: DIRECTORY 类型的并行解码线程数，默认取线程预算（core.thread_budget）的解码线程数，
+                            未设置预算时为 4
+            prefetch: DIRECTORY 类型最多提前解码的图片数
+            min_decode_size: IMAGE / DIRECTORY 类型解码结果长边的下限。大图按 1/2、1/4、1/8 降采样解码，
+                             缩小比例记录在 decode_scale / decode_scales 中；None 表示按原图分辨率解码
+            frame_cache: 可选的 core.frame_cache.FrameCache（仅 VIDEO 类型）。命中时帧直接从内存映射切片读取，
+                         不再解码；未命中时第一次从头完整读到结尾的过程中写入缓存
+            cache_scale: VIDEO 类型产出帧的缩放比例（如 0.5），缩放后的帧才写入缓存，
+                         原图坐标 = 检测坐标 * decode_scale
         """
         self.source_type = source_type
         self.path_or_id = path_or_id
+        self.frame_pool = frame_pool
+        self._frame_shape = None  # 最近一帧的尺寸，用于从缓冲池取对应大小的缓冲
+        self.use_index = use_index
+        self.index_cache_dir = index_cache_dir
+        self.index = None  # core.video_index.VideoIndex，仅 VIDEO 类型
+        self.position = 0  # 下一次读取的帧号（VIDEO 类型）
+        self.decode_workers = max(int(decode_workers or stage_threads("decode", 4)), 1)
+        self.prefetch = max(int(prefetch), 1)
+        self.paths: List[str] = []  # DIRECTORY 类型展开后的图片路径（有序）
+        self.failed_paths: List[str] = []
+        self.min_decode_size = min_decode_size
+        self.decode_scale = 1.0  # IMAGE 类型：原图与解码结果的边长之比
+        self.decode_scales = {}  # DIRECTORY 类型：path -> 边长之比（只记录降采样解码的图片）
+        self.frame_cache = frame_cache
+        self.cache_scale = float(cache_scale)
+        if source_type == SourceType.VIDEO and self.cache_scale != 1.0:
+            self.decode_scale = 1.0 / self.cache_scale
+        self.fps = 0.0  # VIDEO / CAMERA 类型打开后的帧率（未知时为 0）
+        self._cached = None        # 帧缓存命中时的 (N, H, W, C) 内存映射
+        self._cache_writer = None  # 帧缓存未命中时的写入器
         self.cap: Optional[cv2.VideoCapture] = None
         self.is_open = False
 
@@ -47,26 +193,130 @@ class FrameSource:
             # 打开默认摄像头（设备ID 0）
             self.cap = cv2.VideoCapture(0 if self.path_or_id is None else self.path_or_id)
         elif self.source_type == SourceType.VIDEO:
+            if self.frame_cache is not None:
+                hit = self.frame_cache.lookup(self.path_or_id, self.cache_scale)
+                if hit is not None:
+                    # 缓存命中：不打开解码器，读帧即切片
+                    self._cached, meta = hit
+                    self.fps = float(meta.get("fps") or 0.0)
+                    self.is_open = True
+                    self.position = 0
+                    return True
             # 打开视频文件
-            self.cap = cv2.VideoCapture(self.path_or_id)
+            self.cap = _open_video(self.path_or_id)
+        elif self.source_type == SourceType.DIRECTORY:
+            # 展开文件夹 / glob 模式，不打开任何解码器
+            self.paths = self._expand_paths(self.path_or_id)
+            self.failed_paths = []
+            self.decode_scales = {}
+            self.is_open = len(self.paths) > 0
+            if self.is_open:
+                logger.info("目录帧源共 %d 张图片", len(self.paths))
+            else:
+                logger.error("目录帧源中没有图片: %s", self.path_or_id)
+            return self.is_open
         else:
             # IMAGE 类型无需调用 open
             self.is_open = False
             return False
 
         self.is_open = self.cap.isOpened()
+        self.position = 0
+        if self.is_open:
+            self.fps = float(self.cap.get(cv2.CAP_PROP_FPS) or 0.0)
+            if self.frame_cache is not None and self.source_type == SourceType.VIDEO:
+                self._cache_writer = self.frame_cache.writer(self.path_or_id, self.cache_scale, self.fps)
         if not self.is_open:
             logger.error(
                 "打开帧源失败: type=%s, path_or_id=%s",
                 self.source_type,
                 self.path_or_id,
             )
+        elif self.source_type == SourceType.VIDEO and self.use_index:
+            self.get_index()
         return self.is_open
 
-    def frames(self) -> Generator[Optional[Tuple[Optional[str], Optional[object]]], None, None]:
+    def get_index(self):
+        """返回视频帧索引，首次调用时读取缓存或扫描建立（仅 VIDEO 类型）。"""
+        if self.source_type != SourceType.VIDEO:
+            raise ValueError("只有 VIDEO 类型支持帧索引")
+        if self.index is None:
+            from core.video_index import VideoIndex
+
+            self.index = VideoIndex.load_or_build(self.path_or_id, self.index_cache_dir)
+        return self.index
+
+    def seek(self, frame_idx: int) -> bool:
+        """
+        定位到指定帧，下一次读取返回该帧（仅 VIDEO 类型）。
+
+        有关键帧信息时：若目标帧就在当前位置之后且与当前位置属于同一关键帧区间，
+        直接向前解码；否则跳到目标之前最近的关键帧，再向前 grab 到目标帧（帧精确）。
+        没有关键帧信息时（未安装 PyAV）使用 OpenCV 的 CAP_PROP_POS_FRAMES，并按索引时间戳校验落点，
+        不一致时从头顺序 grab 到目标帧。
+        """
+        if not self.is_open or self.source_type != SourceType.VIDEO:
+            logger.error("seek 需要已打开的 VIDEO 帧源")
+            return False
+
+        if self._cached is not None:
+            self.position = min(max(int(frame_idx), 0), len(self._cached))
+            return True
+        if frame_idx != self.position:
+            # 缓存只接受从头开始的顺序读取
+            self._abort_cache_writer()
+
+        index = self.get_index()
+        if index.frame_count:
+            frame_idx = min(max(int(frame_idx), 0), index.frame_count)
+        if frame_idx == self.position:
+            return True
+
+        if not index.has_keyframes:
+            if self._seek_pos_frames(index, frame_idx):
+                self.position = frame_idx
+                return True
+            logger.warning("CAP_PROP_POS_FRAMES 定位不精确（target=%d），从头顺序读取到目标帧", frame_idx)
+            keyframe = 0
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.position = 0
+        else:
+            keyframe = index.keyframe_before(frame_idx)
+        if not (keyframe <= self.position < frame_idx):
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+            self.position = keyframe
+        while self.position < frame_idx:
+            if not self.cap.grab():
+                logger.warning("seek 过程中读取失败: target=%d, position=%d", frame_idx, self.position)
+                return False
+            self.position += 1
+        logger.debug("seek 完成: frame=%d (keyframe=%d)", frame_idx, keyframe)
+        return True
+
+    def _seek_pos_frames(self, index, frame_idx: int) -> bool:
+        """
+        用 CAP_PROP_POS_FRAMES 定位并校验：定位后 CAP_PROP_POS_MSEC 应为上一帧的时间戳
+        （与 OpenCV 建立索引时 grab 后读到的时间戳一致），偏差超过半帧视为定位不精确。
+        """
+        if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx):
+            return False
+        if frame_idx == 0:
+            return True
+        expected = index.timestamp_of(frame_idx - 1)
+        actual = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        tolerance = 0.5 / index.fps if index.fps > 0 else 0.02
+        return abs(actual - expected) <= tolerance
+
+    def frames(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Generator[Optional[Tuple[Optional[str], Optional[object]]], None, None]:
         """
         帧生成器：逐帧产出 (flag, frame) 元组。
 
+        VIDEO 类型可指定区间 [start, end)：先 seek 到 start，读到 end（不含）为止。
+
         对于 IMAGE 类型，仅产出一次 (None, image_frame)。
         对于 VIDEO/CAMERA 类型，循环读取视频/摄像头帧:
             每次 yield (None, frame)；当结束时 yield ('end', None) 以表示结束。
@@ -78,17 +328,154 @@ class FrameSource:
         """
         if self.source_type == SourceType.IMAGE:
             logger.debug("FrameSource.frames: 读取单张图像 %s", self.path_or_id)
-            yield None, cv2.imread(self.path_or_id)
+            frame, self.decode_scale = read_image(self.path_or_id, self.min_decode_size)
+            yield None, frame
+        elif self.source_type == SourceType.DIRECTORY:
+            for _, _, frame in self.decoded():
+                yield None, frame
+            yield "end", None
         else:
             logger.debug("FrameSource.frames: 开始连续读取帧 type=%s", self.source_type)
+            if start is not None and not self.seek(start):
+                yield "end", None
+                return
             while self.is_open:
-                ret, frame = self.cap.read()
+                if end is not None and self.position >= end:
+                    break
+                ret, frame = self._read()
                 if not ret:
                     logger.info("帧源读取结束或失败: type=%s", self.source_type)
                     break
                 yield None, frame
             yield "end", None
 
+    def _read(self):
+        """读取一帧；有缓冲池时直接解码到池内缓冲（首帧用于确定尺寸）。"""
+        if self._cached is not None:
+            if self.position >= len(self._cached):
+                return False, None
+            frame = self._cached[self.position]
+            self.position += 1
+            return True, frame
+
+        pool = self.frame_pool
+        shape = self._frame_shape
+        buf = pool.acquire(shape) if pool is not None and shape is not None else None
+        if buf is None:
+            ret, frame = self.cap.read()
+        else:
+            ret, frame = self.cap.read(image=buf)
+            if not ret or frame is not buf:
+                # 读取失败或分辨率变化导致重新分配，归还缓冲
+                pool.release(buf)
+        if ret and frame is not None:
+            self._frame_shape = frame.shape
+            if self.cache_scale != 1.0:
+                scaled = cv2.resize(
+                    frame, None, fx=self.cache_scale, fy=self.cache_scale, interpolation=cv2.INTER_AREA
+                )
+                if pool is not None:
+                    pool.release(frame)
+                frame = scaled
+            writer = self._cache_writer
+            if writer is not None:
+                if writer.count == self.position:
+                    writer.append(frame)
+                else:
+                    self._abort_cache_writer()
+            self.position += 1
+        elif self._cache_writer is not None:
+            # 从头顺序读到结尾，缓存完成
+            self._cache_writer.commit()
+            self._cache_writer = None
+        return ret, frame
+
+    def _abort_cache_writer(self):
+        if self._cache_writer is not None:
+            self._cache_writer.abort()
+            self._cache_writer = None
+
+    # ---------- DIRECTORY 类型 ----------
+
+    @staticmethod
+    def _expand_paths(spec) -> List[str]:
+        specs = [spec] if isinstance(spec, str) else list(spec or [])
+        paths = []
+        for item in specs:
+            if os.path.isdir(item):
+                for root, _, files in os.walk(item):
+                    paths.extend(
+                        os.path.join(root, f)
+                        for f in files
+                        if f.lower().endswith(IMAGE_EXTENSIONS)
+                    )
+            elif os.path.isfile(item):
+                paths.append(item)
+            else:
+                paths.extend(
+                    p
+                    for p in glob.glob(item, recursive=True)
+                    if os.path.isfile(p) and p.lower().endswith(IMAGE_EXTENSIONS)
+                )
+        # 去重并排序，保证 frame_index 在多次运行之间稳定
+        return sorted(set(paths))
+
+    def decoded(self, start: int = 0) -> Generator[Tuple[int, str, object], None, None]:
+        """
+        DIRECTORY 类型：用线程池并行解码，按路径顺序产出 (index, path, frame)。
+
+        最多提前解码 prefetch 张；无法解码的图片记入 failed_paths 并跳过。
+        """
+        if not self.is_open:
+            return
+        executor = ThreadPoolExecutor(
+            max_workers=self.decode_workers,
+            thread_name_prefix="decode",
+            initializer=pin_current_thread,
+            initargs=("decode",),
+        )
+        todo = iter(enumerate(self.paths[start:], start=start))
+        pending = deque()
+
+        def submit(n):
+            for index, path in itertools.islice(todo, n):
+                pending.append(
+                    (index, path, executor.submit(read_image, path, self.min_decode_size))
+                )
+
+        try:
+            submit(self.prefetch)
+            while pending and self.is_open:
+                index, path, future = pending.popleft()
+                submit(1)
+                frame, scale = future.result()
+                if scale != 1.0:
+                    self.decode_scales[path] = scale
+                if frame is None:
+                    logger.warning("图片解码失败，跳过: %s", path)
+                    self.failed_paths.append(path)
+                    continue
+                yield index, path, frame
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def batches(self, batch_size: int, start: int = 0):
+        """
+        DIRECTORY 类型：按 batch 产出 (indices, paths, frames)，供批量推理使用。
+
+        解码在后台线程中提前进行，与调用方的推理重叠。
+        """
+        batch = []
+        for item in self.decoded(start):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield tuple(list(x) for x in zip(*batch))
+                batch = []
+        if batch:
+            yield tuple(list(x) for x in zip(*batch))
+
     def release(self):
         """释放视频流/摄像头资源。"""
         if self.cap:
@@ -98,4 +485,6 @@ class FrameSource:
                 self.path_or_id,
             )
             self.cap.release()
+        self._abort_cache_writer()
+        self._cached = None
         self.is_open = False
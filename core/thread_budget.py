@@ -0,0 +1,169 @@
+# core/thread_budget.py
+
+"""
+ThreadBudget：进程级线程预算，统一分配解码 / 推理 / 主线程（界面、可视化、导出）各阶段的线程数。
+
+OpenCV 的全局线程池（cv2.resize / cvtColor 等）、FFmpeg 解码线程、Torch 算子内线程池默认都按
+「全部核数」开线程，同时运行时相互争抢，延迟抖动明显。ThreadBudget 把可用核拆成三份：
+
+- infer: Torch 算子内线程数（torch.set_num_threads），算子间线程数固定为 1
+- decode: 每路视频的 FFmpeg 解码线程数（CAP_PROP_N_THREADS）与目录帧源的并行解码线程数
+- main: OpenCV 全局线程池大小（cv2.setNumThreads），主线程的可视化缩放、运动门控等使用
+
+pin=True 时把可用 CPU 切成互不重叠的 CPU 集合（核不够时后面的阶段与前面的重叠），
+各阶段的线程启动时调用 pin_current_thread(stage) 经 os.sched_setaffinity 绑定到对应集合
+（仅 Linux，按线程生效；之后由该线程创建的线程继承同一集合）。未调用 apply() 时一切保持默认。
+
+用法:
+    ThreadBudget(total=8, pin=True).apply()   # 启动时调用一次，日志输出实际生效的分配
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("infer", "decode", "main")
+
+# 当前生效的预算（apply() 设置），各阶段通过下面的模块级函数读取
+_current: Optional["ThreadBudget"] = None
+
+
+def available_cpus() -> List[int]:
+    """当前进程可用的 CPU 编号（遵守已有的亲和性 / 容器限制）。"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class ThreadBudget:
+    """按阶段分配线程数与 CPU 集合。"""
+
+    def __init__(
+        self,
+        total: Optional[int] = None,
+        infer: Optional[int] = None,
+        decode: Optional[int] = None,
+        main: Optional[int] = None,
+        pin: bool = False,
+    ):
+        """
+        参数:
+            total: 参与分配的核数，默认为当前进程可用的全部核
+            infer: Torch 算子内线程数，默认 total - decode - main
+            decode: 解码线程数，默认 total 的 1/4
+            main: OpenCV 全局线程池大小，默认 total 的 1/8
+            pin: 是否把各阶段线程绑定到互不重叠的 CPU 集合
+        """
+        cpus = available_cpus()
+        if total:
+            cpus = cpus[: max(int(total), 1)]
+        self.cpus = cpus
+        n = len(cpus)
+        self.decode_threads = max(int(decode or n // 4), 1)
+        self.main_threads = max(int(main or n // 8), 1)
+        self.infer_threads = max(int(infer or n - self.decode_threads - self.main_threads), 1)
+        self.pin = bool(pin) and hasattr(os, "sched_setaffinity")
+        if pin and not self.pin:
+            logger.warning("当前平台不支持 os.sched_setaffinity，忽略 CPU 绑定")
+        self.cpu_sets: Dict[str, set] = self._split() if self.pin else {}
+
+    def threads(self, stage: str) -> int:
+        return {"infer": self.infer_threads, "decode": self.decode_threads, "main": self.main_threads}[stage]
+
+    def apply(self) -> dict:
+        """设置 OpenCV / Torch 线程数，把调用线程（主线程）绑定到 main 集合，设为当前预算并返回实际分配。"""
+        global _current
+
+        cv2.setNumThreads(self.main_threads)
+        try:
+            import torch
+
+            torch.set_num_threads(self.infer_threads)
+            try:
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                logger.warning("Torch 已开始并行计算，算子间线程数保持不变")
+        except ImportError:
+            pass
+
+        _current = self
+        # 主线程随后创建的线程（结果总线、导出等）继承 main 集合，推理 / 解码线程再各自绑定
+        self.pin_current_thread("main")
+        report = self.report()
+        logger.info("线程预算已生效: %s", report)
+        return report
+
+    def report(self) -> dict:
+        """实际生效的分配（从 OpenCV / Torch 读回）。"""
+        report = {
+            "cpus": len(self.cpus),
+            "infer_threads": self.infer_threads,
+            "interop_threads": None,
+            "decode_threads": self.decode_threads,
+            "opencv_threads": cv2.getNumThreads(),
+            "pin": self.pin,
+        }
+        try:
+            import torch
+
+            report["infer_threads"] = torch.get_num_threads()
+            report["interop_threads"] = torch.get_num_interop_threads()
+        except ImportError:
+            pass
+        if self.pin:
+            report["cpu_sets"] = {stage: _format_cpus(cpus) for stage, cpus in self.cpu_sets.items()}
+        return report
+
+    def pin_current_thread(self, stage: str):
+        """把调用线程绑定到 stage 的 CPU 集合；未开启绑定或 stage 未知时不做任何事。"""
+        cpus = self.cpu_sets.get(stage)
+        if not cpus:
+            return
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logger.warning("绑定 CPU 失败 (stage=%s, cpus=%s): %s", stage, _format_cpus(cpus), e)
+
+    def _split(self) -> Dict[str, set]:
+        sets = {}
+        start, n = 0, len(self.cpus)
+        for stage in STAGES:
+            count = min(self.threads(stage), n)
+            if start + count > n:
+                start = n - count
+            sets[stage] = set(self.cpus[start : start + count])
+            start += count
+        return sets
+
+
+# ---------- 各阶段使用的模块级接口 ----------
+
+
+def current_budget() -> Optional[ThreadBudget]:
+    return _current
+
+
+def pin_current_thread(stage: str):
+    """线程启动时调用：有生效的预算时绑定到 stage 的 CPU 集合，否则不做任何事。"""
+    if _current is not None:
+        _current.pin_current_thread(stage)
+
+
+def stage_threads(stage: str, default: Optional[int] = None) -> Optional[int]:
+    """stage 在当前预算中的线程数；没有生效的预算时返回 default。"""
+    return _current.threads(stage) if _current is not None else default
+
+
+def _format_cpus(cpus) -> str:
+    """{0, 1, 2, 5} -> "0-2,5"。"""
+    parts = []
+    for cpu in sorted(cpus):
+        if parts and cpu == parts[-1][1] + 1:
+            parts[-1][1] = cpu
+        else:
+            parts.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in parts)
@@ -0,0 +1,104 @@
+# core/tiling.py
+
+"""
+切片（tiled）推理辅助函数：用于高分辨率画面中的小目标检测。
+
+- make_tiles：按模型分辨率把整帧切成带重叠的切片
+- merge_tile_results：把各切片（以及可选的整帧低分辨率结果）映射回原图坐标，
+  再做一次跨切片的向量化 NMS，得到单个 DetectionResult
+"""
+
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.box_ops import nms
+from core.dto import DetectionResult
+
+logger = logging.getLogger(__name__)
+
+
+def _tile_starts(length: int, tile: int, stride: int) -> List[int]:
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, stride))
+    # 最后一块贴齐边缘，保证所有切片尺寸一致
+    starts.append(length - tile)
+    return starts
+
+
+def make_tiles(
+    height: int,
+    width: int,
+    tile_size: int,
+    overlap: float = 0.2,
+) -> List[Tuple[int, int, int, int]]:
+    """
+    生成切片窗口列表。
+
+    参数:
+        height / width: 原图尺寸
+        tile_size: 切片边长（通常等于模型 imgsz）
+        overlap: 相邻切片重叠比例 [0, 0.9]
+
+    返回:
+        [(x1, y1, x2, y2), ...]
+    """
+    overlap = min(max(overlap, 0.0), 0.9)
+    stride = max(int(tile_size * (1.0 - overlap)), 1)
+    tiles = []
+    for y in _tile_starts(height, tile_size, stride):
+        for x in _tile_starts(width, tile_size, stride):
+            tiles.append((x, y, min(x + tile_size, width), min(y + tile_size, height)))
+    return tiles
+
+
+def merge_tile_results(
+    tile_results: Sequence[DetectionResult],
+    tiles: Sequence[Tuple[int, int, int, int]],
+    names: dict,
+    global_result: Optional[DetectionResult] = None,
+    iou_threshold: float = 0.5,
+    min_global_area: float = 0.0,
+) -> DetectionResult:
+    """
+    合并切片检测结果。
+
+    参数:
+        tile_results: 每个切片的 DetectionResult（切片内坐标）
+        tiles: 与 tile_results 一一对应的切片窗口
+        names: 类别名映射
+        global_result: 整帧低分辨率推理结果（原图坐标），用于补充大目标
+        iou_threshold: 跨切片 NMS 的 IoU 阈值
+        min_global_area: 整帧结果中只保留面积不小于该值的框（0 表示全部保留）
+    """
+    boxes, scores, class_ids = [], [], []
+    for det_result, (x0, y0, _, _) in zip(tile_results, tiles):
+        arrays = det_result.to_arrays()
+        if len(arrays["boxes"]) == 0:
+            continue
+        boxes.append(arrays["boxes"] + np.array([x0, y0, x0, y0], dtype=np.float32))
+        scores.append(arrays["scores"])
+        class_ids.append(arrays["class_ids"])
+
+    if global_result is not None:
+        arrays = global_result.to_arrays()
+        if len(arrays["boxes"]) > 0:
+            b = arrays["boxes"]
+            area = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+            sel = area >= min_global_area
+            boxes.append(b[sel])
+            scores.append(arrays["scores"][sel])
+            class_ids.append(arrays["class_ids"][sel])
+
+    if not boxes:
+        return DetectionResult([], names)
+
+    boxes = np.concatenate(boxes)
+    scores = np.concatenate(scores)
+    class_ids = np.concatenate(class_ids)
+    keep = nms(boxes, scores, iou_threshold=iou_threshold, class_ids=class_ids)
+
+    logger.debug("切片结果合并: 候选 %d -> 保留 %d", len(boxes), len(keep))
+    return DetectionResult.from_arrays(boxes[keep], scores[keep], class_ids[keep], names)
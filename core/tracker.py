@@ -0,0 +1,374 @@
+# core/tracker.py
+
+"""
+ByteTracker：NumPy 向量化实现的 ByteTrack 风格多目标跟踪器。
+
+与 Ultralytics 的 model.track 不同，这里的跟踪与推理完全解耦：
+输入任意后端产生的 DetectionResult（可以是批量推理、切片推理的结果），
+按帧顺序调用 update() 完成关联并写入 track_id。
+
+- 所有轨迹的卡尔曼预测 / 更新以 (T, 8) / (T, 8, 8) 数组批量计算
+- 关联代价为批量 IoU 矩阵，分配优先使用 scipy 的匈牙利算法，缺失时退化为贪心
+- 两阶段关联：高分框先与全部轨迹匹配，剩余轨迹再与低分框匹配
+"""
+
+import logging
+from typing import Optional
+
+import numpy as np
+
+from core.box_ops import iou_matrix
+from core.dto import DetectionResult
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # pragma: no cover - scipy 为可选依赖
+    linear_sum_assignment = None
+
+logger = logging.getLogger(__name__)
+
+
+# 轨迹状态
+_NEW, _TRACKED, _LOST = 0, 1, 2
+
+_STD_WEIGHT_POSITION = 1.0 / 20
+_STD_WEIGHT_VELOCITY = 1.0 / 160
+
+# 匀速运动模型：x' = F x，观测 z = H x
+_F = np.eye(8, dtype=np.float64)
+_F[:4, 4:] = np.eye(4)
+
+
+def _xyxy_to_xyah(boxes: np.ndarray) -> np.ndarray:
+    w = boxes[:, 2] - boxes[:, 0]
+    h = np.maximum(boxes[:, 3] - boxes[:, 1], 1e-6)
+    return np.stack(
+        [boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w / h, h], axis=1
+    )
+
+
+def _xyah_to_xyxy(xyah: np.ndarray) -> np.ndarray:
+    w = xyah[:, 2] * xyah[:, 3]
+    h = xyah[:, 3]
+    return np.stack(
+        [xyah[:, 0] - w / 2, xyah[:, 1] - h / 2, xyah[:, 0] + w / 2, xyah[:, 1] + h / 2],
+        axis=1,
+    )
+
+
+def linear_assignment(cost: np.ndarray, threshold: float):
+    """
+    在代价矩阵上求最小代价匹配，代价超过 threshold 的配对视为不匹配。
+
+    返回:
+        (matches (K,2), unmatched_rows, unmatched_cols)
+    """
+    rows, cols = cost.shape
+    if rows == 0 or cols == 0:
+        return (
+            np.zeros((0, 2), dtype=np.int64),
+            np.arange(rows),
+            np.arange(cols),
+        )
+
+    if linear_sum_assignment is not None:
+        r, c = linear_sum_assignment(np.where(cost > threshold, threshold + 1e4, cost))
+        ok = cost[r, c] <= threshold
+        matches = np.stack([r[ok], c[ok]], axis=1)
+    else:
+        # 贪心：按代价从小到大依次确认
+        flat = np.argsort(cost, axis=None)
+        used_r = np.zeros(rows, dtype=bool)
+        used_c = np.zeros(cols, dtype=bool)
+        pairs = []
+        for idx in flat:
+            i, j = divmod(int(idx), cols)
+            if cost[i, j] > threshold:
+                break
+            if used_r[i] or used_c[j]:
+                continue
+            used_r[i] = used_c[j] = True
+            pairs.append((i, j))
+        matches = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+    unmatched_rows = np.setdiff1d(np.arange(rows), matches[:, 0])
+    unmatched_cols = np.setdiff1d(np.arange(cols), matches[:, 1])
+    return matches, unmatched_rows, unmatched_cols
+
+
+class ByteTracker:
+    """向量化 ByteTrack 跟踪器，一个实例对应一路帧源。"""
+
+    def __init__(
+        self,
+        high_thresh: float = 0.5,
+        low_thresh: float = 0.1,
+        new_track_thresh: float = 0.6,
+        match_thresh: float = 0.8,
+        track_buffer: int = 30,
+        frame_rate: float = 30.0,
+        class_aware: bool = True,
+        fuse_score: bool = True,
+    ):
+        """
+        参数:
+            high_thresh: 第一阶段关联使用的高分阈值
+            low_thresh: 低于该分数的检测框直接丢弃
+            new_track_thresh: 未匹配的高分框超过该分数才新建轨迹
+            match_thresh: 第一阶段关联的最大代价（1 - IoU）
+            track_buffer: 丢失轨迹保留的帧数（按 30 FPS 计）
+            frame_rate: 帧源帧率，用于换算 track_buffer
+            class_aware: 是否禁止跨类别关联
+            fuse_score: 关联代价是否融合检测分数（IoU * score）
+        """
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+        self.new_track_thresh = new_track_thresh
+        self.match_thresh = match_thresh
+        self.max_time_lost = int(frame_rate / 30.0 * track_buffer)
+        self.class_aware = class_aware
+        self.fuse_score = fuse_score
+        self.reset()
+
+    def reset(self):
+        """清空全部轨迹并重置 ID 计数。"""
+        self.frame_id = 0
+        self._next_id = 1
+        self.mean = np.zeros((0, 8), dtype=np.float64)
+        self.cov = np.zeros((0, 8, 8), dtype=np.float64)
+        self.ids = np.zeros((0,), dtype=np.int64)  # 未激活轨迹为 -1
+        self.cls = np.zeros((0,), dtype=np.int64)
+        self.state = np.zeros((0,), dtype=np.int64)
+        self.last_frame = np.zeros((0,), dtype=np.int64)
+
+    @property
+    def num_tracks(self) -> int:
+        return len(self.ids)
+
+    # ---------- 公共接口 ----------
+
+    def update(self, det_result: DetectionResult) -> DetectionResult:
+        """
+        用一帧检测结果更新轨迹，返回带 track_id 的新 DetectionResult。
+
+        只输出本帧与已激活轨迹关联上的目标（与 Ultralytics 跟踪输出一致），
+        frame_index / timestamp / imgsz / inferred / source 等帧信息原样保留。
+        """
+        arrays = det_result.to_arrays()
+        keep, track_ids = self.update_arrays(
+            arrays["boxes"], arrays["scores"], arrays["class_ids"]
+        )
+        return DetectionResult.from_arrays(
+            arrays["boxes"][keep],
+            arrays["scores"][keep],
+            arrays["class_ids"][keep],
+            det_result.names,
+            track_ids=track_ids[keep],
+            mask_areas=arrays["mask_areas"][keep],
+            frame_index=det_result.frame_index,
+            timestamp=det_result.timestamp,
+            inferred=det_result.inferred,
+            imgsz=det_result.imgsz,
+            source=det_result.source,
+        )
+
+    def update_arrays(self, boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray):
+        """
+        数组接口。
+
+        返回:
+            (keep, track_ids)：keep 为应输出的检测框布尔掩码，
+            track_ids 为每个检测框对应的轨迹 ID（未关联为 -1）
+        """
+        self.frame_id += 1
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        n_det = len(boxes)
+        det_track = np.full(n_det, -1, dtype=np.int64)  # 检测框 -> 轨迹行号
+
+        self._predict()
+
+        high = np.nonzero(scores >= self.high_thresh)[0]
+        low = np.nonzero((scores >= self.low_thresh) & (scores < self.high_thresh))[0]
+        confirmed = np.nonzero((self.state != _NEW))[0]
+        unconfirmed = np.nonzero(self.state == _NEW)[0]
+
+        # 第一阶段：高分框 vs 已确认轨迹（含丢失轨迹）
+        matches, u_trk, u_det = self._associate(
+            confirmed, high, boxes, scores, class_ids, self.match_thresh, self.fuse_score
+        )
+        self._apply_matches(matches, confirmed, high, boxes, det_track)
+        remain_high = high[u_det]
+
+        # 第二阶段：剩余仍在跟踪状态的轨迹 vs 低分框
+        r_trk = confirmed[u_trk]
+        r_trk = r_trk[self.state[r_trk] == _TRACKED]
+        matches, u_trk2, _ = self._associate(
+            r_trk, low, boxes, scores, class_ids, 0.5, False
+        )
+        self._apply_matches(matches, r_trk, low, boxes, det_track)
+        self.state[r_trk[u_trk2]] = _LOST
+
+        # 未确认轨迹（只出现过一帧）vs 剩余高分框
+        matches, u_unc, u_det = self._associate(
+            unconfirmed, remain_high, boxes, scores, class_ids, 0.7, self.fuse_score
+        )
+        self._apply_matches(matches, unconfirmed, remain_high, boxes, det_track)
+        remain_high = remain_high[u_det]
+        removed = unconfirmed[u_unc]
+
+        # 新建轨迹
+        new_dets = remain_high[scores[remain_high] >= self.new_track_thresh]
+        self._spawn(new_dets, boxes, class_ids, det_track)
+
+        # 清理超时丢失的轨迹
+        expired = np.nonzero(
+            (self.state == _LOST) & (self.frame_id - self.last_frame > self.max_time_lost)
+        )[0]
+        self._remove(np.union1d(removed, expired), det_track)
+
+        # 输出：关联上已激活轨迹的检测框
+        track_ids = np.full(n_det, -1, dtype=np.int64)
+        has_track = det_track >= 0
+        track_ids[has_track] = self.ids[det_track[has_track]]
+        keep = track_ids >= 0
+        return keep, track_ids
+
+    # ---------- 内部实现 ----------
+
+    def _predict(self):
+        if self.num_tracks == 0:
+            return
+        mean = self.mean
+        # 丢失轨迹不再外推高度变化速度
+        mean[self.state != _TRACKED, 7] = 0
+        h = mean[:, 3]
+        std = np.stack(
+            [
+                _STD_WEIGHT_POSITION * h,
+                _STD_WEIGHT_POSITION * h,
+                np.full_like(h, 1e-2),
+                _STD_WEIGHT_POSITION * h,
+                _STD_WEIGHT_VELOCITY * h,
+                _STD_WEIGHT_VELOCITY * h,
+                np.full_like(h, 1e-5),
+                _STD_WEIGHT_VELOCITY * h,
+            ],
+            axis=1,
+        )
+        q = np.zeros_like(self.cov)
+        idx = np.arange(8)
+        q[:, idx, idx] = std ** 2
+        self.mean = mean @ _F.T
+        self.cov = np.einsum("ij,tjk,lk->til", _F, self.cov, _F) + q
+
+    def _kalman_update(self, rows: np.ndarray, measurements: np.ndarray):
+        mean = self.mean[rows]
+        cov = self.cov[rows]
+        h = mean[:, 3]
+        std = np.stack(
+            [
+                _STD_WEIGHT_POSITION * h,
+                _STD_WEIGHT_POSITION * h,
+                np.full_like(h, 1e-1),
+                _STD_WEIGHT_POSITION * h,
+            ],
+            axis=1,
+        )
+        s = cov[:, :4, :4].copy()
+        idx = np.arange(4)
+        s[:, idx, idx] += std ** 2
+        gain = cov[:, :, :4] @ np.linalg.inv(s)  # (K, 8, 4)
+        innovation = measurements - mean[:, :4]
+        self.mean[rows] = mean + np.einsum("kij,kj->ki", gain, innovation)
+        self.cov[rows] = cov - gain @ s @ gain.transpose(0, 2, 1)
+
+    def _associate(self, trk_rows, det_idx, boxes, scores, class_ids, thresh, fuse):
+        if len(trk_rows) == 0 or len(det_idx) == 0:
+            return (
+                np.zeros((0, 2), dtype=np.int64),
+                np.arange(len(trk_rows)),
+                np.arange(len(det_idx)),
+            )
+        trk_boxes = _xyah_to_xyxy(self.mean[trk_rows, :4])
+        sim = iou_matrix(trk_boxes, boxes[det_idx]).astype(np.float64)
+        if fuse:
+            sim = sim * scores[det_idx][None, :]
+        cost = 1.0 - sim
+        if self.class_aware:
+            cost[self.cls[trk_rows][:, None] != class_ids[det_idx][None, :]] = np.inf
+        return linear_assignment(cost, thresh)
+
+    def _apply_matches(self, matches, trk_rows, det_idx, boxes, det_track):
+        if len(matches) == 0:
+            return
+        rows = trk_rows[matches[:, 0]]
+        dets = det_idx[matches[:, 1]]
+        self._kalman_update(rows, _xyxy_to_xyah(boxes[dets]))
+        # 未确认轨迹第二次匹配成功时激活并分配 ID
+        new = rows[self.state[rows] == _NEW]
+        self.ids[new] = np.arange(self._next_id, self._next_id + len(new))
+        self._next_id += len(new)
+        self.state[rows] = _TRACKED
+        self.last_frame[rows] = self.frame_id
+        det_track[dets] = rows
+
+    def _spawn(self, det_idx, boxes, class_ids, det_track):
+        n = len(det_idx)
+        if n == 0:
+            return
+        xyah = _xyxy_to_xyah(boxes[det_idx])
+        mean = np.concatenate([xyah, np.zeros((n, 4))], axis=1)
+        h = xyah[:, 3]
+        std = np.stack(
+            [
+                2 * _STD_WEIGHT_POSITION * h,
+                2 * _STD_WEIGHT_POSITION * h,
+                np.full_like(h, 1e-2),
+                2 * _STD_WEIGHT_POSITION * h,
+                10 * _STD_WEIGHT_VELOCITY * h,
+                10 * _STD_WEIGHT_VELOCITY * h,
+                np.full_like(h, 1e-5),
+                10 * _STD_WEIGHT_VELOCITY * h,
+            ],
+            axis=1,
+        )
+        cov = np.zeros((n, 8, 8))
+        idx = np.arange(8)
+        cov[:, idx, idx] = std ** 2
+
+        # 第一帧检测直接激活（与 ByteTrack 一致），其余新轨迹需再匹配一次才分配 ID
+        if self.frame_id == 1:
+            ids = np.arange(self._next_id, self._next_id + n)
+            self._next_id += n
+            state = np.full(n, _TRACKED)
+        else:
+            ids = np.full(n, -1)
+            state = np.full(n, _NEW)
+
+        base = self.num_tracks
+        self.mean = np.concatenate([self.mean, mean])
+        self.cov = np.concatenate([self.cov, cov])
+        self.ids = np.concatenate([self.ids, ids])
+        self.cls = np.concatenate([self.cls, class_ids[det_idx]])
+        self.state = np.concatenate([self.state, state])
+        self.last_frame = np.concatenate([self.last_frame, np.full(n, self.frame_id)])
+        if self.frame_id == 1:
+            det_track[det_idx] = np.arange(base, base + n)
+
+    def _remove(self, rows, det_track):
+        if len(rows) == 0:
+            return
+        alive = np.ones(self.num_tracks, dtype=bool)
+        alive[rows] = False
+        # 检测框 -> 轨迹行号需要随删除重新编号
+        remap = np.cumsum(alive) - 1
+        mapped = det_track >= 0
+        det_track[mapped] = np.where(alive[det_track[mapped]], remap[det_track[mapped]], -1)
+        self.mean = self.mean[alive]
+        self.cov = self.cov[alive]
+        self.ids = self.ids[alive]
+        self.cls = self.cls[alive]
+        self.state = self.state[alive]
+        self.last_frame = self.last_frame[alive]
@@ -0,0 +1,255 @@
+# core/video_index.py
+
+"""
+VideoIndex：视频文件的帧索引（帧号 → 时间戳、关键帧位置），用于快速、帧精确的定位。
+
+- 首次打开时建立索引，缓存为 <视频文件>.vidx.npz（目录不可写时放到缓存目录），
+  文件大小或修改时间变化后自动重建
+- 安装了 PyAV 时只解复用不解码，读取每个数据包的 pts 与关键帧标记，速度很快；
+  否则退化为 OpenCV 逐帧 grab 记录时间戳（需要解码整个视频，且不含关键帧信息）。
+  此时 FrameSource.seek 使用 OpenCV 的 CAP_PROP_POS_FRAMES，它对很多编码并不帧精确，
+  seek 后按索引中的时间戳校验，不一致时退回从头顺序 grab（正确但慢）；
+  OpenCV 建立的索引缓存在装上 PyAV 后会自动重建
+- segments(n) 按关键帧把视频切成 n 段，供并行分段处理使用
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_INDEX_VERSION = 1
+_INDEX_SUFFIX = ".vidx.npz"
+_DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "yolo_detect", "video_index")
+
+
+class VideoIndex:
+    """单个视频文件的帧索引。"""
+
+    def __init__(
+        self,
+        path: str,
+        timestamps: np.ndarray,
+        keyframes: np.ndarray,
+        fps: float,
+        method: str,
+    ):
+        """
+        参数:
+            path: 视频路径
+            timestamps: (N,) 每帧的显示时间（秒，从 0 开始，按显示顺序）
+            keyframes: 关键帧的帧号（升序）；为空表示未知（OpenCV 建立的索引）
+            fps: 容器声明的帧率
+            method: "pyav" / "opencv"
+        """
+        self.path = path
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.keyframes = np.asarray(keyframes, dtype=np.int64)
+        self.fps = float(fps)
+        self.method = method
+
+    # ---------- 查询 ----------
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def duration(self) -> float:
+        if self.frame_count == 0:
+            return 0.0
+        step = 1.0 / self.fps if self.fps > 0 else 0.0
+        return float(self.timestamps[-1]) + step
+
+    @property
+    def has_keyframes(self) -> bool:
+        return len(self.keyframes) > 0
+
+    def timestamp_of(self, frame_idx: int) -> float:
+        """帧号对应的时间戳（秒）。"""
+        return float(self.timestamps[frame_idx])
+
+    def frame_at(self, timestamp: float) -> int:
+        """时间戳（秒）所在的帧号（不晚于该时间的最后一帧）。"""
+        idx = int(np.searchsorted(self.timestamps, timestamp, side="right")) - 1
+        return min(max(idx, 0), max(self.frame_count - 1, 0))
+
+    def keyframe_before(self, frame_idx: int) -> int:
+        """不晚于 frame_idx 的最近关键帧；没有关键帧信息时返回 frame_idx 本身。"""
+        if not self.has_keyframes:
+            return frame_idx
+        pos = int(np.searchsorted(self.keyframes, frame_idx, side="right")) - 1
+        return int(self.keyframes[max(pos, 0)])
+
+    def segments(self, n: int) -> List[Tuple[int, int]]:
+        """
+        按时间大致均分为 n 段，边界对齐到关键帧。
+
+        返回:
+            [(start, end), ...]，end 不包含；段数可能少于 n（关键帧过少时）
+        """
+        total = self.frame_count
+        n = max(int(n), 1)
+        if total == 0:
+            return []
+        bounds = [0]
+        for k in range(1, n):
+            b = self.keyframe_before(total * k // n)
+            if b > bounds[-1]:
+                bounds.append(b)
+        bounds.append(total)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    # ---------- 建立 / 缓存 ----------
+
+    @classmethod
+    def load_or_build(cls, path: str, cache_dir: Optional[str] = None) -> "VideoIndex":
+        """读取缓存的索引，不存在或已过期时重新建立并写入缓存。"""
+        cache_path = _cache_path(path, cache_dir)
+        index = cls._load(path, cache_path)
+        if index is not None:
+            logger.info(
+                "读取视频索引缓存: %s (frames=%d, keyframes=%d)",
+                cache_path,
+                index.frame_count,
+                len(index.keyframes),
+            )
+            return index
+
+        index = cls.build(path)
+        index._save(cache_path)
+        return index
+
+    @classmethod
+    def build(cls, path: str) -> "VideoIndex":
+        """扫描视频建立索引：优先使用 PyAV（只解复用），否则使用 OpenCV（逐帧 grab）。"""
+        if not pyav_available():
+            logger.warning(
+                "未安装 PyAV (pip install av)，使用 OpenCV 逐帧解码建立视频索引：速度慢、没有关键帧信息，"
+                "seek 不保证帧精确（会校验，失败时从头顺序读取）: %s",
+                path,
+            )
+            return cls._build_opencv(path)
+        return cls._build_pyav(path)
+
+    @classmethod
+    def _build_pyav(cls, path: str) -> "VideoIndex":
+        import av
+
+        pts, keys = [], []
+        with av.open(path) as container:
+            stream = container.streams.video[0]
+            time_base = float(stream.time_base)
+            fps = float(stream.average_rate) if stream.average_rate else 0.0
+            for packet in container.demux(stream):
+                if packet.pts is None:
+                    # 末尾用于冲刷解码器的空包
+                    continue
+                pts.append(packet.pts)
+                keys.append(packet.is_keyframe)
+
+        if not pts:
+            return cls(path, np.zeros(0), np.zeros(0, dtype=np.int64), fps, "pyav")
+
+        # 数据包按解码顺序排列（存在 B 帧时与显示顺序不同），按 pts 排序得到帧号
+        pts = np.asarray(pts, dtype=np.int64)
+        order = np.argsort(pts, kind="stable")
+        timestamps = (pts[order] - pts[order[0]]) * time_base
+        keyframes = np.nonzero(np.asarray(keys, dtype=bool)[order])[0]
+        logger.info(
+            "PyAV 建立视频索引完成: %s (frames=%d, keyframes=%d)",
+            path,
+            len(timestamps),
+            len(keyframes),
+        )
+        return cls(path, timestamps, keyframes, fps, "pyav")
+
+    @classmethod
+    def _build_opencv(cls, path: str) -> "VideoIndex":
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise IOError(f"无法打开视频文件: {path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        timestamps = []
+        try:
+            # grab 只解码不做颜色转换 / 拷贝，比 read 快
+            while cap.grab():
+                timestamps.append(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+        finally:
+            cap.release()
+
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        if len(timestamps) and (timestamps[-1] <= 0 and fps > 0):
+            # 部分后端不提供时间戳，按帧率推算
+            timestamps = np.arange(len(timestamps)) / fps
+        logger.info("OpenCV 建立视频索引完成: %s (frames=%d)", path, len(timestamps))
+        return cls(path, timestamps, np.zeros(0, dtype=np.int64), fps, "opencv")
+
+    @classmethod
+    def _load(cls, path: str, cache_path: str) -> Optional["VideoIndex"]:
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta != _file_meta(path, meta.get("fps"), meta.get("method")):
+                    logger.info("视频文件已变化，重建索引: %s", path)
+                    return None
+                if meta["method"] == "opencv" and pyav_available():
+                    logger.info("已安装 PyAV，重建带关键帧信息的索引: %s", path)
+                    return None
+                return cls(path, data["timestamps"], data["keyframes"], meta["fps"], meta["method"])
+        except Exception:
+            logger.exception("读取视频索引缓存失败，重建索引: %s", cache_path)
+            return None
+
+    def _save(self, cache_path: str):
+        meta = _file_meta(self.path, self.fps, self.method)
+        try:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            np.savez_compressed(
+                cache_path,
+                timestamps=self.timestamps,
+                keyframes=self.keyframes,
+                meta=np.array(json.dumps(meta)),
+            )
+            logger.info("视频索引已缓存: %s", cache_path)
+        except OSError:
+            logger.warning("无法写入视频索引缓存: %s", cache_path)
+
+
+def pyav_available() -> bool:
+    try:
+        import av  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _file_meta(path: str, fps, method) -> dict:
+    st = os.stat(path)
+    return {
+        "version": _INDEX_VERSION,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "fps": fps,
+        "method": method,
+    }
+
+
+def _cache_path(path: str, cache_dir: Optional[str]) -> str:
+    """缓存位置：指定 cache_dir 时放在其中；否则优先放在视频旁边，目录不可写时放到默认缓存目录。"""
+    path = os.path.abspath(path)
+    if cache_dir is None:
+        directory = os.path.dirname(path)
+        if os.access(directory, os.W_OK):
+            return path + _INDEX_SUFFIX
+        cache_dir = _DEFAULT_CACHE_DIR
+    digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{digest}{_INDEX_SUFFIX}")
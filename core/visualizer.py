@@ -52,6 +52,65 @@ class Visualizer:
         pil_img = Image.fromarray(rgb_image)
         return pil_img
 
+    @staticmethod
+    def _color_for(key: int):
+        """按类别 / 跟踪 ID 生成稳定的 BGR 颜色。"""
+        key = int(key) * 2654435761 & 0xFFFFFF
+        return (key & 0xFF, (key >> 8) & 0xFF, (key >> 16) & 0xFF)
+
+    @staticmethod
+    def draw_detections(cv_img, det_result):
+        """
+        在图像副本上绘制 DetectionResult（不依赖 Ultralytics Results.plot）。
+
+        用于没有 Ultralytics Results 对象的帧，例如关键帧之间传播得到的结果。
+        """
+        if cv_img is None:
+            logger.error("draw_detections 收到空图像")
+            raise ValueError("提供的图像为空")
+
+        canvas = cv_img.copy()
+        h, w = canvas.shape[:2]
+        thickness = max(int(round(max(h, w) / 640)), 1)
+        font_scale = 0.5 * thickness
+
+        for det in det_result.detections:
+            x1, y1, x2, y2 = det.bbox
+            track_id = getattr(det, "track_id", None)
+            color = Visualizer._color_for(track_id if track_id is not None else det.class_id)
+            cv2.rectangle(canvas, (x1, y1), (x2, y2), color, thickness)
+
+            label = f"{det.class_name} {det.confidence:.2f}"
+            if track_id is not None:
+                label = f"id:{track_id} " + label
+            (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 1)
+            top = max(y1 - th - 4, 0)
+            cv2.rectangle(canvas, (x1, top), (x1 + tw + 2, top + th + 4), color, -1)
+            cv2.putText(
+                canvas,
+                label,
+                (x1 + 1, top + th + 1),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                font_scale,
+                (255, 255, 255),
+                1,
+                cv2.LINE_AA,
+            )
+
+        if not getattr(det_result, "inferred", True):
+            # 标记非推理帧，方便肉眼区分
+            cv2.putText(
+                canvas,
+                "propagated",
+                (5, 20 * thickness),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                font_scale,
+                (0, 255, 255),
+                1,
+                cv2.LINE_AA,
+            )
+        return canvas
+
     # @staticmethod
     # def resize_for_display(cv_img, target_width: int, target_height: int):
     #     h, w = cv_img.shape[:2]
@@ -136,6 +195,13 @@ class Visualizer:
                     )
                     class_count[cls_name] = class_count.get(cls_name, 0) + 1
 
+        # 推理尺寸（自适应分辨率下会随负载变化）
+        imgsz = getattr(det_result, "imgsz", None)
+        if imgsz is not None:
+            lines.append("")
+            mode = "推理" if getattr(det_result, "inferred", True) else "传播"
+            lines.append(f"推理尺寸: {imgsz}（本帧: {mode}）")
+
         if class_count:
             lines.append("")
             lines.append("统计信息:")
@@ -9,10 +9,17 @@ from tkinter import ttk, filedialog, messagebox
 import cv2
 from PIL import ImageTk
 
+from app.batch_runner import DirectoryBatchRunner
 from app.controller import DetectionController
 from core.source import FrameSource, SourceType
 from core.visualizer import Visualizer
 from core.dto import DetectionResult
+from core.exporter import create_exporter
+from core.frame_pool import FramePool
+from core.frame_cache import FrameCache
+from core.prediction_cache import PredictionCache
+from core.thread_budget import ThreadBudget
+from core.memory_monitor import MemoryMonitor
 
 
 # ---------------- 日志初始化 ----------------
@@ -56,6 +63,9 @@ logger = logging.getLogger(__name__)
 
 
 class YOLODetectorApp:
+    # 运动门控灵敏度 -> 变化像素占比阈值（None 表示关闭）
+    MOTION_GATE_LEVELS = {"关闭": None, "低": 0.01, "中": 0.003, "高": 0.001}
+
     def __init__(self, root):
         self.root = root
         self.root.title("目标检测软件")
@@ -71,18 +81,67 @@ class YOLODetectorApp:
         # 播放速度（只对视频检测生效）
         self.speed_var = tk.DoubleVar(value=1.0)  # 0.5, 1.0, 1.5, 2.0
 
+        # 推理间隔：每 N 帧完整推理一次，中间帧做框传播（1 表示逐帧推理）
+        self.stride_var = tk.IntVar(value=1)
+
+        # 自适应分辨率：按实测延迟调整 imgsz，以维持帧源 FPS
+        self.adaptive_res_var = tk.BooleanVar(value=False)
+
+        # 运动门控灵敏度：关闭 / 低 / 中 / 高（画面无变化时跳过推理）
+        self.motion_gate_var = tk.StringVar(value="关闭")
+
+        # 切片推理：高分辨率画面切片后批量推理，提升小目标召回（跟踪模式下不生效）
+        self.tiling_var = tk.BooleanVar(value=False)
+
+        # 原图分辨率解码：默认大图按推理 / 显示尺寸降采样解码，勾选后按原图解码
+        self.full_res_var = tk.BooleanVar(value=False)
+
+        # 解码帧缓存：同一视频反复检测（对比模型 / 阈值）时直接读取内存映射的已解码帧
+        self.frame_cache_var = tk.BooleanVar(value=False)
+        self.frame_cache = None                     # core.frame_cache.FrameCache，首次使用时创建
+
+        # 预测缓存：同一模型 / imgsz 在同一帧上重复推理时直接读取缓存结果（仅 detect 任务）
+        self.prediction_cache_var = tk.BooleanVar(value=False)
+        self.prediction_cache = None                # core.prediction_cache.PredictionCache，首次使用时创建
+
+        # 置信度 / IoU 阈值；勾选“实时阈值”后保存低阈值候选框，拖动滑块即可重过滤当前画面
+        self.conf_var = tk.DoubleVar(value=0.25)
+        self.iou_var = tk.DoubleVar(value=0.7)
+        self.refilter_var = tk.BooleanVar(value=False)
+        self.last_frame = None                      # (原图, frame_index, decode_scale)，供重过滤重绘
+
+        # 类别过滤：逗号分隔的类别名或 ID，可用 "名称:阈值" 覆盖该类别的置信度，如 "person:0.5, car"
+        self.class_filter_var = tk.StringVar(value="")
+        # 每帧最多检测数
+        self.max_det_var = tk.StringVar(value="不限")
+
         # 保存检测视频选项
         self.save_video_var = tk.BooleanVar(value=False)
         self.save_path = tk.StringVar(value="")     # 输出视频路径
         self.video_writer = None                    # cv2.VideoWriter
+        self.recorder_sub = None                    # 录像订阅（ResultBus），逐帧写入而不只是显示到的帧
         self.current_fps = None                     # 当前会话的 FPS（视频读取或摄像头）
         self.is_video_mode = False                  # 当前是否在视频检测模式
 
+        # 导出检测结果选项（JSONL / Parquet）
+        self.export_var = tk.BooleanVar(value=False)
+        self.export_path = tk.StringVar(value="")   # 导出文件路径
+        self.exporter = None                        # core.exporter.BufferedSink
+
         # 控制器 & 帧源
         self.controller = DetectionController()
+        # 帧缓冲池：视频 / 摄像头帧解码到复用的缓冲中，避免高分辨率下逐帧分配内存
+        self.frame_pool = FramePool(max_buffers=16)
+        self.controller.set_frame_pool(self.frame_pool)
         self.source = None
         self.frame_generator = None
         self.is_detecting = False
+        self.batch_runner = None                    # 目录批量检测（后台线程）
+
+        # 内存监控：长时间运行时定期采样 RSS / 存活结果数 / 队列积压，增长超过阈值时写警告日志；
+        # 按 F9 做 tracemalloc 差异快照（第一次按开始跟踪，之后输出与上次相比增长最多的分配位置）
+        self.memory_monitor = MemoryMonitor(queue_stats=self.controller.queue_stats).start()
+        self.root.bind("<F9>", lambda event: self.memory_monitor.snapshot())
 
         # Tk 图片引用，防止被 GC
         self.original_tk_image = None
@@ -192,6 +251,153 @@ class YOLODetectorApp:
             command=self.select_save_path,
         ).grid(row=0, column=8, padx=5, pady=5)
 
+        # 导出检测结果选项
+        ttk.Checkbutton(
+            func_frame,
+            text="导出检测结果",
+            variable=self.export_var,
+        ).grid(row=0, column=9, padx=(15, 2), pady=5)
+
+        ttk.Button(
+            func_frame,
+            text="选择导出路径",
+            command=self.select_export_path,
+        ).grid(row=0, column=10, padx=5, pady=5)
+
+        # 推理间隔（跳帧推理）
+        ttk.Label(func_frame, text="推理间隔:").grid(
+            row=1, column=0, padx=5, pady=5, sticky=tk.E
+        )
+        stride_combo = ttk.Combobox(
+            func_frame,
+            width=6,
+            state="readonly",
+            values=["1", "2", "3", "5", "10"],
+        )
+        stride_combo.grid(row=1, column=1, padx=2, pady=5, sticky=tk.W)
+        stride_combo.set("1")
+
+        def on_stride_change(event=None):
+            self.stride_var.set(int(stride_combo.get()))
+            logger.info("推理间隔调整为每 %s 帧", stride_combo.get())
+
+        stride_combo.bind("<<ComboboxSelected>>", on_stride_change)
+
+        # 自适应分辨率
+        ttk.Checkbutton(
+            func_frame,
+            text="自适应分辨率",
+            variable=self.adaptive_res_var,
+        ).grid(row=1, column=2, padx=5, pady=5)
+
+        # 运动门控（静态摄像头画面无变化时跳过推理）
+        ttk.Label(func_frame, text="运动门控:").grid(
+            row=1, column=3, padx=(15, 2), pady=5, sticky=tk.E
+        )
+        ttk.Combobox(
+            func_frame,
+            width=6,
+            state="readonly",
+            textvariable=self.motion_gate_var,
+            values=list(self.MOTION_GATE_LEVELS.keys()),
+        ).grid(row=1, column=4, padx=2, pady=5, sticky=tk.W)
+
+        # 切片推理
+        ttk.Checkbutton(
+            func_frame,
+            text="切片推理",
+            variable=self.tiling_var,
+        ).grid(row=1, column=5, padx=(15, 2), pady=5)
+
+        # 目录批量检测：后台解码 + 批量推理，不阻塞界面
+        ttk.Button(func_frame, text="目录检测", command=self.detect_directory).grid(
+            row=1, column=6, padx=5, pady=5
+        )
+
+        # 图片 / 目录检测按原图分辨率解码（默认降采样解码，框坐标仍映射回原图）
+        ttk.Checkbutton(
+            func_frame,
+            text="原图分辨率",
+            variable=self.full_res_var,
+        ).grid(row=1, column=7, padx=(15, 2), pady=5)
+
+        # 视频检测缓存已解码帧（第二次检测同一视频起不再解码）
+        ttk.Checkbutton(
+            func_frame,
+            text="缓存解码帧",
+            variable=self.frame_cache_var,
+        ).grid(row=1, column=8, padx=(15, 2), pady=5)
+
+        # 预测缓存（换标注样式 / 导出格式重跑时跳过推理）
+        ttk.Checkbutton(
+            func_frame,
+            text="预测缓存",
+            variable=self.prediction_cache_var,
+        ).grid(row=1, column=9, padx=(15, 2), pady=5)
+
+        # 置信度 / IoU 阈值
+        conf_label = ttk.Label(func_frame, text="置信度: 0.25")
+        conf_label.grid(row=2, column=0, padx=5, pady=5, sticky=tk.E)
+        iou_label = ttk.Label(func_frame, text="IoU: 0.70")
+        iou_label.grid(row=2, column=2, padx=5, pady=5, sticky=tk.E)
+
+        def on_threshold_change(value=None):
+            conf_label.configure(text=f"置信度: {self.conf_var.get():.2f}")
+            iou_label.configure(text=f"IoU: {self.iou_var.get():.2f}")
+            self.apply_filter_setting()
+            if not self.is_detecting:
+                self.refilter_last_frame()
+
+        ttk.Scale(
+            func_frame,
+            from_=0.05,
+            to=0.95,
+            variable=self.conf_var,
+            command=on_threshold_change,
+        ).grid(row=2, column=1, padx=2, pady=5, sticky=(tk.W, tk.E))
+        ttk.Scale(
+            func_frame,
+            from_=0.1,
+            to=0.7,
+            variable=self.iou_var,
+            command=on_threshold_change,
+        ).grid(row=2, column=3, padx=2, pady=5, sticky=(tk.W, tk.E))
+
+        # 保存候选框，阈值调整后无需重新推理
+        ttk.Checkbutton(
+            func_frame,
+            text="实时阈值",
+            variable=self.refilter_var,
+        ).grid(row=2, column=4, padx=(15, 2), pady=5)
+
+        # 类别过滤（只保留关心的类别，其余类别在推理阶段即被过滤）
+        ttk.Label(func_frame, text="类别:").grid(
+            row=2, column=5, padx=(15, 2), pady=5, sticky=tk.E
+        )
+        class_entry = ttk.Entry(func_frame, textvariable=self.class_filter_var, width=24)
+        class_entry.grid(row=2, column=6, columnspan=2, padx=2, pady=5, sticky=(tk.W, tk.E))
+
+        ttk.Label(func_frame, text="最多框数:").grid(
+            row=2, column=8, padx=(15, 2), pady=5, sticky=tk.E
+        )
+        max_det_combo = ttk.Combobox(
+            func_frame,
+            width=6,
+            state="readonly",
+            textvariable=self.max_det_var,
+            values=["不限", "10", "20", "50", "100"],
+        )
+        max_det_combo.grid(row=2, column=9, padx=2, pady=5, sticky=tk.W)
+
+        def on_class_filter_change(event=None):
+            self.apply_filter_setting()
+            if not self.is_detecting:
+                self.refilter_last_frame()
+
+        class_entry.bind("<Return>", on_class_filter_change)
+        class_entry.bind("<FocusOut>", on_class_filter_change)
+        max_det_combo.bind("<<ComboboxSelected>>", on_class_filter_change)
+
         # ========== 显示区域 ==========
         display_frame = ttk.Frame(main_frame)
         display_frame.grid(
@@ -247,11 +453,16 @@ class YOLODetectorApp:
             result = self.controller.get_result()
             if result:
                 original_img, annotated_img, det_result = result
+                if self.controller.candidates is not None:
+                    # 保留当前画面，停止后调整阈值时用于重绘
+                    self.last_frame = (original_img.copy(), det_result.frame_index, 1.0)
                 self.display_image(original_img, self.original_label)
                 self.display_image(annotated_img, self.result_label)
                 self.display_detection_info(det_result)
-                # 如果开启了保存检测视频，则写入到 VideoWriter
-                self.maybe_write_video(annotated_img)
+                # 显示时已转换为 PhotoImage，原始帧可以归还缓冲池
+                self.controller.release_result(result)
+            # 如果开启了保存检测视频，把录像订阅中排队的帧全部写入 VideoWriter
+            self.flush_recorder()
         except Exception:
             logger.exception("[UI] 获取结果失败")
         finally:
@@ -399,6 +610,190 @@ class YOLODetectorApp:
             except Exception:
                 logger.exception("[SaveVideo] 写入视频帧失败")
 
+    def start_recorder_if_needed(self):
+        """开启保存视频时订阅结果总线：每一帧推理结果都会进入录像队列，不受显示丢帧影响。"""
+        self.close_recorder()
+        if not self.save_video_var.get() or not self.save_path.get():
+            return
+        self.recorder_sub = self.controller.subscribe_results(
+            "recorder", maxsize=64, policy="block"
+        )
+
+    def flush_recorder(self):
+        """在 UI 线程中写入录像队列里的所有帧（VideoWriter 只在 UI 线程中使用）。"""
+        if self.recorder_sub is None:
+            return
+        for item in self.recorder_sub.drain():
+            self.maybe_write_video(item[1])
+            self.recorder_sub.release(item)
+
+    def close_recorder(self):
+        """写完剩余帧并取消录像订阅。"""
+        if self.recorder_sub is None:
+            return
+        self.flush_recorder()
+        self.controller.unsubscribe_results("recorder")
+        self.recorder_sub = None
+
+    # ---------------- 导出检测结果相关 ----------------
+
+    def select_export_path(self):
+        """选择检测结果导出路径（jsonl / parquet / arrow / SQLite 结果库）"""
+        file_path = filedialog.asksaveasfilename(
+            title="选择检测结果导出路径",
+            defaultextension=".jsonl",
+            filetypes=[
+                ("JSON Lines 文件", "*.jsonl"),
+                ("Parquet 文件", "*.parquet"),
+                ("Arrow 文件", "*.arrow"),
+                ("SQLite 结果库", "*.db"),
+                ("所有文件", "*.*"),
+            ],
+        )
+        if file_path:
+            logger.info("选择检测结果导出路径: %s", file_path)
+            self.export_path.set(file_path)
+
+    def start_exporter_if_needed(self):
+        """在开始摄像头 / 视频检测前按需创建导出器并挂到控制器上。"""
+        self.close_exporter()
+        if not self.export_var.get():
+            return
+        if not self.export_path.get():
+            self.select_export_path()
+        if not self.export_path.get():
+            return
+
+        try:
+            self.exporter = create_exporter(self.export_path.get())
+            self.controller.set_exporter(self.exporter)
+        except Exception as e:
+            logger.exception("创建结果导出器失败")
+            messagebox.showerror("错误", f"无法创建结果导出文件:\n{str(e)}")
+            self.exporter = None
+
+    def close_exporter(self):
+        """关闭导出器（落盘剩余缓冲数据）。"""
+        if self.exporter is None:
+            return
+        self.controller.set_exporter(None)
+        try:
+            self.exporter.close()
+        except Exception:
+            logger.exception("关闭结果导出器时异常")
+        self.exporter = None
+
+    def apply_stride_setting(self):
+        """
+        将推理间隔同步到控制器。
+
+        开启跟踪时用 track_id 匀速外推，否则用稀疏光流传播中间帧。
+        """
+        propagation = "velocity" if self.enable_tracking_var.get() else "flow"
+        self.controller.set_stride(self.stride_var.get(), propagation=propagation)
+
+    def apply_adaptive_resolution_setting(self):
+        """
+        将自适应分辨率开关同步到控制器，目标帧率取当前帧源 FPS。
+
+        固定输入尺寸的 ONNX 模型无法切换 imgsz，此时忽略该选项。
+        """
+        enabled = self.adaptive_res_var.get()
+        if enabled and self.model_type.get() == "onnx":
+            logger.warning("ONNX 模型不支持自适应分辨率，已忽略该选项")
+            enabled = False
+        self.controller.set_adaptive_resolution(
+            enabled,
+            target_fps=self.current_fps or 25.0,
+        )
+
+    def apply_filter_setting(self):
+        classes, class_conf = self.parse_class_filter(self.class_filter_var.get())
+        max_det = self.max_det_var.get()
+        self.controller.set_filter(
+            conf=round(self.conf_var.get(), 2),
+            iou=round(self.iou_var.get(), 2),
+            classes=classes,
+            class_conf=class_conf,
+            max_det=int(max_det) if max_det.isdigit() else None,
+        )
+
+    def parse_class_filter(self, text: str):
+        """
+        解析类别过滤输入，返回 (classes, class_conf)。
+
+        格式：逗号分隔的类别名或 class_id，可带 ":阈值"，如 "person:0.5, car, 2"；
+        为空时返回 (None, None)，表示不过滤。无法识别的类别名记录警告后忽略。
+        """
+        text = text.strip()
+        if not text:
+            return None, None
+        names = self.controller.detector.names or {}
+        if isinstance(names, (list, tuple)):
+            names = dict(enumerate(names))
+        name_to_id = {str(v).lower(): int(k) for k, v in names.items()}
+
+        classes, class_conf = [], {}
+        for item in text.replace("，", ",").split(","):
+            item = item.strip()
+            if not item:
+                continue
+            name, _, conf_text = item.partition(":")
+            name = name.strip()
+            cls_id = int(name) if name.isdigit() else name_to_id.get(name.lower())
+            if cls_id is None:
+                logger.warning("类别过滤中无法识别的类别: %s", name)
+                continue
+            classes.append(cls_id)
+            if conf_text.strip():
+                try:
+                    class_conf[cls_id] = float(conf_text)
+                except ValueError:
+                    logger.warning("类别过滤中无法解析的阈值: %s", item)
+        if not classes:
+            return None, None
+        return classes, class_conf or None
+
+    def apply_refilter_setting(self):
+        if not self.refilter_var.get():
+            self.controller.set_refilter(False)
+        elif self.controller.candidates is None:
+            self.controller.set_refilter(True)
+        self.last_frame = None
+
+    def refilter_last_frame(self):
+        """按当前阈值重过滤最后显示的画面并重绘（不重新推理）。"""
+        if self.last_frame is None:
+            return
+        frame, frame_index, scale = self.last_frame
+        det_result = self.controller.refilter(frame_index)
+        if det_result is None:
+            return
+        self.display_image(Visualizer.draw_detections(frame, det_result), self.result_label)
+        self.display_detection_info(det_result.scale_boxes(scale))
+
+    def apply_prediction_cache_setting(self):
+        if self.prediction_cache_var.get():
+            if self.prediction_cache is None:
+                self.prediction_cache = PredictionCache()
+            self.controller.detector.set_prediction_cache(self.prediction_cache)
+        else:
+            self.controller.detector.set_prediction_cache(None)
+            self.flush_prediction_cache()
+
+    def flush_prediction_cache(self):
+        """提交预测缓存中尚未落盘的写入（检测结束 / 切换设置时调用）。"""
+        if self.prediction_cache is not None:
+            self.prediction_cache.flush()
+
+    def apply_motion_gate_setting(self):
+        """将运动门控灵敏度同步到控制器。"""
+        ratio = self.MOTION_GATE_LEVELS.get(self.motion_gate_var.get())
+        if ratio is None:
+            self.controller.set_motion_gate(False)
+        else:
+            self.controller.set_motion_gate(True, min_changed_ratio=ratio)
+
     # ---------------- 图片检测 ----------------
 
     def detect_image(self):
@@ -418,20 +813,130 @@ class YOLODetectorApp:
 
         try:
             logger.info("开始图片检测: %s", path)
-            img_source = FrameSource(SourceType.IMAGE, path)
+            img_source = FrameSource(
+                SourceType.IMAGE, path, min_decode_size=self.min_decode_size()
+            )
             _, img = next(img_source.frames())
             if img is None:
                 raise ValueError("无法读取图像")
 
-            result = self.controller.detector.infer(img)
+            self.apply_prediction_cache_setting()
+            self.apply_filter_setting()
+            self.apply_refilter_setting()
             self.display_image(img, self.original_label)
-            self.display_image(result.plot(), self.result_label)
-            det_result = DetectionResult.from_yolo(result)
-            self.display_detection_info(det_result)
+            candidates = self.controller.candidates
+            if candidates is not None:
+                # 低阈值推理并保存候选框，之后拖动阈值滑块只做重过滤
+                raw = DetectionResult.from_yolo(
+                    self.controller.detector.infer(
+                        img,
+                        conf=candidates.candidate_conf,
+                        iou=candidates.candidate_iou,
+                        classes=self.controller.classes,
+                    )
+                )
+                raw.frame_index = 0
+                candidates.clear()
+                candidates.add(raw)
+                self.last_frame = (img, 0, img_source.decode_scale)
+                self.refilter_last_frame()
+            else:
+                result = self.controller.detector.infer(img, **self.controller.filter_kwargs())
+                self.display_image(result.plot(), self.result_label)
+                det_result = DetectionResult.from_yolo(result)
+                # 降采样解码时把框映射回原图坐标
+                det_result.scale_boxes(img_source.decode_scale)
+                self.display_detection_info(det_result)
+            self.flush_prediction_cache()
         except Exception as e:
             logger.exception("图片检测失败: %s", e)
             messagebox.showerror("错误", f"图片检测失败:\n{str(e)}")
 
+    def min_decode_size(self):
+        """
+        图片解码结果长边的下限：推理尺寸与显示区域的较大者，
+        更大的图片按 1/2、1/4、1/8 降采样解码；勾选“原图分辨率”时返回 None。
+        """
+        if self.full_res_var.get():
+            return None
+        display = max(self.result_label.winfo_width(), self.result_label.winfo_height())
+        return max(self.controller.imgsz, display)
+
+    # ---------------- 目录批量检测 ----------------
+
+    def detect_directory(self):
+        if self.controller.detector.adapter is None:
+            messagebox.showerror("错误", "请先加载模型")
+            return
+        if self.is_detecting:
+            messagebox.showwarning("提示", "请先停止当前检测")
+            return
+
+        path = filedialog.askdirectory(title="选择图片目录")
+        if not path:
+            return
+
+        source = FrameSource(
+            SourceType.DIRECTORY, path, min_decode_size=self.min_decode_size()
+        )
+        if not source.open():
+            messagebox.showerror("错误", "所选目录中没有图片")
+            return
+
+        logger.info("开始目录批量检测: %s (%d 张)", path, len(source.paths))
+        self.start_exporter_if_needed()
+        self.apply_prediction_cache_setting()
+        self.apply_filter_setting()
+        self.batch_runner = DirectoryBatchRunner(
+            self.controller.detector,
+            imgsz=self.controller.imgsz,
+            filters=self.controller.filter_kwargs(),
+        )
+        try:
+            self.batch_runner.start(source, exporter=self.exporter)
+        except Exception as e:
+            logger.exception("目录批量检测启动失败")
+            messagebox.showerror("错误", f"目录批量检测启动失败:\n{str(e)}")
+            self.batch_runner = None
+            self.close_exporter()
+            return
+
+        self.is_detecting = True
+        self.poll_directory_progress()
+
+    def poll_directory_progress(self):
+        runner = self.batch_runner
+        if runner is None:
+            return
+
+        preview = runner.latest()
+        if preview is not None:
+            _, annotated_img, _ = preview
+            self.display_image(annotated_img, self.result_label)
+
+        p = runner.progress()
+        eta = f"{p['eta']:.0f}s" if p["eta"] is not None else "-"
+        self.info_text.delete(1.0, tk.END)
+        self.info_text.insert(
+            tk.END,
+            f"目录检测进度: {p['done'] + p['failed']}/{p['total']} ({p['percent']}%)\n"
+            f"速度: {p['images_per_sec']} 张/秒（平均 {p['avg_images_per_sec']}）  预计剩余: {eta}\n"
+            f"解码失败: {p['failed']}  推理失败: {p['errors']}",
+        )
+
+        if p["running"]:
+            self.root.after(200, self.poll_directory_progress)
+            return
+
+        self.is_detecting = False
+        self.batch_runner = None
+        self.close_exporter()
+        self.flush_prediction_cache()
+        messagebox.showinfo(
+            "完成",
+            f"目录检测完成：{p['done']} 张，用时 {p['elapsed']}s（{p['avg_images_per_sec']} 张/秒）",
+        )
+
     # ---------------- 摄像头检测 ----------------
 
     def detect_camera(self):
@@ -459,7 +964,8 @@ class YOLODetectorApp:
             self.video_writer.release()
             self.video_writer = None
 
-        self.source = FrameSource(SourceType.CAMERA)
+        self.source = FrameSource(SourceType.CAMERA, frame_pool=self.frame_pool)
+        self.controller.set_source("camera:0")
         if not self.source.open():
             logger.error("无法打开摄像头")
             messagebox.showerror("错误", "无法打开摄像头")
@@ -477,6 +983,15 @@ class YOLODetectorApp:
 
         logger.info("摄像头 FPS 估计为 %.2f", self.current_fps)
 
+        self.start_exporter_if_needed()
+        self.start_recorder_if_needed()
+        self.apply_stride_setting()
+        self.apply_adaptive_resolution_setting()
+        self.apply_motion_gate_setting()
+        self.apply_prediction_cache_setting()
+        self.apply_filter_setting()
+        self.apply_refilter_setting()
+        self.controller.set_tiling(self.tiling_var.get())
         self.controller.start_inference_thread()
         self.frame_generator = self.source.frames()
         self.camera_capture_loop()
@@ -499,6 +1014,8 @@ class YOLODetectorApp:
 
         if frame is not None:
             self.controller.submit_frame(frame)
+            # 控制器已持有自己的引用，归还读帧时的那一次
+            self.frame_pool.release(frame)
 
         if self.is_detecting:
             # 摄像头就维持大约 30ms 的轮询频率即可
@@ -543,7 +1060,15 @@ class YOLODetectorApp:
             self.video_writer.release()
             self.video_writer = None
 
-        self.source = FrameSource(SourceType.VIDEO, path)
+        if self.frame_cache_var.get() and self.frame_cache is None:
+            self.frame_cache = FrameCache()
+        self.source = FrameSource(
+            SourceType.VIDEO,
+            path,
+            frame_pool=self.frame_pool,
+            frame_cache=self.frame_cache if self.frame_cache_var.get() else None,
+        )
+        self.controller.set_source(path)
         if not self.source.open():
             logger.error("无法打开视频文件: %s", path)
             messagebox.showerror("错误", "无法打开视频文件")
@@ -553,16 +1078,19 @@ class YOLODetectorApp:
         self.is_video_mode = True
 
         # 获取原视频 FPS
-        try:
-            fps = self.source.cap.get(cv2.CAP_PROP_FPS)
-            if fps is None or fps <= 0:
-                fps = 25.0
-            self.current_fps = fps
-        except Exception:
-            self.current_fps = 25.0
+        self.current_fps = self.source.fps if self.source.fps > 0 else 25.0
 
         logger.info("视频 FPS 读取为 %.2f", self.current_fps)
 
+        self.start_exporter_if_needed()
+        self.start_recorder_if_needed()
+        self.apply_stride_setting()
+        self.apply_adaptive_resolution_setting()
+        self.apply_motion_gate_setting()
+        self.apply_prediction_cache_setting()
+        self.apply_filter_setting()
+        self.apply_refilter_setting()
+        self.controller.set_tiling(self.tiling_var.get())
         self.controller.start_inference_thread()
         self.frame_generator = self.source.frames()
         self.video_capture_loop()
@@ -589,6 +1117,8 @@ class YOLODetectorApp:
 
         if frame is not None:
             self.controller.submit_frame(frame)
+            # 控制器已持有自己的引用，归还读帧时的那一次
+            self.frame_pool.release(frame)
 
         if self.is_detecting:
             # 按原始 FPS 和播放速度控制读取帧的节奏
@@ -604,7 +1134,12 @@ class YOLODetectorApp:
     def stop_detection(self):
         logger.info("收到停止检测请求")
         self.is_detecting = False
+        if self.batch_runner is not None:
+            runner, self.batch_runner = self.batch_runner, None
+            runner.stop()
         self.controller.stop_inference_thread()
+        self.close_recorder()
+        self.flush_prediction_cache()
 
         if self.source:
             self.source.release()
@@ -622,6 +1157,9 @@ class YOLODetectorApp:
                 logger.exception("关闭 VideoWriter 时异常")
             self.video_writer = None
 
+        # 关闭结果导出（推理线程已停止，不会再有新结果写入）
+        self.close_exporter()
+
         self.original_label.configure(
             image="", text="请选择检测功能", background="black", foreground="white"
         )
@@ -663,7 +1201,9 @@ class YOLODetectorApp:
 
 if __name__ == "__main__":
     logger.info("应用启动")
+    ThreadBudget().apply()
     root = tk.Tk()
     app = YOLODetectorApp(root)
     root.mainloop()
+    app.memory_monitor.stop()
     logger.info("应用正常退出")
@@ -34,6 +34,7 @@ from PySide6.QtGui import QPixmap
 from PIL.ImageQt import ImageQt  # 将 PIL.Image 转为 QImage
 from app.controller import DetectionController
 from core.source import FrameSource, SourceType
+from core.thread_budget import ThreadBudget
 from core.visualizer import Visualizer
 from core.dto import DetectionResult
 
@@ -279,7 +280,7 @@ class YOLODetectorWindow(QMainWindow):
 
     def poll_results(self):
         """
-        从 DetectionController 的 output_queue 中非阻塞获取结果，
+        从 DetectionController 的显示订阅中非阻塞获取结果，
         然后更新左右图和信息文本。
         """
         try:
@@ -497,6 +498,8 @@ class YOLODetectorWindow(QMainWindow):
             self.source = None
             return False
 
+        # 按帧源切换跟踪会话：新视频 / 摄像头从新的轨迹 ID 和卡尔曼状态开始
+        self.controller.set_source(str(path) if path else "camera:0")
         self.is_detecting = True
         self.controller.start_inference_thread()
         self.frame_generator = self.source.frames()
@@ -696,6 +699,7 @@ class YOLODetectorWindow(QMainWindow):
 
 if __name__ == "__main__":
     logger.info("应用启动")
+    ThreadBudget().apply()
     app = QApplication([])
     win = YOLODetectorWindow()
     win.show()
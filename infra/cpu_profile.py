@@ -0,0 +1,265 @@
+# infra/cpu_profile.py
+
+"""
+CPU 推理调优：Torch 线程数、inference_mode、channels_last 内存布局、bf16 autocast、torch.compile。
+
+由 UltralyticsAdapter.apply_cpu_profile 在模型加载后调用：
+逐项在底层 nn.Module 上启用优化，每一项都与调优前的参考输出比对并在预热中计时，
+输出误差超出容差、运行出错或没有提速的项会被撤销，最后报告预热阶段测得的加速比。
+"""
+
+import logging
+import statistics
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+class CpuProfile:
+    """CPU 推理调优配置。"""
+
+    def __init__(
+        self,
+        threads: Optional[int] = None,
+        interop_threads: Optional[int] = None,
+        inference_mode: bool = True,
+        channels_last: bool = True,
+        bf16="auto",
+        compile_model: bool = False,
+        atol: float = 1e-3,
+        bf16_atol: float = 3e-2,
+        warmup_runs: int = 2,
+        timed_runs: int = 5,
+    ):
+        """
+        参数:
+            threads: Torch 算子内（intra-op）线程数，None 表示保持当前设置
+            interop_threads: Torch 算子间线程数（只能在进程首次并行计算前设置）
+            inference_mode: 推理调用包在 torch.inference_mode() 中
+            channels_last: 权重与输入使用 NHWC 内存布局（oneDNN 卷积通常更快）
+            bf16: True / False / "auto"；"auto" 只在 CPU 原生支持 bf16（AVX512-BF16 / AMX）时尝试
+            compile_model: 对底层 nn.Module 的 forward 做 torch.compile（首次调用编译较慢）
+            atol: fp32 优化项允许的输出误差（相对参考输出的最大绝对值）
+            bf16_atol: bf16 允许的输出误差
+            warmup_runs / timed_runs: 每一项的预热次数与计时次数（取中位数）
+        """
+        self.threads = threads
+        self.interop_threads = interop_threads
+        self.inference_mode = inference_mode
+        self.channels_last = channels_last
+        self.bf16 = bf16
+        self.compile_model = compile_model
+        self.atol = float(atol)
+        self.bf16_atol = float(bf16_atol)
+        self.warmup_runs = max(int(warmup_runs), 1)
+        self.timed_runs = max(int(timed_runs), 1)
+
+    def want_bf16(self) -> bool:
+        if self.bf16 == "auto":
+            return cpu_supports_bf16()
+        return bool(self.bf16)
+
+
+def cpu_supports_bf16() -> bool:
+    """CPU 是否原生支持 bf16 运算（读取 /proc/cpuinfo 的 avx512_bf16 / amx_bf16 标志，非 Linux 返回 False）。"""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8", errors="ignore") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def set_torch_threads(threads: Optional[int] = None, interop_threads: Optional[int] = None) -> dict:
+    """设置 Torch 线程数，返回生效后的 {"threads", "interop_threads"}。"""
+    if threads:
+        torch.set_num_threads(int(threads))
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(int(interop_threads))
+        except RuntimeError:
+            logger.warning("Torch 算子间线程数只能在首次并行计算前设置，已忽略 interop_threads=%s", interop_threads)
+    return {"threads": torch.get_num_threads(), "interop_threads": torch.get_num_interop_threads()}
+
+
+def synthetic_image(imgsz: int) -> np.ndarray:
+    """固定种子的随机 BGR 图像，没有实际画面时用于验证与计时。"""
+    return np.random.default_rng(0).integers(0, 256, size=(imgsz, imgsz, 3), dtype=np.uint8)
+
+
+def make_input(image: np.ndarray, imgsz: int) -> torch.Tensor:
+    """把 BGR 图像缩放成 (1, 3, S, S) 的 float32 输入张量（S 取 32 的倍数）。"""
+    size = max(32, int(round(imgsz / 32)) * 32)
+    rgb = cv2.cvtColor(cv2.resize(image, (size, size)), cv2.COLOR_BGR2RGB)
+    x = torch.from_numpy(np.ascontiguousarray(rgb.transpose(2, 0, 1))).float().div_(255.0)
+    return x.unsqueeze(0)
+
+
+def tune_module(module: torch.nn.Module, x: torch.Tensor, profile: CpuProfile) -> dict:
+    """
+    在 module 上逐项启用优化并验证，返回报告：
+        {"baseline_ms", "tuned_ms", "speedup", "applied": [...], "steps": {name: {...}}}
+
+    各项优化原地作用于 module（内存布局、forward 实例属性），未通过验证的项会被撤销；
+    inference_mode 不改模块，是否采用由调用方根据 "applied" 决定。
+    """
+    module.eval()
+    state = {"inference_mode": False}
+    reference = _run(module, x, state)
+    scale = float(reference.abs().max()) or 1.0
+    baseline_ms = _bench(module, x, state, profile)
+    best_ms = baseline_ms
+
+    steps = [
+        ("inference_mode", profile.inference_mode, _enable_inference_mode),
+        ("channels_last", profile.channels_last, _enable_channels_last),
+        ("bf16", profile.want_bf16(), _enable_bf16),
+        ("compile", profile.compile_model, _enable_compile),
+    ]
+    applied = []
+    report_steps = {}
+    for name, wanted, enable in steps:
+        if not wanted:
+            continue
+        atol = profile.bf16_atol if name == "bf16" or "bf16" in applied else profile.atol
+        undo = None
+        try:
+            undo = enable(module, state)
+            ms = _bench(module, x, state, profile)
+            error = float((_run(module, x, state) - reference).abs().max()) / scale
+        except Exception as e:
+            if undo is not None:
+                undo()
+            report_steps[name] = {"ok": False, "reason": f"运行出错: {e}"}
+            logger.warning("CPU 调优项 %s 运行出错，已撤销: %s", name, e)
+            continue
+
+        step = {"ms": round(ms, 2), "error": float(f"{error:.2e}")}
+        if error > atol:
+            step.update(ok=False, reason=f"输出误差 {error:.2e} 超出容差 {atol:.0e}")
+        elif name != "inference_mode" and ms > best_ms * 1.05:
+            # inference_mode 只去掉自动求导记录，不会变慢，不按计时噪声取舍
+            step.update(ok=False, reason="未提速")
+        else:
+            step["ok"] = True
+        if step["ok"]:
+            applied.append(name)
+            best_ms = min(best_ms, ms)
+        else:
+            undo()
+            logger.info("CPU 调优项 %s 未采用: %s", name, step["reason"])
+        report_steps[name] = step
+
+    tuned_ms = _bench(module, x, state, profile)
+    return {
+        "baseline_ms": round(baseline_ms, 2),
+        "tuned_ms": round(tuned_ms, 2),
+        "speedup": round(baseline_ms / tuned_ms, 2) if tuned_ms > 0 else 1.0,
+        "applied": applied,
+        "steps": report_steps,
+    }
+
+
+# ---------- 内部 ----------
+
+
+def _run(module, x, state) -> torch.Tensor:
+    with torch.inference_mode() if state["inference_mode"] else torch.no_grad():
+        return _first_tensor(module(x)).float()
+
+
+def _bench(module, x, state, profile: CpuProfile) -> float:
+    """预热后多次计时，返回单次前向的中位耗时（毫秒）。"""
+    for _ in range(profile.warmup_runs):
+        _run(module, x, state)
+    times = []
+    for _ in range(profile.timed_runs):
+        t0 = time.perf_counter()
+        _run(module, x, state)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000.0
+
+
+def _first_tensor(out) -> torch.Tensor:
+    """取模型输出中的第一个张量（检测头 eval 模式输出 (y, x)，y 即原始预测）。"""
+    if isinstance(out, torch.Tensor):
+        return out
+    if isinstance(out, (list, tuple)):
+        for item in out:
+            try:
+                return _first_tensor(item)
+            except TypeError:
+                continue
+    raise TypeError(f"模型输出中没有张量: {type(out)}")
+
+
+def _to_float(out):
+    if isinstance(out, torch.Tensor):
+        return out.float() if out.dtype == torch.bfloat16 else out
+    if isinstance(out, (list, tuple)):
+        return type(out)(_to_float(o) for o in out)
+    return out
+
+
+def _wrap_forward(module, wrap):
+    """用实例属性替换 module.forward（nn.Module.__call__ 会调用它），返回撤销函数。"""
+    previous = module.__dict__.get("forward")
+    module.forward = wrap(module.forward)
+
+    def undo():
+        if previous is None:
+            module.__dict__.pop("forward", None)
+        else:
+            module.forward = previous
+
+    return undo
+
+
+def _enable_inference_mode(module, state):
+    state["inference_mode"] = True
+
+    def undo():
+        state["inference_mode"] = False
+
+    return undo
+
+
+def _channels_last_input(module, args):
+    if args and isinstance(args[0], torch.Tensor) and args[0].dim() == 4:
+        return (args[0].contiguous(memory_format=torch.channels_last),) + tuple(args[1:])
+    return None
+
+
+def _enable_channels_last(module, state):
+    module.to(memory_format=torch.channels_last)
+    handle = module.register_forward_pre_hook(_channels_last_input)
+
+    def undo():
+        handle.remove()
+        module.to(memory_format=torch.contiguous_format)
+
+    return undo
+
+
+def _enable_bf16(module, state):
+    def wrap(forward):
+        def bf16_forward(*args, **kwargs):
+            with torch.autocast("cpu", dtype=torch.bfloat16):
+                out = forward(*args, **kwargs)
+            # 输出转回 fp32，Ultralytics 的后处理（NMS 等）保持原精度
+            return _to_float(out)
+
+        return bf16_forward
+
+    return _wrap_forward(module, wrap)
+
+
+def _enable_compile(module, state):
+    if not hasattr(torch, "compile"):
+        raise RuntimeError("当前 Torch 版本不支持 torch.compile")
+    return _wrap_forward(module, torch.compile)
@@ -4,14 +4,28 @@
 UltralyticsAdapter：封装 Ultralytics YOLO 模型的底层调用逻辑。
 """
 
-from typing import Optional
+from typing import Dict, Optional, Sequence
+import contextlib
 import logging
+import os
+import threading
 
+import numpy as np
 import torch
 from ultralytics import YOLO
 
+from infra.cpu_profile import CpuProfile, make_input, set_torch_threads, synthetic_image, tune_module
+
 logger = logging.getLogger(__name__)
 
+# Ultralytics predict 的默认阈值。Model.predict 会把传入参数合并进已有的 predictor.args，
+# 上一次调用设置的 conf / iou / classes / max_det 会一直生效，因此每次调用都显式传入全部参数
+_DEFAULT_CONF = 0.25
+_DEFAULT_IOU = 0.7
+_DEFAULT_MAX_DET = 300
+# model.track 未指定 conf 时使用的阈值
+_DEFAULT_TRACK_CONF = 0.1
+
 
 class UltralyticsAdapter:
     """
@@ -21,10 +35,28 @@ class UltralyticsAdapter:
     - detect / segment / pose / obb 等任务的普通推理：model(...)
     - 多目标跟踪：model.track(..., persist=True, tracker=...)
       persist=True 时，Ultralytics 会在连续帧间保持轨迹状态
+
+    跟踪状态隔离：
+    Ultralytics 把 tracker 挂在 model.predictor.trackers 上，轨迹 ID 计数器是
+    BaseTrack 的类变量，二者在同一个模型对象上全局共享。这里按 session 保存
+    各自的 trackers 和 ID 计数器，每次 track 调用前换入、调用后换出，
+    从而多个帧源可以共用一份权重而互不串扰。
+
+    model.track 运行过之后，Ultralytics 的跟踪回调会一直注册在模型上；
+    普通推理（infer / infer_batch）同样持有 _track_lock，并临时摘掉这些回调，
+    既不会更新任何 session 的轨迹，结果中也不会带跟踪 ID。
     """
 
     def __init__(self):
         self.model: Optional[YOLO] = None  # Ultralytics YOLO 模型实例
+        self.backend: Optional[str] = None  # 推理后端标识，如 "pt:cpu" / "onnx:cuda"（预测缓存键的一部分）
+
+        # session -> {"trackers": list | None, "id_count": int}
+        self._tracker_states: Dict[str, dict] = {}
+        # predictor 不可重入：普通推理与跟踪都在此锁内调用模型
+        self._track_lock = threading.Lock()
+        # CPU 调优（apply_cpu_profile）采用 inference_mode 时，推理调用包在 torch.inference_mode() 中
+        self._inference_mode = False
 
     def load_model(self, model_path: str):
         """
@@ -43,6 +75,7 @@ class UltralyticsAdapter:
 
             # 使用 Ultralytics 提供的 YOLO 类加载模型（自动处理 .pt / .onnx）
             self.model = YOLO(model_path)
+            self._inference_mode = False
 
             # 选择设备：如果有 GPU 则用 CUDA，否则 CPU
             device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -55,7 +88,9 @@ class UltralyticsAdapter:
 
             task = getattr(self.model, "task", None)
             names = getattr(self.model, "names", None)
-            info = {"task": task, "device": device, "names": names}
+            ext = os.path.splitext(model_path)[1].lstrip(".").lower() or "pt"
+            self.backend = f"{ext}:{device}"
+            info = {"task": task, "device": device, "names": names, "backend": self.backend}
 
             logger.info(
                 "Ultralytics 模型加载成功: task=%s, device=%s, classes=%d",
@@ -68,10 +103,25 @@ class UltralyticsAdapter:
             logger.exception("UltralyticsAdapter.load_model 失败")
             return False, str(e)
 
-    def infer(self, image, imgsz=640):
+    def infer(
+        self,
+        image,
+        imgsz=640,
+        conf: Optional[float] = None,
+        iou: Optional[float] = None,
+        classes: Optional[Sequence[int]] = None,
+        class_conf: Optional[Dict[int, float]] = None,
+        max_det: Optional[int] = None,
+    ):
         """
         对单帧图像执行普通推理（无跟踪）。
 
+        参数:
+            conf / iou: 置信度与 NMS IoU 阈值，为 None 时使用 Ultralytics 默认值（0.25 / 0.7）
+            classes: 类别白名单，交给 Ultralytics 在 NMS 之前过滤，其余类别不进入 NMS 与后续处理
+            class_conf: 按类别覆盖置信度阈值 {class_id: conf}，在返回 Results 之前过滤
+            max_det: 每帧最多保留的检测数（NMS 阶段截断）
+
         返回:
             Ultralytics Results 对象（单帧）
         """
@@ -79,9 +129,230 @@ class UltralyticsAdapter:
             logger.error("infer 在模型未加载时被调用")
             raise RuntimeError("模型未加载")
 
-        logger.debug("UltralyticsAdapter: infer 调用 imgsz=%d", imgsz)
-        results = self.model(image, imgsz=imgsz)
-        return results[0] if isinstance(results, (list, tuple)) else results
+        logger.debug(
+            "UltralyticsAdapter: infer 调用 imgsz=%d, conf=%s, iou=%s, classes=%s, max_det=%s",
+            imgsz,
+            conf,
+            iou,
+            classes,
+            max_det,
+        )
+        with self._plain_predict():
+            results = self.model(
+                image, **self._predict_kwargs(imgsz, conf, iou, classes, class_conf, max_det)
+            )
+        result = results[0] if isinstance(results, (list, tuple)) else results
+        return self._filter_class_conf([result], conf, class_conf, max_det)[0]
+
+    def infer_batch(
+        self,
+        images,
+        imgsz=640,
+        conf: Optional[float] = None,
+        iou: Optional[float] = None,
+        classes: Optional[Sequence[int]] = None,
+        class_conf: Optional[Dict[int, float]] = None,
+        max_det: Optional[int] = None,
+    ):
+        """
+        对多帧图像执行一次批量推理（无跟踪），参数含义同 infer。
+
+        返回:
+            与 images 等长的 Ultralytics Results 列表
+        """
+        if self.model is None:
+            logger.error("infer_batch 在模型未加载时被调用")
+            raise RuntimeError("模型未加载")
+
+        if len(images) == 0:
+            return []
+
+        logger.debug(
+            "UltralyticsAdapter: infer_batch 调用 batch=%d, imgsz=%d, conf=%s, iou=%s",
+            len(images),
+            imgsz,
+            conf,
+            iou,
+        )
+        with self._plain_predict():
+            results = self.model(
+                list(images), **self._predict_kwargs(imgsz, conf, iou, classes, class_conf, max_det)
+            )
+        return self._filter_class_conf(list(results), conf, class_conf, max_det)
+
+    def _infer_context(self):
+        return torch.inference_mode() if self._inference_mode else contextlib.nullcontext()
+
+    @contextlib.contextmanager
+    def _plain_predict(self):
+        """普通推理：持有 _track_lock，并在调用期间摘掉模型上的跟踪回调（调用结束后恢复）。"""
+        with self._track_lock:
+            callbacks = getattr(self.model, "callbacks", None)
+            saved = {}
+            if isinstance(callbacks, dict):
+                # predictor.callbacks 与 model.callbacks 是同一个字典，原地替换即可
+                for event in ("on_predict_start", "on_predict_postprocess_end"):
+                    funcs = callbacks.get(event) or []
+                    if any(_is_tracking_callback(f) for f in funcs):
+                        saved[event] = funcs
+                        callbacks[event] = [f for f in funcs if not _is_tracking_callback(f)]
+            try:
+                with self._infer_context():
+                    yield
+            finally:
+                for event, funcs in saved.items():
+                    callbacks[event] = funcs
+
+    # ---------- CPU 调优 ----------
+
+    def apply_cpu_profile(self, profile: Optional[CpuProfile] = None, imgsz: int = 640, sample=None) -> dict:
+        """
+        应用 CPU 推理调优配置，返回调优报告。应在模型加载后、开始推理前调用一次。
+
+        - 线程数对所有后端生效
+        - inference_mode / channels_last / bf16 / torch.compile 只对 PyTorch（.pt）CPU 后端生效，
+          逐项与调优前的参考输出比对，误差超限、出错或未提速的项会被撤销（见 infra.cpu_profile）
+        - 报告含预热阶段测得的调优前后单帧前向耗时与加速比
+
+        参数:
+            profile: 调优配置，None 时使用 CpuProfile() 默认值
+            imgsz: 验证与计时使用的推理尺寸
+            sample: 用于验证的 BGR 图像（建议用实际画面），None 时使用固定种子的随机图
+        """
+        if self.model is None:
+            logger.error("apply_cpu_profile 在模型未加载时被调用")
+            raise RuntimeError("模型未加载")
+
+        profile = profile or CpuProfile()
+        report = {"backend": self.backend}
+        report.update(set_torch_threads(profile.threads, profile.interop_threads))
+        if self.backend != "pt:cpu":
+            report["skipped"] = "非 PyTorch CPU 后端，只设置线程数"
+            logger.info("CPU 调优: %s", report)
+            return report
+
+        image = sample if sample is not None else synthetic_image(imgsz)
+        # 先走一遍完整推理：让 Ultralytics 创建 predictor 并完成层融合，之后再改底层模块
+        with self._plain_predict():
+            self.model(image, **self._predict_kwargs(imgsz, None, None))
+        module = self._torch_module()
+        if module is None:
+            report["skipped"] = "未找到底层 nn.Module"
+            logger.warning("CPU 调优: %s", report)
+            return report
+
+        report.update(tune_module(module, make_input(image, imgsz), profile))
+        self._inference_mode = "inference_mode" in report["applied"]
+        if "bf16" in report["applied"]:
+            # bf16 输出与 fp32 略有差异，预测缓存键区分开
+            self.backend = "pt:cpu+bf16"
+            report["backend"] = self.backend
+        logger.info(
+            "CPU 调优完成: 采用 %s，单帧前向 %.1f ms -> %.1f ms（加速 %.2fx），threads=%d",
+            report["applied"] or "无",
+            report["baseline_ms"],
+            report["tuned_ms"],
+            report["speedup"],
+            report["threads"],
+        )
+        return report
+
+    def _torch_module(self) -> Optional[torch.nn.Module]:
+        """predictor 实际调用的 nn.Module（AutoBackend.model），与 YOLO.model 通常是同一对象。"""
+        backend = getattr(getattr(self.model, "predictor", None), "model", None)
+        module = getattr(backend, "model", None)
+        if not isinstance(module, torch.nn.Module):
+            module = getattr(self.model, "model", None)
+        return module if isinstance(module, torch.nn.Module) else None
+
+    @staticmethod
+    def _predict_kwargs(imgsz, conf, iou, classes=None, class_conf=None, max_det=None) -> dict:
+        """
+        实际传给 predictor 的参数。为 None 的项显式传入 Ultralytics 默认值，
+        避免沿用同一模型上一次调用（其他帧源、其他请求）留在 predictor.args 中的设置。
+        """
+        conf = conf if conf is not None else _DEFAULT_CONF
+        max_det = int(max_det) if max_det is not None else _DEFAULT_MAX_DET
+        if class_conf:
+            # 模型侧使用最低的阈值，按类别的阈值在 _filter_class_conf 中再过滤
+            conf = min([conf] + list(class_conf.values()))
+            # 被 _filter_class_conf 丢弃的框不能占用 max_det 名额，模型侧放宽，过滤后再截断
+            max_det = max(max_det, _DEFAULT_MAX_DET)
+        return {
+            "imgsz": imgsz,
+            "conf": conf,
+            "iou": iou if iou is not None else _DEFAULT_IOU,
+            "classes": list(classes) if classes is not None else None,
+            "max_det": max_det,
+        }
+
+    @classmethod
+    def effective_params(cls, imgsz, conf, iou, classes=None, class_conf=None, max_det=None) -> dict:
+        """一次推理实际生效的全部参数（predictor 参数 + 返回前的按类别过滤），预测缓存键据此生成。"""
+        params = cls._predict_kwargs(imgsz, conf, iou, classes, class_conf, max_det)
+        if class_conf:
+            # 模型侧 conf / max_det 已放宽，返回前的过滤条件单独记录
+            params["class_conf"] = class_conf
+            params["filter_conf"] = conf if conf is not None else _DEFAULT_CONF
+            params["filter_max_det"] = max_det
+        return params
+
+    @staticmethod
+    def _filter_class_conf(results, conf, class_conf, max_det=None):
+        """
+        按类别置信度阈值过滤 Results（在 from_yolo / plot 之前，低于阈值的框不会被转换或绘制），
+        再按置信度保留前 max_det 个框。
+        """
+        if not class_conf:
+            return results
+        base = conf if conf is not None else _DEFAULT_CONF
+        out = []
+        for result in results:
+            boxes = getattr(result, "boxes", None)
+            if boxes is None or len(boxes) == 0:
+                out.append(result)
+                continue
+            thresholds = torch.full_like(boxes.conf, base)
+            for cls_id, cls_conf in class_conf.items():
+                thresholds[boxes.cls == cls_id] = cls_conf
+            keep = boxes.conf >= thresholds
+            if not bool(keep.all()):
+                result = result[keep]
+            if max_det is not None and len(result.boxes) > max_det:
+                order = torch.argsort(result.boxes.conf, descending=True)[: int(max_det)]
+                result = result[order]
+            out.append(result)
+        return out
+
+    # ---------- 检测数组 <-> Results（预测缓存使用） ----------
+
+    @staticmethod
+    def result_to_array(result) -> Optional[np.ndarray]:
+        """
+        取出单帧 Results 的检测数组 (N, 6) float32 [x1, y1, x2, y2, conf, cls]。
+
+        含掩码 / 关键点 / 旋转框 / 跟踪 ID 的结果无法只用该数组还原，返回 None。
+        """
+        if any(getattr(result, attr, None) is not None for attr in ("masks", "keypoints", "obb")):
+            return None
+        boxes = getattr(result, "boxes", None)
+        if boxes is None:
+            return np.zeros((0, 6), dtype=np.float32)
+        data = boxes.data
+        if data.shape[-1] != 6:
+            return None
+        return data.detach().cpu().numpy().astype(np.float32, copy=False)
+
+    def result_from_array(self, image, data: np.ndarray):
+        """用检测数组重建 Ultralytics Results，下游的 plot() / from_yolo() 行为与直接推理一致。"""
+        from ultralytics.engine.results import Results
+
+        return Results(
+            orig_img=image,
+            path="",
+            names=self.model.names,
+            boxes=torch.from_numpy(np.array(data, dtype=np.float32).reshape(-1, 6)),
+        )
 
     def track(
         self,
@@ -91,6 +362,10 @@ class UltralyticsAdapter:
         persist: bool = True,
         conf: Optional[float] = None,
         iou: Optional[float] = None,
+        session: str = "default",
+        classes: Optional[Sequence[int]] = None,
+        class_conf: Optional[Dict[int, float]] = None,
+        max_det: Optional[int] = None,
     ):
         """
         对单帧图像执行多目标跟踪推理。
@@ -106,6 +381,8 @@ class UltralyticsAdapter:
             persist: 是否在多帧之间保持 tracks（通常保持 True）
             conf: 置信度阈值（可选）
             iou: IoU 阈值（可选）
+            session: 跟踪会话标识，不同 session 的轨迹状态互相隔离
+            classes / class_conf / max_det: 同 infer
 
         返回:
             Ultralytics Results 对象（单帧，包含 boxes.id 等跟踪信息）
@@ -114,25 +391,96 @@ class UltralyticsAdapter:
             logger.error("track 在模型未加载时被调用")
             raise RuntimeError("模型未加载")
 
-        kwargs = {
-            "imgsz": imgsz,
-            "persist": persist,
-        }
+        if conf is None:
+            conf = _DEFAULT_TRACK_CONF
+        kwargs = self._predict_kwargs(imgsz, conf, iou, classes, class_conf, max_det)
+        kwargs["persist"] = True
         if tracker_cfg is not None:
             kwargs["tracker"] = tracker_cfg
-        if conf is not None:
-            kwargs["conf"] = conf
-        if iou is not None:
-            kwargs["iou"] = iou
 
         logger.debug(
-            "UltralyticsAdapter: track 调用 imgsz=%d, tracker=%s, persist=%s, conf=%s, iou=%s",
+            "UltralyticsAdapter: track 调用 imgsz=%d, tracker=%s, persist=%s, conf=%s, iou=%s, session=%s",
             imgsz,
             tracker_cfg,
             persist,
             conf,
             iou,
+            session,
         )
 
-        results = self.model.track(image, **kwargs)
-        return results[0] if isinstance(results, (list, tuple)) else results
+        with self._track_lock:
+            if not persist:
+                # persist=False 语义：本 session 从全新的跟踪状态开始
+                self._tracker_states.pop(session, None)
+            self._swap_in_tracker(session)
+            try:
+                with self._infer_context():
+                    results = self.model.track(image, **kwargs)
+            finally:
+                self._swap_out_tracker(session)
+        result = results[0] if isinstance(results, (list, tuple)) else results
+        return self._filter_class_conf([result], conf, class_conf, max_det)[0]
+
+    def reset_tracker(self, session: Optional[str] = None):
+        """
+        重置跟踪状态（不重新加载权重）。
+
+        参数:
+            session: 指定 session；为 None 时清空所有 session
+        """
+        with self._track_lock:
+            if session is None:
+                self._tracker_states.clear()
+            else:
+                self._tracker_states.pop(session, None)
+        logger.info("重置跟踪状态: session=%s", session if session is not None else "ALL")
+
+    # ---------- 跟踪状态换入 / 换出 ----------
+
+    @staticmethod
+    def _base_track_cls():
+        try:
+            from ultralytics.trackers.basetrack import BaseTrack
+
+            return BaseTrack
+        except Exception:
+            return None
+
+    def _swap_in_tracker(self, session: str):
+        """把 session 的跟踪状态装到 predictor 上（调用方需持有 _track_lock）。"""
+        predictor = getattr(self.model, "predictor", None)
+        existing = getattr(predictor, "trackers", None) if predictor is not None else None
+        base_track = self._base_track_cls()
+        state = self._tracker_states.get(session)
+
+        if existing is None:
+            # 首次跟踪：由 Ultralytics 自行注册回调并创建 trackers
+            if base_track is not None:
+                base_track._count = state["id_count"] if state else 0
+            return
+
+        if state is None or state["trackers"] is None:
+            # 新 session：按已有 tracker 的类型和配置新建一份空状态
+            trackers = [type(t)(args=t.args, frame_rate=30) for t in existing]
+            state = {"trackers": trackers, "id_count": 0}
+            self._tracker_states[session] = state
+
+        predictor.trackers = state["trackers"]
+        if base_track is not None:
+            base_track._count = state["id_count"]
+
+    def _swap_out_tracker(self, session: str):
+        """调用结束后保存 session 的跟踪状态（调用方需持有 _track_lock）。"""
+        predictor = getattr(self.model, "predictor", None)
+        trackers = getattr(predictor, "trackers", None) if predictor is not None else None
+        base_track = self._base_track_cls()
+        self._tracker_states[session] = {
+            "trackers": trackers,
+            "id_count": base_track._count if base_track is not None else 0,
+        }
+
+
+def _is_tracking_callback(func) -> bool:
+    """是否为 Ultralytics 跟踪注册的回调（ultralytics.trackers.track 中的函数，通常包在 functools.partial 里）。"""
+    func = getattr(func, "func", func)
+    return getattr(func, "__module__", "").startswith("ultralytics.trackers")